@@ -13,194 +13,37 @@ Income Generation Cash-Secured Put Engine MCP Server Prompt
 
 from typing import List, Dict, Any, Optional, Union
 from datetime import datetime
+from functools import lru_cache
+from string import Template
 import json
 import ast
 
 from .prompt_utils import parse_tickers_input, get_duration_from_days
 
 
-async def income_generation_csp_engine(
-    tickers: str,  # 修改：现在只接受字符串，内部处理所有格式
-    cash_usd: float,
-    target_apy_pct: float = 50,
-    min_winrate_pct: float = 70,
-    confidence_pct: float = 90,
-) -> str:
-    """
-    生成收入导向的现金担保看跌期权策略执行提示
-    
-    Args:
-        tickers: 目标股票代码字符串 - 支持多种格式:
-            - JSON字符串: "[\"TSLA\", \"GOOG\", \"META\"]" 或 "['TSLA','GOOG','META']"  
-            - 空格分隔: "TSLA GOOG META"
-            - 逗号分隔: "TSLA,GOOG,META"
-            - 单个ticker: "TSLA"
-            (默认: [\"SPY\", \"QQQ\", \"AAPL\", \"MSFT\", \"NVDA\"])
-        cash_usd: 可用资金
-        target_apy_pct: 目标年化收益率百分比 (默认: 50%)
-        min_winrate_pct: 最小目标胜率百分比 (默认: 70%)
-        confidence_pct: 统计置信度百分比 (默认: 90%)
-        
-    Returns:
-        str: 综合的执行提示计划字符串
-        
-    Raises:
-        ValueError: 当输入参数无效时
-    """
-    
-    # DEBUG: 记录函数入口的原始参数
-    try:
-        from ..utils.debug_logger import debug_param, debug_parse_result
-        debug_param(
-            "income_generation_csp_engine:ENTRY",
-            "tickers_raw",
-            tickers,
-            f"Type: {type(tickers).__name__}, ID: {id(tickers)}"
-        )
-    except:
-        pass
-    
-    # 首先处理和清理输入的tickers
-    tickers_list = parse_tickers_input(tickers)
-    
-    # DEBUG: 记录解析后的结果
-    try:
-        debug_parse_result(tickers, tickers_list)
-        debug_param(
-            "income_generation_csp_engine:AFTER_PARSE",
-            "tickers_parsed",
-            tickers_list,
-            f"Length: {len(tickers_list) if tickers_list else 0}"
-        )
-    except:
-        pass
-    
-    if tickers_list:
-        # 清理每个ticker的空格并去除空字符串
-        tickers_list = [ticker.strip() for ticker in tickers_list if ticker and ticker.strip()]
-    
-    # 处理默认股票列表
-    if not tickers_list:
-        tickers_list = ["SPY", "QQQ", "AAPL", "MSFT", "NVDA"]
-    
-    # 参数验证（在清理后进行）
-    validation_result = _validate_parameters(
-        tickers_list, cash_usd, target_apy_pct, min_winrate_pct, confidence_pct
-    )
-    
-    if not validation_result["is_valid"]:
-        raise ValueError(f"参数验证失败: {', '.join(validation_result['errors'])}")
-    
-    # 限制股票数量以优化性能
-    if len(tickers_list) > 10:
-        tickers_list = tickers_list[:10]
-    
-    # 构建股票字符串
-    tickers_str = ", ".join(tickers_list)
-    primary_ticker = tickers_list[0]
-    
-    # 生成结构化提示
-    prompt = _generate_structured_prompt(
-        tickers=tickers_list,
-        tickers_str=tickers_str,
-        primary_ticker=primary_ticker,
-        cash_usd=cash_usd,
-        target_apy_pct=target_apy_pct,
-        min_winrate_pct=min_winrate_pct,
-        confidence_pct=confidence_pct
-    )
-    
-    return prompt
+# 单次分析的最大股票数量（超出部分截取）
+MAX_TICKERS = 10
 
-
-def _validate_parameters(
-    tickers: List[str],
-    cash_usd: float,
-    target_apy_pct: float,
-    min_winrate_pct: float,
-    confidence_pct: float
-) -> Dict[str, Any]:
-    """
-    验证输入参数的有效性
-    
-    Returns:
-        Dict[str, Any]: 包含验证结果的字典
-    """
-    errors = []
-    warnings = []
-    
-    # 验证股票代码列表（此时已经清理过）
-    if tickers:
-        if len(tickers) > 10:
-            warnings.append("股票列表超过10个，将截取前10个")
-        
-        for ticker in tickers:
-            if not ticker or not isinstance(ticker, str):
-                errors.append("股票代码必须是非空字符串")
-            elif len(ticker) > 10:
-                errors.append(f"股票代码 '{ticker}' 过长")
-    
-    # 验证资金金额
-    if not isinstance(cash_usd, (int, float)) or cash_usd <= 0:
-        errors.append("资金金额必须大于0")
-    elif cash_usd < 1000:
-        warnings.append("资金金额较小，可能无法找到合适的期权")
-    elif cash_usd > 1000000:
-        warnings.append("资金金额很大，建议分散投资")
-    
-    # 天数范围由智能到期日选择器决定，无需验证固定范围
-    
-    # 验证百分比参数
-    for param_name, param_value in [
-        ("目标年化收益率", target_apy_pct),
-        ("最小胜率", min_winrate_pct),
-        ("置信度", confidence_pct)
-    ]:
-        if not isinstance(param_value, (int, float)) or param_value < 0 or param_value > 100:
-            errors.append(f"{param_name}必须在0-100%之间")
-    
-    return {
-        "is_valid": len(errors) == 0,
-        "errors": errors,
-        "warnings": warnings
-    }
-
-
-def _generate_structured_prompt(
-    tickers: List[str],
-    tickers_str: str,
-    primary_ticker: str,
-    cash_usd: float,
-    target_apy_pct: float,
-    min_winrate_pct: float,
-    confidence_pct: float
-) -> str:
-    """
-    生成结构化的执行提示
-    
-    Returns:
-        str: 完整的提示字符串
-    """
-    
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    prompt = f"""# 💵 收入生成现金担保PUT策略引擎
+# 提示模板在导入时解析一次。头部包含分析时间，每次调用重新渲染；主体只依赖参数，可缓存
+_PROMPT_HEADER_TEMPLATE = Template("""# 💵 收入生成现金担保PUT策略引擎
 
 ## 🎯 策略目标与约束参数
 
-**分析时间**: {current_time}
-**目标股票池**: {tickers_str}
-**可用资金**: ${cash_usd:,.0f}
+**分析时间**: ${current_time}
+**目标股票池**: ${tickers_str}
+**可用资金**: $$${cash_fmt}
 **期权到期策略**: 智能优化选择（收入生成主题：7-21天最优范围）
-**收益目标**: 年化≥{target_apy_pct}%、胜率≥{min_winrate_pct}%、统计置信度≥{confidence_pct}%
+**收益目标**: 年化≥${target_apy_pct}%、胜率≥${min_winrate_pct}%、统计置信度≥${confidence_pct}%
+
+""")
 
-## ⚠️ 关键执行原则
+_PROMPT_BODY_TEMPLATE = Template("""## ⚠️ 关键执行原则
 
 **收入优先策略 - 避免股票分配**:
 - 🎯 **核心目标**: 收取期权权利金，NOT 购买股票
 - 📊 **Delta范围**: 严格控制在 0.10~0.30 (优先 0.15~0.25)
 - ⏰ **快速周转**: 优化到期日选择，最大化时间价值衰减
-- 💰 **高收益筛选**: 年化收益率≥{target_apy_pct}%，胜率≥{min_winrate_pct}%
+- 💰 **高收益筛选**: 年化收益率≥${target_apy_pct}%，胜率≥${min_winrate_pct}%
 
 ## 🔄 强制执行序列 - 按顺序执行以下工具
 
@@ -217,9 +60,9 @@ get_market_time_tool()
 对每个目标股票执行以下分析:
 
 ```
-# 主要股票 {primary_ticker} 详细分析
-stock_info_tool(symbol="{primary_ticker}")
-stock_history_tool(symbol="{primary_ticker}", date_range="3m", interval="daily", include_indicators=true)
+# 主要股票 ${primary_ticker} 详细分析
+stock_info_tool(symbol="${primary_ticker}")
+stock_history_tool(symbol="${primary_ticker}", date_range="3m", interval="daily", include_indicators=true)
 ```
 
 ### 第三步: 智能到期日优化选择 (科学化核心!)
@@ -228,7 +71,7 @@ stock_history_tool(symbol="{primary_ticker}", date_range="3m", interval="daily",
 # 使用专门的收入导向策略主题，自动优化7-21天范围
 # ⚠️ 重要：该工具现在返回完整的优化过程详情
 optimal_expiration_result = optimal_expiration_selector_tool_mcp(
-    symbol="{primary_ticker}",
+    symbol="${primary_ticker}",
     strategy_type="csp",  # CSP策略类型（收入导向权重已内置）
     volatility=None  # 自动检测当前隐含波动率
 )
@@ -260,10 +103,10 @@ optimal_date = optimal_expiration_result['optimal_expiration']['date']
 # ⚠️ 重要变更: duration参数支持YYYY-MM-DD格式的具体日期
 # 这样可以确保CSP工具使用与优化器完全相同的到期日
 cash_secured_put_strategy_tool_mcp(
-    symbol="{primary_ticker}",
+    symbol="${primary_ticker}",
     purpose_type="income",  # 关键: 收入导向策略
     duration=optimal_date,  # ✅ 直接使用优化器选择的具体日期 (例如: "2025-10-17")
-    capital_limit={min(cash_usd * 0.8, 100000)},
+    capital_limit=${capital_limit},
     include_order_blocks=true,
     min_premium=1.0,  # 最小权利金要求
     max_delta=-0.30   # 最大Delta限制 (避免分配)
@@ -275,7 +118,7 @@ cash_secured_put_strategy_tool_mcp(
 ```
 # 🎯 使用优化器选择的到期日
 options_chain_tool_mcp(
-    symbol="{primary_ticker}",
+    symbol="${primary_ticker}",
     expiration=optimal_date,  # 使用第三步返回的最优到期日
     option_type="put",
     include_greeks=true
@@ -287,7 +130,7 @@ options_chain_tool_mcp(
 ```
 # 🎯 使用优化器选择的到期日进行精确概率计算
 option_assignment_probability_tool_mcp(
-    symbol="{primary_ticker}",
+    symbol="${primary_ticker}",
     strike_price="[从第四步获得的推荐执行价]",
     expiration=optimal_date,  # 使用第三步返回的最优到期日
     option_type="put",
@@ -304,14 +147,14 @@ strategies_data = [
 
 portfolio_optimization_tool_mcp_tool(
     strategies_data=strategies_data,
-    total_capital={cash_usd},
+    total_capital=${cash_usd},
     optimization_method="sharpe",  # 使用夏普比率加权
     risk_free_rate=0.048,  # 当前无风险利率4.8%
-    constraints={{
+    constraints={
         "min_allocation": 0.00,  # 最小仓位0%（允许不配置）
         "max_allocation": 0.80,  # 最大仓位80%（允许集中投资）
         "min_positions": 1       # 至少1个仓位（允许单一最优）
-    }}
+    }
 )
 ```
 
@@ -327,11 +170,11 @@ portfolio_optimization_tool_mcp_tool(
 ### 二级优化 - 收入效率排序
 1. **年化收益率优先** (40%权重):
    - 公式: (权利金/现金占用) × (365/到期天数) × 100%
-   - 目标: ≥{target_apy_pct}% 满分
+   - 目标: ≥${target_apy_pct}% 满分
 
 2. **胜率估算** (35%权重):
    - Delta理论概率 + 历史回测验证
-   - 目标: ≥{min_winrate_pct}% 满分
+   - 目标: ≥${min_winrate_pct}% 满分
 
 3. **风险调整收益** (25%权重):
    - 夏普比率: (年化收益率 - 无风险利率) / 波动率
@@ -357,8 +200,8 @@ portfolio_optimization_tool_mcp_tool(
 
 ### 风险控制检查清单
 - [ ] 所有推荐期权的Delta < -0.30
-- [ ] 年化收益率≥{target_apy_pct}%
-- [ ] 估计胜率≥{min_winrate_pct}%
+- [ ] 年化收益率≥${target_apy_pct}%
+- [ ] 估计胜率≥${min_winrate_pct}%
 - [ ] 流动性评分 ≥ B级
 - [ ] 距离财报日期 > 7天
 - [ ] 市场VIX < 35 (避免高波动环境)
@@ -404,15 +247,215 @@ portfolio_optimization_tool_mcp_tool(
 
 ## ⚡ 开始执行
 
-请严格按照上述序列执行所有工具，重点关注**收入生成**而非股票获取，确保所有推荐策略的年化收益≥{target_apy_pct}%且分配概率<30%。特别注意使用智能到期日选择器替代主观判断。
+请严格按照上述序列执行所有工具，重点关注**收入生成**而非股票获取，确保所有推荐策略的年化收益≥${target_apy_pct}%且分配概率<30%。特别注意使用智能到期日选择器替代主观判断。
 
 ---
 *免责声明: 本分析仅供参考，期权交易存在重大风险。请根据个人风险承受能力谨慎决策。*
-"""
+""")
 
+
+async def income_generation_csp_engine(
+    tickers: str,  # 修改：现在只接受字符串，内部处理所有格式
+    cash_usd: float,
+    target_apy_pct: float = 50,
+    min_winrate_pct: float = 70,
+    confidence_pct: float = 90,
+) -> str:
+    """
+    生成收入导向的现金担保看跌期权策略执行提示
+    
+    Args:
+        tickers: 目标股票代码字符串 - 支持多种格式:
+            - JSON字符串: "[\"TSLA\", \"GOOG\", \"META\"]" 或 "['TSLA','GOOG','META']"  
+            - 空格分隔: "TSLA GOOG META"
+            - 逗号分隔: "TSLA,GOOG,META"
+            - 单个ticker: "TSLA"
+            (默认: [\"SPY\", \"QQQ\", \"AAPL\", \"MSFT\", \"NVDA\"])
+        cash_usd: 可用资金
+        target_apy_pct: 目标年化收益率百分比 (默认: 50%)
+        min_winrate_pct: 最小目标胜率百分比 (默认: 70%)
+        confidence_pct: 统计置信度百分比 (默认: 90%)
+        
+    Returns:
+        str: 综合的执行提示计划字符串
+        
+    Raises:
+        ValueError: 当输入参数无效时
+    """
+    
+    # DEBUG: 记录函数入口的原始参数
+    try:
+        from ..utils.debug_logger import debug_param, debug_parse_result
+        debug_param(
+            "income_generation_csp_engine:ENTRY",
+            "tickers_raw",
+            tickers,
+            f"Type: {type(tickers).__name__}, ID: {id(tickers)}"
+        )
+    except:
+        pass
+    
+    # 首先处理和清理输入的tickers
+    tickers_list = parse_tickers_input(tickers)
+    
+    # DEBUG: 记录解析后的结果
+    try:
+        debug_parse_result(tickers, tickers_list)
+        debug_param(
+            "income_generation_csp_engine:AFTER_PARSE",
+            "tickers_parsed",
+            tickers_list,
+            f"Length: {len(tickers_list) if tickers_list else 0}"
+        )
+    except:
+        pass
+    
+    if tickers_list:
+        # 清理每个ticker的空格并去除空字符串
+        tickers_list = [ticker.strip() for ticker in tickers_list if ticker and ticker.strip()]
+    
+    # 处理默认股票列表
+    if not tickers_list:
+        tickers_list = ["SPY", "QQQ", "AAPL", "MSFT", "NVDA"]
+    
+    # 参数验证（在清理后进行）
+    validation_result = _validate_parameters(
+        tickers_list, cash_usd, target_apy_pct, min_winrate_pct, confidence_pct
+    )
+    
+    if not validation_result["is_valid"]:
+        raise ValueError(f"参数验证失败: {', '.join(validation_result['errors'])}")
+    
+    # 限制股票数量以优化性能
+    tickers_list = tickers_list[:MAX_TICKERS]
+    
+    # 构建股票字符串
+    tickers_str = ", ".join(tickers_list)
+    primary_ticker = tickers_list[0]
+    
+    # 生成结构化提示
+    prompt = _generate_structured_prompt(
+        tickers=tickers_list,
+        tickers_str=tickers_str,
+        primary_ticker=primary_ticker,
+        cash_usd=cash_usd,
+        target_apy_pct=target_apy_pct,
+        min_winrate_pct=min_winrate_pct,
+        confidence_pct=confidence_pct
+    )
+    
     return prompt
 
 
+def _validate_parameters(
+    tickers: List[str],
+    cash_usd: float,
+    target_apy_pct: float,
+    min_winrate_pct: float,
+    confidence_pct: float
+) -> Dict[str, Any]:
+    """
+    验证输入参数的有效性
+    
+    Returns:
+        Dict[str, Any]: 包含验证结果的字典
+    """
+    errors = []
+    warnings = []
+    
+    # 验证股票代码列表（此时已经清理过）
+    if len(tickers) > MAX_TICKERS:
+        warnings.append(f"股票列表超过{MAX_TICKERS}个，将截取前{MAX_TICKERS}个")
+
+    # 超出部分会被截取，只验证实际使用的股票代码
+    for ticker in tickers[:MAX_TICKERS]:
+        if not ticker or not isinstance(ticker, str):
+            errors.append("股票代码必须是非空字符串")
+        elif len(ticker) > 10:
+            errors.append(f"股票代码 '{ticker}' 过长")
+    
+    # 验证资金金额
+    if not isinstance(cash_usd, (int, float)) or cash_usd <= 0:
+        errors.append("资金金额必须大于0")
+    elif cash_usd < 1000:
+        warnings.append("资金金额较小，可能无法找到合适的期权")
+    elif cash_usd > 1000000:
+        warnings.append("资金金额很大，建议分散投资")
+    
+    # 天数范围由智能到期日选择器决定，无需验证固定范围
+    
+    # 验证百分比参数
+    for param_name, param_value in [
+        ("目标年化收益率", target_apy_pct),
+        ("最小胜率", min_winrate_pct),
+        ("置信度", confidence_pct)
+    ]:
+        if not isinstance(param_value, (int, float)) or param_value < 0 or param_value > 100:
+            errors.append(f"{param_name}必须在0-100%之间")
+    
+    return {
+        "is_valid": len(errors) == 0,
+        "errors": errors,
+        "warnings": warnings
+    }
+
+
+def _generate_structured_prompt(
+    tickers: List[str],
+    tickers_str: str,
+    primary_ticker: str,
+    cash_usd: float,
+    target_apy_pct: float,
+    min_winrate_pct: float,
+    confidence_pct: float
+) -> str:
+    """
+    生成结构化的执行提示
+    
+    Returns:
+        str: 完整的提示字符串
+    """
+    
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    header = _PROMPT_HEADER_TEMPLATE.substitute(
+        current_time=current_time,
+        tickers_str=tickers_str,
+        cash_fmt=f"{cash_usd:,.0f}",
+        target_apy_pct=target_apy_pct,
+        min_winrate_pct=min_winrate_pct,
+        confidence_pct=confidence_pct
+    )
+
+    return header + _render_prompt_body(
+        primary_ticker, cash_usd, target_apy_pct, min_winrate_pct
+    )
+
+
+@lru_cache(maxsize=128, typed=True)  # 50000 与 50000.0 渲染不同, 不能共用缓存
+def _render_prompt_body(
+    primary_ticker: str,
+    cash_usd: float,
+    target_apy_pct: float,
+    min_winrate_pct: float
+) -> str:
+    """
+    生成提示中与分析时间无关的主体部分（执行序列、筛选标准、输出要求）
+
+    主体只依赖参数，按参数缓存，重复调用无需重新渲染。
+
+    Returns:
+        str: 提示主体字符串
+    """
+    return _PROMPT_BODY_TEMPLATE.substitute(
+        primary_ticker=primary_ticker,
+        cash_usd=cash_usd,
+        capital_limit=min(cash_usd * 0.8, 100000),
+        target_apy_pct=target_apy_pct,
+        min_winrate_pct=min_winrate_pct
+    )
+
+
 # 辅助函数用于获取策略示例和使用指导
 
 def get_income_csp_examples() -> Dict[str, Any]:
@@ -11,10 +11,16 @@ Option Position Rebalancer Engine MCP Server Prompt
 - 专业执行格式: Bloomberg/IEX标准订单格式
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 import logging
+import re
+
+
+# 标准OCC期权符号: [TICKER][YYMMDD][C/P][STRIKE_PRICE]
+_OCC_SYMBOL_RE = re.compile(r'^([A-Za-z]{1,6})([0-9]{6})([CPcp])([0-9]{8})$')
 
 
 class PositionType(str, Enum):
@@ -136,11 +142,16 @@ async def option_position_rebalancer_engine(
 
         # 提取期权类型 (P=put, C=call)
         # 在日期后、行权价前应该有一个字符表示类型
-        option_type_char = None
-        for char in option_symbol:
-            if char in ['P', 'C']:
-                option_type_char = char
-                break
+        parsed = _parse_occ_symbol(option_symbol)
+        if parsed:
+            # 标准OCC符号直接取类型位, 避免标的代码中的P/C (如AAPL) 被误判
+            option_type_char = parsed[2].upper()
+        else:
+            option_type_char = None
+            for char in option_symbol:
+                if char in ['P', 'C']:
+                    option_type_char = char
+                    break
 
         if option_type_char == 'P':
             option_type = "put"
@@ -315,6 +326,23 @@ def _validate_rebalancer_parameters(
     }
 
 
+@lru_cache(maxsize=4096)
+def _parse_occ_symbol(option_symbol: str) -> Optional[Tuple[str, str, str, str]]:
+    """
+    一次性解析标准OCC期权符号, 供三个 _extract_* 辅助函数共享
+
+    Args:
+        option_symbol: 期权符号
+
+    Returns:
+        (标的, YYMMDD, C/P, 8位行权价) 元组; 非标准格式返回 None
+    """
+    if not isinstance(option_symbol, str):
+        return None
+    match = _OCC_SYMBOL_RE.match(option_symbol)
+    return match.groups() if match else None
+
+
 def _extract_underlying_from_option_symbol(option_symbol: str) -> str:
     """
     从OCC标准期权符号提取标的股票代码
@@ -335,8 +363,18 @@ def _extract_underlying_from_option_symbol(option_symbol: str) -> str:
     """
     if not option_symbol or not isinstance(option_symbol, str):
         raise ValueError("期权符号必须是非空字符串")
+    return _extract_underlying_cached(option_symbol)
 
-    # 提取前面的字母部分
+
+@lru_cache(maxsize=4096)
+def _extract_underlying_cached(option_symbol: str) -> str:
+    """按符号缓存的标的解析 (外层已确保参数为可哈希的字符串)"""
+    # 标准OCC符号直接使用共享解析结果
+    parsed = _parse_occ_symbol(option_symbol)
+    if parsed:
+        return parsed[0].upper()
+
+    # 非标准格式: 提取前面的字母部分
     underlying = ""
     for char in option_symbol:
         if char.isalpha():
@@ -375,9 +413,17 @@ def _extract_strike_from_option_symbol(option_symbol: str) -> float:
     """
     if not option_symbol or len(option_symbol) < 8:
         raise ValueError(f"期权符号 '{option_symbol}' 长度不足,无法提取行权价")
+    if not isinstance(option_symbol, str):
+        raise ValueError("解析行权价失败: 期权符号必须是字符串")
+    return _extract_strike_cached(option_symbol)
+
 
+@lru_cache(maxsize=4096)
+def _extract_strike_cached(option_symbol: str) -> float:
+    """按符号缓存的行权价解析"""
     try:
-        strike_str = option_symbol[-8:]
+        parsed = _parse_occ_symbol(option_symbol)
+        strike_str = parsed[3] if parsed else option_symbol[-8:]
         if not strike_str.isdigit():
             raise ValueError(f"行权价部分 '{strike_str}' 包含非数字字符")
 
@@ -420,26 +466,36 @@ def _extract_expiration_from_option_symbol(option_symbol: str) -> str:
     """
     if not option_symbol or not isinstance(option_symbol, str):
         raise ValueError("期权符号必须是非空字符串")
+    return _extract_expiration_cached(option_symbol)
 
+
+@lru_cache(maxsize=4096)
+def _extract_expiration_cached(option_symbol: str) -> str:
+    """按符号缓存的到期日解析"""
     try:
-        # 找到字母结束的位置
-        date_start = 0
-        for i, char in enumerate(option_symbol):
-            if not char.isalpha():
-                date_start = i
-                break
+        parsed = _parse_occ_symbol(option_symbol)
+        if parsed:
+            # 标准OCC符号直接使用共享解析结果
+            date_str = parsed[1]
+        else:
+            # 找到字母结束的位置
+            date_start = 0
+            for i, char in enumerate(option_symbol):
+                if not char.isalpha():
+                    date_start = i
+                    break
 
-        if date_start == 0:
-            raise ValueError(f"期权符号 '{option_symbol}' 格式无效,找不到日期部分")
+            if date_start == 0:
+                raise ValueError(f"期权符号 '{option_symbol}' 格式无效,找不到日期部分")
 
-        # 验证是否有足够的字符
-        if len(option_symbol) < date_start + 6:
-            raise ValueError(f"期权符号 '{option_symbol}' 长度不足,无法提取6位日期")
+            # 验证是否有足够的字符
+            if len(option_symbol) < date_start + 6:
+                raise ValueError(f"期权符号 '{option_symbol}' 长度不足,无法提取6位日期")
 
-        # 提取6位日期
-        date_str = option_symbol[date_start:date_start+6]
-        if not date_str.isdigit():
-            raise ValueError(f"日期部分 '{date_str}' 包含非数字字符")
+            # 提取6位日期
+            date_str = option_symbol[date_start:date_start+6]
+            if not date_str.isdigit():
+                raise ValueError(f"日期部分 '{date_str}' 包含非数字字符")
 
         year = "20" + date_str[:2]
         month = date_str[2:4]
@@ -486,6 +542,51 @@ def _generate_rebalancer_prompt(
 
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    # 除分析时间外提示内容只取决于参数, 模板渲染结果可缓存复用
+    head, tail = _render_rebalancer_prompt_parts(
+        option_symbol=option_symbol,
+        underlying_symbol=underlying_symbol,
+        strike_price=strike_price,
+        expiration_date=expiration_date,
+        option_type=option_type,
+        position_size=position_size,
+        entry_price=entry_price,
+        position_cost=position_cost,
+        position_type=position_type,
+        entry_date=entry_date,
+        risk_tolerance=risk_tolerance,
+        defensive_roll_trigger_pct=defensive_roll_trigger_pct,
+        profit_target_pct=profit_target_pct,
+        max_additional_capital=max_additional_capital
+    )
+
+    return f"{head}{current_time}{tail}"
+
+
+@lru_cache(maxsize=256, typed=True)  # 15 与 15.0 渲染不同, 不能共用缓存
+def _render_rebalancer_prompt_parts(
+    option_symbol: str,
+    underlying_symbol: str,
+    strike_price: float,
+    expiration_date: str,
+    option_type: str,
+    position_size: int,
+    entry_price: float,
+    position_cost: float,
+    position_type: str,
+    entry_date: Optional[str],
+    risk_tolerance: str,
+    defensive_roll_trigger_pct: float,
+    profit_target_pct: float,
+    max_additional_capital: float
+) -> Tuple[str, str]:
+    """
+    渲染再平衡提示模板, 以分析时间为界拆成前后两段
+
+    Returns:
+        Tuple[str, str]: (分析时间之前的部分, 分析时间之后的部分)
+    """
+
     # 根据仓位类型确定分析重点
     if position_type.startswith("short"):
         position_direction = "做空"
@@ -510,7 +611,7 @@ def _generate_rebalancer_prompt(
     # 转换option_type为中文
     option_type_cn = "看跌期权 (PUT)" if option_type == "put" else "看涨期权 (CALL)"
 
-    prompt = f"""# 🎯 期权仓位再平衡与风险管理引擎
+    head = f"""# 🎯 期权仓位再平衡与风险管理引擎
 
 ## 🔍 参数解析验证
 
@@ -527,7 +628,8 @@ def _generate_rebalancer_prompt(
 
 ## 📊 当前仓位概览
 
-**分析时间**: {current_time}
+**分析时间**: """
+    tail = f"""
 **期权合约**: {option_symbol}
 **标的股票**: {underlying_symbol}
 **仓位方向**: {position_direction} ({position_type})
@@ -889,7 +991,7 @@ options_chain_tool_mcp(
 *免责声明: 本分析仅供参考，期权交易存在重大风险，可能导致全部本金损失。请根据个人风险承受能力谨慎决策，建议咨询专业财务顾问。*
 """
 
-    return prompt
+    return head, tail
 
 
 # 辅助函数用于获取使用示例
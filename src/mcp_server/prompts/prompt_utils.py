@@ -8,6 +8,11 @@ MCP Server Prompt公共工具模块
 from typing import List, Union
 import json
 import ast
+import re
+
+
+# JSON或Python字面量只有包含方括号或引号时才可能解析出列表/字符串
+_LITERAL_CHARS_RE = re.compile(r"[\[\"']")
 
 
 def parse_tickers_input(tickers_input: Union[List[str], str]) -> List[str]:
@@ -105,87 +110,89 @@ def parse_tickers_input(tickers_input: Union[List[str], str]) -> List[str]:
             pass
         return []
 
-    # 方法1: 尝试JSON解析
-    try:
-        result = json.loads(tickers_str)
-        if isinstance(result, list):
-            try:
-                debug_parse_step(
-                    "parse_tickers_input",
-                    "JSON_PARSE_LIST",
-                    tickers_str,
-                    result,
-                    success=True
-                )
-            except:
-                pass
-            return result
-        elif isinstance(result, str):
-            result_list = [result]
-            try:
-                debug_parse_step(
-                    "parse_tickers_input",
-                    "JSON_PARSE_STRING",
-                    tickers_str,
-                    result_list,
-                    success=True
-                )
-            except:
-                pass
-            return result_list
-    except Exception as e:
+    # 普通的逗号/空格分隔输入不含方括号或引号，跳过两次必然无结果的解析
+    if _LITERAL_CHARS_RE.search(tickers_str):
+        # 方法1: 尝试JSON解析
         try:
-            debug_parse_step(
-                "parse_tickers_input",
-                "JSON_PARSE_FAILED",
-                tickers_str,
-                None,
-                success=False,
-                error=str(e)
-            )
-        except:
-            pass
-
-    # 方法2: 尝试Python ast解析
-    try:
-        result = ast.literal_eval(tickers_str)
-        if isinstance(result, list):
+            result = json.loads(tickers_str)
+            if isinstance(result, list):
+                try:
+                    debug_parse_step(
+                        "parse_tickers_input",
+                        "JSON_PARSE_LIST",
+                        tickers_str,
+                        result,
+                        success=True
+                    )
+                except:
+                    pass
+                return result
+            elif isinstance(result, str):
+                result_list = [result]
+                try:
+                    debug_parse_step(
+                        "parse_tickers_input",
+                        "JSON_PARSE_STRING",
+                        tickers_str,
+                        result_list,
+                        success=True
+                    )
+                except:
+                    pass
+                return result_list
+        except Exception as e:
             try:
                 debug_parse_step(
                     "parse_tickers_input",
-                    "AST_PARSE_LIST",
+                    "JSON_PARSE_FAILED",
                     tickers_str,
-                    result,
-                    success=True
+                    None,
+                    success=False,
+                    error=str(e)
                 )
             except:
                 pass
-            return result
-        elif isinstance(result, str):
-            result_list = [result]
+
+        # 方法2: 尝试Python ast解析
+        try:
+            result = ast.literal_eval(tickers_str)
+            if isinstance(result, list):
+                try:
+                    debug_parse_step(
+                        "parse_tickers_input",
+                        "AST_PARSE_LIST",
+                        tickers_str,
+                        result,
+                        success=True
+                    )
+                except:
+                    pass
+                return result
+            elif isinstance(result, str):
+                result_list = [result]
+                try:
+                    debug_parse_step(
+                        "parse_tickers_input",
+                        "AST_PARSE_STRING",
+                        tickers_str,
+                        result_list,
+                        success=True
+                    )
+                except:
+                    pass
+                return result_list
+        except Exception as e:
             try:
                 debug_parse_step(
                     "parse_tickers_input",
-                    "AST_PARSE_STRING",
+                    "AST_PARSE_FAILED",
                     tickers_str,
-                    result_list,
-                    success=True
+                    None,
+                    success=False,
+                    error=str(e)
                 )
             except:
                 pass
-            return result_list
-    except Exception as e:
-        try:
-            debug_parse_step(
-                "parse_tickers_input",
-                "AST_PARSE_FAILED",
-                tickers_str,
-                None,
-                success=False,
-                error=str(e)
-            )
-        except:
-            pass
 
     # 方法3: 检查是否是逗号分隔（优先于空格）
     if ',' in tickers_str:
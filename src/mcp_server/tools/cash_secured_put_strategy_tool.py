@@ -398,34 +398,34 @@ async def validate_csp_parameters(
         capital_limit: 资金限制
         
     Returns:
-        验证结果字典
+        验证结果字典，errors/warnings 为 (代码, 消息) 元组列表
     """
     errors = []
     warnings = []
     
     # 验证股票代码
     if not symbol or len(symbol.strip()) == 0:
-        errors.append("股票代码不能为空")
+        errors.append(("SYMBOL_EMPTY", "股票代码不能为空"))
     elif len(symbol.strip()) > 10:
-        errors.append("股票代码过长")
+        errors.append(("SYMBOL_TOO_LONG", "股票代码过长"))
     
     # 验证目的类型
     if purpose_type not in ["income", "discount"]:
-        errors.append("目的类型必须是 'income' 或 'discount'")
+        errors.append(("PURPOSE_INVALID", "目的类型必须是 'income' 或 'discount'"))
     
     # 验证持续时间
     valid_durations = ["1w", "2w", "1m", "3m", "6m", "1y"]
     if duration not in valid_durations:
-        errors.append(f"持续时间必须是 {valid_durations} 之一")
+        errors.append(("DURATION_INVALID", f"持续时间必须是 {valid_durations} 之一"))
     
     # 验证资金限制
     if capital_limit is not None:
         if capital_limit <= 0:
-            errors.append("资金限制必须大于0")
+            errors.append(("CAPITAL_NEGATIVE", "资金限制必须大于0"))
         elif capital_limit < 1000:
-            warnings.append("资金限制过小，可能无法找到合适的期权")
+            warnings.append(("CAPITAL_TOO_SMALL", "资金限制过小，可能无法找到合适的期权"))
         elif capital_limit > 1000000:
-            warnings.append("资金限制很大，建议分散投资")
+            warnings.append(("CAPITAL_TOO_LARGE", "资金限制很大，建议分散投资"))
     
     return {
         "is_valid": len(errors) == 0,
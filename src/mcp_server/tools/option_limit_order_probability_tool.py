@@ -15,7 +15,6 @@ from ...provider.tradier.client import TradierClient
 from ...option.limit_order_probability import (
     MonteCarloEngine,
     VolatilityMixer,
-    FillDetector,
     StatisticalAnalyzer,
     TheoreticalValidator,
     BacktestValidator,
@@ -208,20 +207,13 @@ async def option_limit_order_probability_tool(
         # 使用改进的蒙特卡洛引擎（传入tradier_client以启用日内波动估计）
         monte_carlo = MonteCarloEngine(sim_params, tradier_client=tradier_client)
 
-        # 模拟价格路径（包含日内高低点）
-        price_paths = await monte_carlo.simulate_price_paths_with_intraday(
+        # Step 6: 分块模拟价格路径（包含日内高低点）并检测成交，不保留完整路径矩阵
+        fill_results = await monte_carlo.simulate_and_detect_with_intraday(
             symbol=symbol,
-            lookback_days=90
-        )
-
-        # Step 6: 检测成交（使用改进方法考虑日内触及）
-        detector = FillDetector()
-        fill_results = detector.detect_fills_with_intraday(
-            price_paths=price_paths,
             limit_price=limit_price,
             order_side=order_side,
+            lookback_days=90,
             include_touch_probability=True,
-            first_day_fraction=market_ctx["first_day_fraction"],
             current_price=current_price,
             expiration_date=expiration,
             market_context=market_ctx
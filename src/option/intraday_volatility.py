@@ -5,7 +5,7 @@
 考虑日内高低点而非仅收盘价，更准确地评估限价订单的触及概率。
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
 from dataclasses import dataclass
@@ -255,6 +255,40 @@ class IntradayVolatilityEstimator:
             "low": float(estimated_low)
         }
 
+    @staticmethod
+    def option_intraday_bounds(
+        close_prices: np.ndarray,
+        stock_close_prices: np.ndarray,
+        range_estimate: IntradayRangeEstimate,
+        delta: float,
+        gamma: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        向量化版本的 estimate_option_intraday_range，对整个路径矩阵逐元素计算
+
+        Args:
+            close_prices: 期权收盘价路径数组 (num_paths, num_days)
+            stock_close_prices: 股票收盘价路径数组 (num_paths, num_days)
+            range_estimate: 日内范围估计
+            delta: 期权Delta
+            gamma: 期权Gamma
+
+        Returns:
+            (期权日内最高价路径, 期权日内最低价路径)
+        """
+        # 基于历史统计的百分位数估计股票的日内高低点
+        delta_stock_high = stock_close_prices * (1 + range_estimate.high_percentile_95) - stock_close_prices
+        delta_stock_low = stock_close_prices * (1 - range_estimate.low_percentile_95) - stock_close_prices
+
+        # 使用Delta + Gamma近似映射到期权价格
+        option_high = close_prices + (delta * delta_stock_high + 0.5 * gamma * (delta_stock_high ** 2))
+        option_low = close_prices + (delta * delta_stock_low + 0.5 * gamma * (delta_stock_low ** 2))
+
+        # 确保 high >= low，且期权价格不能为负
+        high_paths = np.maximum(np.maximum(option_high, option_low), 0)
+        low_paths = np.maximum(np.minimum(option_high, option_low), 0)
+        return high_paths, low_paths
+
     async def simulate_intraday_paths(
         self,
         close_prices: np.ndarray,
@@ -288,34 +322,9 @@ class IntradayVolatilityEstimator:
             lookback_days=lookback_days
         )
 
-        num_paths, num_days = close_prices.shape
-
-        high_paths = np.zeros_like(close_prices)
-        low_paths = np.zeros_like(close_prices)
-
-        # 为每个路径的每一天估计高低点
-        for path_idx in range(num_paths):
-            for day_idx in range(num_days):
-                stock_close = stock_close_prices[path_idx, day_idx]
-                option_close = close_prices[path_idx, day_idx]
-
-                # 使用对数正态分布估计股票的日内高低点
-                # 基于历史统计的百分位数
-                stock_high = stock_close * (1 + range_estimate.high_percentile_95)
-                stock_low = stock_close * (1 - range_estimate.low_percentile_95)
-
-                # 映射到期权价格
-                option_range = self.estimate_option_intraday_range(
-                    option_close=option_close,
-                    stock_close=stock_close,
-                    stock_high=stock_high,
-                    stock_low=stock_low,
-                    delta=delta,
-                    gamma=gamma
-                )
-
-                high_paths[path_idx, day_idx] = option_range["high"]
-                low_paths[path_idx, day_idx] = option_range["low"]
+        high_paths, low_paths = self.option_intraday_bounds(
+            close_prices, stock_close_prices, range_estimate, delta, gamma
+        )
 
         return {
             "close": close_prices,
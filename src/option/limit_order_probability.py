@@ -10,12 +10,41 @@ from datetime import datetime, timedelta
 import numpy as np
 from scipy import stats
 import asyncio
+import math
 from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 
 
-@dataclass
+# 成交天数百分位数（键）及对应分位点
+_PERCENTILE_KEYS = (25, 50, 75, 90)
+_PERCENTILE_QUANTILES = (0.25, 0.50, 0.75, 0.90)
+
+# 分块模拟时每批的路径数（限制峰值内存）
+DEFAULT_CHUNK_SIZE = 65_536
+
+# 替代限价方案：(相对价差的调整系数, 方案名称, 目标成交概率)
+# 目标成交概率为 None 表示当前限价，沿用模拟得到的成交概率
+_SELL_SCENARIOS = (
+    (-0.75, "快速成交方案", 0.90),
+    (-0.50, "平衡方案", 0.80),
+    (0.0, "当前限价", None),
+    (0.50, "高收益低概率", 0.40),
+)
+_BUY_SCENARIOS = (
+    (0.75, "快速成交方案", 0.90),
+    (0.50, "平衡方案", 0.80),
+    (0.0, "当前限价", None),
+    (-0.50, "低价高风险", 0.40),
+)
+
+
+@dataclass(frozen=True, slots=True)
 class SimulationParameters:
-    """蒙特卡洛模拟参数"""
+    """
+    蒙特卡洛模拟参数（不可变）。
+
+    需要调整参数时使用 dataclasses.replace 构造新实例。
+    """
     current_price: float
     underlying_price: float
     strike: float
@@ -30,6 +59,7 @@ class SimulationParameters:
     risk_free_rate: float = 0.048
     simulations: int = 10000
     first_day_fraction: float = 1.0  # 第一交易日的有效时间比例 (0.0-1.0)
+    antithetic: bool = False  # 对偶变量法：每个随机冲击Z同时使用-Z，降低估计方差
 
 
 @dataclass
@@ -58,6 +88,10 @@ class MonteCarloEngine:
         self.executor = ThreadPoolExecutor(max_workers=4)
         self.tradier_client = tradier_client
 
+        # 每步的标量系数只依赖参数，构造时计算一次
+        self._first_step = self._step_constants(params.first_day_fraction / 365)
+        self._full_step = self._step_constants(1 / 365)
+
     async def simulate_price_paths(self) -> np.ndarray:
         """
         使用并行处理模拟期权价格路径。
@@ -65,29 +99,117 @@ class MonteCarloEngine:
         Returns:
             形状为(simulations, days_to_expiry)的价格路径数组
         """
-        # 将模拟分割到多个worker进行并行处理
+        # 将模拟分割到多个worker进行并行处理，每个chunk使用独立的随机数生成器
         chunk_size = self.params.simulations // 4
+        rngs = self._chunk_rngs(4)
         tasks = []
 
         for i in range(4):
             start_idx = i * chunk_size
             end_idx = start_idx + chunk_size if i < 3 else self.params.simulations
-            task = self._simulate_chunk(start_idx, end_idx)
+            task = self._simulate_chunk(start_idx, end_idx, rngs[i])
             tasks.append(task)
 
         chunks = await asyncio.gather(*tasks)
         return np.vstack(chunks)
 
-    async def _simulate_chunk(self, start_idx: int, end_idx: int) -> np.ndarray:
+    async def simulate_and_detect(
+        self,
+        limit_price: float,
+        order_side: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        include_touch_probability: bool = True,
+        current_price: Optional[float] = None,
+        expiration_date: Optional[str] = None,
+        market_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        分块模拟价格路径并检测成交，只累加首次成交日直方图。
+
+        每个chunk的路径矩阵在检测后立即丢弃，峰值内存为
+        O(worker数 × chunk_size × days)，而非 O(simulations × days)。
+
+        Args:
+            limit_price: 目标限价
+            order_side: "buy" 或 "sell"
+            chunk_size: 每批模拟的路径数
+            include_touch_probability: 追踪价格是否触及限价
+            current_price: 当前价格（用于检查即刻成交）
+            expiration_date: 到期日期 YYYY-MM-DD 格式
+            market_context: 市场上下文
+
+        Returns:
+            与 FillDetector.detect_fills 相同结构的成交统计数据
+        """
+        days = self.params.days_to_expiry
+        num_paths = self.params.simulations
+
+        if FillDetector._is_immediate_fill(limit_price, order_side, current_price):
+            # 即刻成交：所有路径在第0天成交，无需模拟
+            fill_day_counts = np.zeros(days, dtype=np.intp)
+            fill_day_counts[:1] = num_paths
+        else:
+            loop = asyncio.get_running_loop()
+            starts = range(0, num_paths, chunk_size)
+            histograms = await asyncio.gather(*(
+                loop.run_in_executor(
+                    self.executor,
+                    self._fill_histogram_chunk,
+                    min(chunk_size, num_paths - start),
+                    limit_price,
+                    order_side,
+                    rng
+                )
+                for start, rng in zip(starts, self._chunk_rngs(len(starts)))
+            ))
+            fill_day_counts = np.sum(histograms, axis=0, dtype=np.intp)
+
+        return FillDetector.summarize_fill_histogram(
+            fill_day_counts,
+            num_paths,
+            include_touch_probability=include_touch_probability,
+            first_day_fraction=self.params.first_day_fraction,
+            expiration_date=expiration_date,
+            market_context=market_context
+        )
+
+    def _fill_histogram_chunk(
+        self,
+        num_paths: int,
+        limit_price: float,
+        order_side: str,
+        rng: np.random.Generator
+    ) -> np.ndarray:
+        """模拟一批路径并返回首次成交日直方图（路径矩阵不保留）"""
+        paths = self._simulate_paths_vectorized(num_paths, rng)
+        fills = FillDetector._fill_condition(order_side)(paths, limit_price)
+        return FillDetector._fill_day_histogram(
+            FillDetector._first_fill_days(fills), self.params.days_to_expiry
+        )
+
+    async def _simulate_chunk(self, start_idx: int, end_idx: int, rng: np.random.Generator) -> np.ndarray:
         """并行模拟一批价格路径"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
             self.executor,
             self._simulate_paths_vectorized,
-            end_idx - start_idx
+            end_idx - start_idx,
+            rng
         )
 
-    def _simulate_paths_vectorized(self, num_paths: int) -> np.ndarray:
+    @staticmethod
+    def _chunk_rngs(num_chunks: int) -> List[np.random.Generator]:
+        """
+        为每个chunk派生独立的随机数生成器。
+
+        根种子在调用线程上从全局 np.random 状态抽取一次，再用 SeedSequence.spawn
+        派生子流。各chunk只使用自己的生成器，结果与线程调度顺序无关；
+        np.random.seed() 之后的运行可复现。
+        """
+        root = np.random.SeedSequence(int(np.random.randint(0, 2**63 - 1, dtype=np.int64)))
+        return [np.random.default_rng(child) for child in root.spawn(num_chunks)]
+
+    def _simulate_paths_vectorized(self, num_paths: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
         """
         使用NumPy的向量化价格路径模拟。
 
@@ -99,118 +221,97 @@ class MonteCarloEngine:
         期权价格变化:
         ΔP = Delta * ΔS + 0.5 * Gamma * ΔS² + Theta * dt
         """
-        # 初始化数组
-        days = self.params.days_to_expiry
-        stock_paths = np.zeros((num_paths, days))
-        option_paths = np.zeros((num_paths, days))
-
-        # 基准价格（起点）
-        base_stock_price = self.params.underlying_price
-        base_option_price = self.params.current_price
-
-        # 向量化随机游走
-        for t in range(days):
-            # 确定时间步长和起点价格
-            if t == 0:
-                # 第一天：使用 first_day_fraction（支持部分交易日）
-                dt = self.params.first_day_fraction / 365
-                prev_stock = base_stock_price
-                prev_option = base_option_price
-            else:
-                # 后续天数：完整交易日
-                dt = 1 / 365
-                prev_stock = stock_paths[:, t-1]
-                prev_option = option_paths[:, t-1]
-
-            # 如果没有剩余时间，保持价格不变
-            if dt <= 0:
-                stock_paths[:, t] = prev_stock
-                option_paths[:, t] = prev_option
-                continue
-
-            sqrt_dt = np.sqrt(dt)
-
-            # 生成随机冲击
-            Z = np.random.standard_normal(num_paths)
-
-            # 股票价格演化 (几何布朗运动)
-            drift = -0.5 * self.params.effective_volatility ** 2 * dt
-            diffusion = self.params.effective_volatility * sqrt_dt * Z
-            stock_paths[:, t] = prev_stock * np.exp(drift + diffusion)
-
-            # 计算股票价格变化
-            delta_S = stock_paths[:, t] - prev_stock
+        return self._simulate_paths_with_stock_vectorized(num_paths, rng)['option_close']
 
-            # 期权价格变化 (二阶近似)
-            delta_option = (
-                self.params.delta * delta_S +
-                0.5 * self.params.gamma * delta_S ** 2 +
-                self.params.theta * dt
-            )
-
-            # 更新期权价格并设置下界
-            option_paths[:, t] = np.maximum(
-                0,
-                prev_option + delta_option
-            )
-
-        return option_paths
-
-    def _simulate_paths_with_stock_vectorized(self, num_paths: int) -> Dict[str, np.ndarray]:
+    def _simulate_paths_with_stock_vectorized(
+        self,
+        num_paths: int,
+        rng: Optional[np.random.Generator] = None
+    ) -> Dict[str, np.ndarray]:
         """
         模拟价格路径，同时返回股票和期权价格
 
+        Args:
+            num_paths: 路径数
+            rng: 随机数生成器（默认派生一个新的）
+
         Returns:
             {
                 'option_close': 期权收盘价路径,
                 'stock_close': 股票收盘价路径
             }
         """
+        if rng is None:
+            rng = self._chunk_rngs(1)[0]
+
         days = self.params.days_to_expiry
         stock_paths = np.zeros((num_paths, days))
         option_paths = np.zeros((num_paths, days))
 
-        base_stock_price = self.params.underlying_price
-        base_option_price = self.params.current_price
+        # 基准价格（起点）
+        prev_stock = self.params.underlying_price
+        prev_option = self.params.current_price
+
+        delta = self.params.delta
+        half_gamma = 0.5 * self.params.gamma
 
         for t in range(days):
-            if t == 0:
-                dt = self.params.first_day_fraction / 365
-                prev_stock = base_stock_price
-                prev_option = base_option_price
-            else:
-                dt = 1 / 365
-                prev_stock = stock_paths[:, t-1]
-                prev_option = option_paths[:, t-1]
+            # 第一天使用 first_day_fraction（支持部分交易日），后续为完整交易日
+            step = self._first_step if t == 0 else self._full_step
 
-            if dt <= 0:
+            # 如果没有剩余时间，保持价格不变
+            if step is None:
                 stock_paths[:, t] = prev_stock
                 option_paths[:, t] = prev_option
-                continue
-
-            sqrt_dt = np.sqrt(dt)
-            Z = np.random.standard_normal(num_paths)
-
-            # 股票价格演化
-            drift = -0.5 * self.params.effective_volatility ** 2 * dt
-            diffusion = self.params.effective_volatility * sqrt_dt * Z
-            stock_paths[:, t] = prev_stock * np.exp(drift + diffusion)
-
-            # 期权价格变化
-            delta_S = stock_paths[:, t] - prev_stock
-            delta_option = (
-                self.params.delta * delta_S +
-                0.5 * self.params.gamma * delta_S ** 2 +
-                self.params.theta * dt
-            )
+            else:
+                drift, diffusion_scale, theta_decay = step
+
+                # 股票价格演化 (几何布朗运动)
+                Z = self._draw_shocks(num_paths, rng)
+                stock_paths[:, t] = prev_stock * np.exp(drift + diffusion_scale * Z)
+
+                # 期权价格变化 (二阶近似)，并设置下界
+                delta_S = stock_paths[:, t] - prev_stock
+                delta_option = delta * delta_S + half_gamma * delta_S ** 2 + theta_decay
+                option_paths[:, t] = np.maximum(0, prev_option + delta_option)
 
-            option_paths[:, t] = np.maximum(0, prev_option + delta_option)
+            prev_stock = stock_paths[:, t]
+            prev_option = option_paths[:, t]
 
         return {
             'option_close': option_paths,
             'stock_close': stock_paths
         }
 
+    def _draw_shocks(self, num_paths: int, rng: np.random.Generator) -> np.ndarray:
+        """
+        生成单步的标准正态随机冲击。
+
+        启用对偶变量法时只抽取一半的Z，另一半路径使用-Z。成对路径负相关，
+        成交概率估计的方差更低，达到相同标准误差所需的模拟次数约减半。
+        """
+        if not self.params.antithetic:
+            return rng.standard_normal(num_paths)
+
+        half = rng.standard_normal((num_paths + 1) // 2)
+        return np.concatenate((half, -half))[:num_paths]
+
+    def _step_constants(self, dt: float) -> Optional[Tuple[float, float, float]]:
+        """
+        预计算单步的标量系数 (drift, σ√dt, θ·dt)。
+
+        dt <= 0 时返回 None，表示该步价格保持不变。
+        """
+        if dt <= 0:
+            return None
+
+        sigma = self.params.effective_volatility
+        return (
+            -0.5 * sigma ** 2 * dt,
+            sigma * math.sqrt(dt),
+            self.params.theta * dt
+        )
+
     async def simulate_price_paths_with_intraday(
         self,
         symbol: str,
@@ -250,12 +351,13 @@ class MonteCarloEngine:
         # 模拟收盘价路径（包含股票和期权）
         # 使用并行处理
         chunk_size = self.params.simulations // 4
+        rngs = self._chunk_rngs(4)
         tasks = []
 
         for i in range(4):
             start_idx = i * chunk_size
             end_idx = start_idx + chunk_size if i < 3 else self.params.simulations
-            task = self._simulate_chunk_with_stock(start_idx, end_idx)
+            task = self._simulate_chunk_with_stock(start_idx, end_idx, rngs[i])
             tasks.append(task)
 
         chunks = await asyncio.gather(*tasks)
@@ -276,13 +378,140 @@ class MonteCarloEngine:
 
         return intraday_paths
 
-    async def _simulate_chunk_with_stock(self, start_idx: int, end_idx: int) -> Dict[str, np.ndarray]:
+    async def simulate_and_detect_with_intraday(
+        self,
+        symbol: str,
+        limit_price: float,
+        order_side: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        lookback_days: int = 90,
+        include_touch_probability: bool = True,
+        current_price: Optional[float] = None,
+        expiration_date: Optional[str] = None,
+        market_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        分块模拟并检测日内触及成交，结果与
+        simulate_price_paths_with_intraday + FillDetector.detect_fills_with_intraday 结构相同。
+
+        日内范围只估计一次；每个chunk生成收盘/高/低路径后立即检测，只返回
+        日内触及和仅收盘价两个首次成交日直方图，不保留完整路径矩阵。
+
+        Args:
+            symbol: 股票代码
+            limit_price: 目标限价
+            order_side: "buy" 或 "sell"
+            chunk_size: 每批模拟的路径数
+            lookback_days: 用于估计日内波动的历史数据天数
+            include_touch_probability: 追踪价格是否触及限价
+            current_price: 当前价格（用于检查即刻成交）
+            expiration_date: 到期日期 YYYY-MM-DD 格式
+            market_context: 市场上下文
+
+        Returns:
+            综合成交统计数据（包含日内触及分析）
+        """
+        days = self.params.days_to_expiry
+        num_paths = self.params.simulations
+
+        if FillDetector._is_immediate_fill(limit_price, order_side, current_price):
+            # 即刻成交：所有路径在第0天成交，无需模拟
+            fill_day_counts = np.zeros(days, dtype=np.intp)
+            fill_day_counts[:1] = num_paths
+            close_only_counts = fill_day_counts
+        else:
+            range_estimate = None
+            if self.tradier_client:
+                from .intraday_volatility import IntradayVolatilityEstimator
+
+                estimator = IntradayVolatilityEstimator(self.tradier_client)
+                range_estimate = await estimator.estimate_intraday_range(
+                    symbol=symbol,
+                    lookback_days=lookback_days
+                )
+
+            loop = asyncio.get_running_loop()
+            starts = range(0, num_paths, chunk_size)
+            histograms = await asyncio.gather(*(
+                loop.run_in_executor(
+                    self.executor,
+                    self._intraday_fill_histograms_chunk,
+                    min(chunk_size, num_paths - start),
+                    limit_price,
+                    order_side,
+                    range_estimate,
+                    rng
+                )
+                for start, rng in zip(starts, self._chunk_rngs(len(starts)))
+            ))
+            fill_day_counts = np.sum([h[0] for h in histograms], axis=0, dtype=np.intp)
+            close_only_counts = np.sum([h[1] for h in histograms], axis=0, dtype=np.intp)
+
+        result = FillDetector.summarize_fill_histogram(
+            fill_day_counts,
+            num_paths,
+            include_touch_probability=include_touch_probability,
+            first_day_fraction=self.params.first_day_fraction,
+            expiration_date=expiration_date,
+            market_context=market_context
+        )
+        return FillDetector._add_close_only_comparison(
+            result, int(close_only_counts.sum()) / num_paths
+        )
+
+    def _intraday_fill_histograms_chunk(
+        self,
+        num_paths: int,
+        limit_price: float,
+        order_side: str,
+        range_estimate,
+        rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        模拟一批路径，返回 (日内触及, 仅收盘价) 首次成交日直方图。
+
+        range_estimate 为 None（无tradier_client）时回退为高点=低点=收盘价。
+        """
+        days = self.params.days_to_expiry
+        paths = self._simulate_paths_with_stock_vectorized(num_paths, rng)
+        close_prices = paths['option_close']
+        fill_condition = FillDetector._fill_condition(order_side)
+
+        if range_estimate is None:
+            touch_prices = close_prices
+        else:
+            from .intraday_volatility import IntradayVolatilityEstimator
+
+            high_prices, low_prices = IntradayVolatilityEstimator.option_intraday_bounds(
+                close_prices,
+                paths['stock_close'],
+                range_estimate,
+                self.params.delta,
+                self.params.gamma
+            )
+            touch_prices = low_prices if order_side == "buy" else high_prices
+
+        touch_histogram = FillDetector._fill_day_histogram(
+            FillDetector._first_fill_days(fill_condition(touch_prices, limit_price)), days
+        )
+        close_histogram = FillDetector._fill_day_histogram(
+            FillDetector._first_fill_days(fill_condition(close_prices, limit_price)), days
+        )
+        return touch_histogram, close_histogram
+
+    async def _simulate_chunk_with_stock(
+        self,
+        start_idx: int,
+        end_idx: int,
+        rng: np.random.Generator
+    ) -> Dict[str, np.ndarray]:
         """并行模拟一批价格路径（包含股票价格）"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
             self.executor,
             self._simulate_paths_with_stock_vectorized,
-            end_idx - start_idx
+            end_idx - start_idx,
+            rng
         )
 
     def __del__(self):
@@ -340,10 +569,13 @@ class VolatilityMixer:
                 "method": "iv_only_fallback"
             }
 
-        # 计算历史波动率
-        prices = [row["close"] for row in history_result["preview_records"]]
-        returns = np.diff(np.log(prices))
-        hv = np.std(returns) * np.sqrt(252)  # 年化
+        # 计算历史波动率（直接填充预分配的float64数组，不经过DataFrame）
+        records = history_result["preview_records"]
+        closes = np.fromiter(
+            (row["close"] for row in records), dtype=np.float64, count=len(records)
+        )
+        returns = np.diff(np.log(closes))
+        hv = float(returns.std() * np.sqrt(252))  # 年化
 
         # 如果启用动态加权，计算权重
         if dynamic_weights:
@@ -379,40 +611,73 @@ class VolatilityMixer:
 class FillDetector:
     """
     高级成交检测，考虑市场微观结构。
+
+    所有统计量都由"首次成交日直方图"（每天首次成交的路径数）推导，
+    因此既可以对完整路径矩阵计算，也可以分块模拟后累加直方图再计算。
     """
 
     @staticmethod
-    def detect_fills(
-        price_paths: np.ndarray,
+    def _fill_condition(order_side: str):
+        """返回成交判断函数：买单 price <= limit，卖单 price >= limit"""
+        return np.less_equal if order_side == "buy" else np.greater_equal
+
+    @staticmethod
+    def _is_immediate_fill(
         limit_price: float,
         order_side: str,
-        include_touch_probability: bool = True,
-        first_day_fraction: float = 1.0,
-        current_price: Optional[float] = None,
-        expiration_date: Optional[str] = None,
-        market_context: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
+        current_price: Optional[float]
+    ) -> bool:
+        """检查限价是否已满足当前价格条件（即刻成交）"""
+        if current_price is None:
+            return False
+        return bool(FillDetector._fill_condition(order_side)(current_price, limit_price))
+
+    @staticmethod
+    def _first_fill_days(fills: np.ndarray) -> np.ndarray:
         """
-        检测所有模拟路径中的成交情况。
+        向量化计算每条路径的首次成交日索引。
 
         Args:
-            price_paths: 模拟的价格路径数组
-            limit_price: 目标限价
-            order_side: "buy" 或 "sell"
-            include_touch_probability: 追踪价格是否触及限价
-            first_day_fraction: 第一交易日的有效时间比例 (0.0-1.0)
-            current_price: 当前价格（用于检查即刻成交）
-            expiration_date: 到期日期 YYYY-MM-DD 格式
-            market_context: 市场上下文（包含 eastern_time, first_day_is_today 等）
+            fills: 形状为(num_paths, days)的布尔成交矩阵
 
         Returns:
-            综合成交统计数据
+            首次成交日索引数组，从未成交的路径为 -1
         """
-        from datetime import datetime, timedelta
+        if fills.shape[1] == 0:
+            return np.full(fills.shape[0], -1, dtype=np.intp)
 
-        num_paths, days = price_paths.shape
+        first_fill_days = fills.argmax(axis=1)
+        first_fill_days[~fills.any(axis=1)] = -1
+        return first_fill_days
+
+    @staticmethod
+    def _fill_day_histogram(first_fill_days: np.ndarray, days: int) -> np.ndarray:
+        """统计每天首次成交的路径数（长度为days，不含未成交路径）"""
+        return np.bincount(first_fill_days[first_fill_days >= 0], minlength=days)
 
-        # 生成日期映射：天数索引 → 日历日期
+    @staticmethod
+    def _add_close_only_comparison(
+        result: Dict[str, Any],
+        fill_probability_close_only: float
+    ) -> Dict[str, Any]:
+        """在日内触及统计结果中加入仅收盘价成交概率（对比）及改进幅度"""
+        probability_improvement = result["fill_probability"] - fill_probability_close_only
+
+        result.update({
+            "fill_probability_close_only": float(fill_probability_close_only),
+            "probability_improvement": float(probability_improvement),
+            "improvement_percentage": float(probability_improvement / fill_probability_close_only * 100) if fill_probability_close_only > 0 else None,
+            "uses_intraday_detection": True  # 标记使用了日内检测
+        })
+        return result
+
+    @staticmethod
+    def _calendar_date_mapping(
+        days: int,
+        expiration_date: Optional[str],
+        market_context: Optional[Dict[str, Any]]
+    ) -> Dict[int, str]:
+        """生成日期映射：天数索引 → 日历日期"""
         day_to_calendar_date = {}
         if expiration_date and market_context:
             try:
@@ -431,53 +696,49 @@ class FillDetector:
                         day_to_calendar_date[day_idx] = calendar_date.strftime("%Y-%m-%d")
             except Exception:
                 pass  # 如果日期解析失败，继续不带日期
+        return day_to_calendar_date
 
-        # 检查是否即刻成交（限价已满足当前价格条件）
-        immediate_fill = False
-        if current_price is not None:
-            if order_side == "buy":
-                immediate_fill = limit_price >= current_price
-            else:  # sell
-                immediate_fill = limit_price <= current_price
-
-        # 确定成交条件
-        if order_side == "buy":
-            # 买单在价格 <= 限价时成交
-            fills = price_paths <= limit_price
-        else:
-            # 卖单在价格 >= 限价时成交
-            fills = price_paths >= limit_price
+    @staticmethod
+    def summarize_fill_histogram(
+        fill_day_counts: np.ndarray,
+        num_paths: int,
+        include_touch_probability: bool = True,
+        first_day_fraction: float = 1.0,
+        expiration_date: Optional[str] = None,
+        market_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        根据首次成交日直方图计算综合成交统计数据。
 
-        # 找到每条路径的首次成交日
-        first_fill_days = np.full(num_paths, -1)
-        touched = np.zeros(num_paths, dtype=bool)
+        Args:
+            fill_day_counts: 每天首次成交的路径数，长度为模拟天数
+            num_paths: 模拟路径总数（含未成交路径）
+            include_touch_probability: 追踪价格是否触及限价
+            first_day_fraction: 第一交易日的有效时间比例 (0.0-1.0)
+            expiration_date: 到期日期 YYYY-MM-DD 格式
+            market_context: 市场上下文（包含 eastern_time, first_day_is_today 等）
 
-        # 如果即刻成交，所有路径在第0天成交
-        if immediate_fill:
-            first_fill_days[:] = 0
-            touched[:] = True
-        else:
-            for i in range(num_paths):
-                fill_indices = np.where(fills[i])[0]
-                if len(fill_indices) > 0:
-                    first_fill_days[i] = fill_indices[0]
-                    touched[i] = True
+        Returns:
+            综合成交统计数据
+        """
+        days = len(fill_day_counts)
+        day_to_calendar_date = FillDetector._calendar_date_mapping(
+            days, expiration_date, market_context
+        )
 
         # 计算统计数据
-        filled_mask = first_fill_days >= 0
-        fill_probability = np.mean(filled_mask)
-
-        if np.any(filled_mask):
-            expected_days = np.mean(first_fill_days[filled_mask])
-            median_days = np.median(first_fill_days[filled_mask])
-
-            # 计算已成交订单的百分位数
-            percentiles = {
-                25: np.percentile(first_fill_days[filled_mask], 25),
-                50: median_days,
-                75: np.percentile(first_fill_days[filled_mask], 75),
-                90: np.percentile(first_fill_days[filled_mask], 90)
-            }
+        filled_count = int(fill_day_counts.sum())
+        fill_probability = filled_count / num_paths
+        cumulative_counts = np.cumsum(fill_day_counts)
+
+        if filled_count > 0:
+            expected_days = float(np.dot(np.arange(days), fill_day_counts) / filled_count)
+
+            # 计算已成交订单的百分位数（"lower"：取实际出现的成交日）
+            ranks = np.floor(np.multiply(_PERCENTILE_QUANTILES, filled_count - 1))
+            quantiles = np.searchsorted(cumulative_counts, ranks, side="right")
+            percentiles = dict(zip(_PERCENTILE_KEYS, quantiles.astype(float)))
+            median_days = percentiles[50]
         else:
             expected_days = float('inf')
             median_days = float('inf')
@@ -486,33 +747,26 @@ class FillDetector:
 
         # 计算每日成交概率
         daily_fills = []
-        cumulative_prob = 0
-
-        for day in range(days):
-            daily_fill_count = np.sum(first_fill_days == day)
-            daily_prob = daily_fill_count / num_paths
-            cumulative_prob += daily_prob
-
-            if daily_prob > 0:
-                day_entry = {
-                    "day": day + 1,  # 第1天、第2天...
-                    "daily_prob": daily_prob,
-                    "cumulative_prob": cumulative_prob,
-                    "is_partial_day": (day == 0 and first_day_fraction < 1.0)
-                }
+        for day in np.flatnonzero(fill_day_counts):
+            day = int(day)
+            day_entry = {
+                "day": day + 1,  # 第1天、第2天...
+                "daily_prob": fill_day_counts[day] / num_paths,
+                "cumulative_prob": cumulative_counts[day] / num_paths,
+                "is_partial_day": (day == 0 and first_day_fraction < 1.0)
+            }
 
-                # 添加日历日期
-                if day in day_to_calendar_date:
-                    day_entry["calendar_date"] = day_to_calendar_date[day]
+            # 添加日历日期
+            if day in day_to_calendar_date:
+                day_entry["calendar_date"] = day_to_calendar_date[day]
 
-                daily_fills.append(day_entry)
+            daily_fills.append(day_entry)
 
         # 计算第一天成交概率 (day index = 0)
-        first_day_fill_count = np.sum(first_fill_days == 0)
-        first_day_prob = first_day_fill_count / num_paths
+        first_day_prob = fill_day_counts[0] / num_paths if days > 0 else 0.0
 
         # 触及概率 (价格在任意时刻达到限价)
-        touch_probability = np.mean(touched) if include_touch_probability else None
+        touch_probability = fill_probability if include_touch_probability else None
 
         # 生成百分位数的友好描述（替代"第0天"混淆表述）
         percentile_descriptions = {}
@@ -557,6 +811,54 @@ class FillDetector:
             "no_fill_probability": float(1 - fill_probability)
         }
 
+    @staticmethod
+    def detect_fills(
+        price_paths: np.ndarray,
+        limit_price: float,
+        order_side: str,
+        include_touch_probability: bool = True,
+        first_day_fraction: float = 1.0,
+        current_price: Optional[float] = None,
+        expiration_date: Optional[str] = None,
+        market_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        检测所有模拟路径中的成交情况。
+
+        Args:
+            price_paths: 模拟的价格路径数组
+            limit_price: 目标限价
+            order_side: "buy" 或 "sell"
+            include_touch_probability: 追踪价格是否触及限价
+            first_day_fraction: 第一交易日的有效时间比例 (0.0-1.0)
+            current_price: 当前价格（用于检查即刻成交）
+            expiration_date: 到期日期 YYYY-MM-DD 格式
+            market_context: 市场上下文（包含 eastern_time, first_day_is_today 等）
+
+        Returns:
+            综合成交统计数据
+        """
+        num_paths, days = price_paths.shape
+
+        # 找到每条路径的首次成交日；如果即刻成交，所有路径在第0天成交
+        # 买单在价格 <= 限价时成交，卖单在价格 >= 限价时成交
+        if FillDetector._is_immediate_fill(limit_price, order_side, current_price):
+            first_fill_days = np.zeros(num_paths, dtype=np.intp)
+        else:
+            fill_condition = FillDetector._fill_condition(order_side)
+            first_fill_days = FillDetector._first_fill_days(
+                fill_condition(price_paths, limit_price)
+            )
+
+        return FillDetector.summarize_fill_histogram(
+            FillDetector._fill_day_histogram(first_fill_days, days),
+            num_paths,
+            include_touch_probability=include_touch_probability,
+            first_day_fraction=first_day_fraction,
+            expiration_date=expiration_date,
+            market_context=market_context
+        )
+
     @staticmethod
     def detect_fills_with_intraday(
         price_paths: Dict[str, np.ndarray],
@@ -588,175 +890,42 @@ class FillDetector:
         Returns:
             综合成交统计数据（包含日内触及分析）
         """
-        from datetime import datetime, timedelta
-
         close_prices = price_paths['close']
         high_prices = price_paths.get('high', close_prices)
         low_prices = price_paths.get('low', close_prices)
 
         num_paths, days = close_prices.shape
 
-        # 生成日期映射
-        day_to_calendar_date = {}
-        if expiration_date and market_context:
-            try:
-                eastern_time = market_context.get("eastern_time")
-                if eastern_time:
-                    if market_context.get("first_day_is_today"):
-                        first_calendar_date = eastern_time.date()
-                    else:
-                        first_calendar_date = eastern_time.date() + timedelta(days=1)
-
-                    for day_idx in range(days):
-                        calendar_date = first_calendar_date + timedelta(days=day_idx)
-                        day_to_calendar_date[day_idx] = calendar_date.strftime("%Y-%m-%d")
-            except Exception:
-                pass
-
-        # 检查是否即刻成交
-        immediate_fill = False
-        if current_price is not None:
-            if order_side == "buy":
-                immediate_fill = limit_price >= current_price
-            else:
-                immediate_fill = limit_price <= current_price
-
         # 确定成交条件（考虑日内高低点）
-        if order_side == "buy":
-            # 买单：日内最低价 <= 限价时成交
-            fills = low_prices <= limit_price
+        # 买单：日内最低价 <= 限价时成交；卖单：日内最高价 >= 限价时成交
+        fill_condition = FillDetector._fill_condition(order_side)
+        touch_prices = low_prices if order_side == "buy" else high_prices
+
+        # 找到每条路径的首次成交日（同时计算仅基于收盘价的成交，用于对比）
+        if FillDetector._is_immediate_fill(limit_price, order_side, current_price):
+            first_fill_days = np.zeros(num_paths, dtype=np.intp)
+            first_fill_days_close_only = np.zeros(num_paths, dtype=np.intp)
         else:
-            # 卖单：日内最高价 >= 限价时成交
-            fills = high_prices >= limit_price
-
-        # 同时计算仅基于收盘价的成交（用于对比）
-        if order_side == "buy":
-            fills_close_only = close_prices <= limit_price
-        else:
-            fills_close_only = close_prices >= limit_price
-
-        # 找到每条路径的首次成交日
-        first_fill_days = np.full(num_paths, -1)
-        first_fill_days_close_only = np.full(num_paths, -1)
-        touched = np.zeros(num_paths, dtype=bool)
-
-        if immediate_fill:
-            first_fill_days[:] = 0
-            first_fill_days_close_only[:] = 0
-            touched[:] = True
-        else:
-            for i in range(num_paths):
-                # 日内触及检测
-                fill_indices = np.where(fills[i])[0]
-                if len(fill_indices) > 0:
-                    first_fill_days[i] = fill_indices[0]
-                    touched[i] = True
-
-                # 仅收盘价检测
-                fill_indices_close = np.where(fills_close_only[i])[0]
-                if len(fill_indices_close) > 0:
-                    first_fill_days_close_only[i] = fill_indices_close[0]
-
-        # 计算统计数据 - 日内触及
-        filled_mask = first_fill_days >= 0
-        fill_probability = np.mean(filled_mask)
-
-        # 计算统计数据 - 仅收盘价（对比）
-        filled_mask_close_only = first_fill_days_close_only >= 0
-        fill_probability_close_only = np.mean(filled_mask_close_only)
-
-        if np.any(filled_mask):
-            expected_days = np.mean(first_fill_days[filled_mask])
-            median_days = np.median(first_fill_days[filled_mask])
-
-            percentiles = {
-                25: np.percentile(first_fill_days[filled_mask], 25),
-                50: median_days,
-                75: np.percentile(first_fill_days[filled_mask], 75),
-                90: np.percentile(first_fill_days[filled_mask], 90)
-            }
-        else:
-            expected_days = float('inf')
-            median_days = float('inf')
-            percentiles = {25: float('inf'), 50: float('inf'),
-                         75: float('inf'), 90: float('inf')}
-
-        # 计算每日成交概率
-        daily_fills = []
-        cumulative_prob = 0
-
-        for day in range(days):
-            daily_fill_count = np.sum(first_fill_days == day)
-            daily_prob = daily_fill_count / num_paths
-            cumulative_prob += daily_prob
-
-            if daily_prob > 0:
-                day_entry = {
-                    "day": day + 1,
-                    "daily_prob": daily_prob,
-                    "cumulative_prob": cumulative_prob,
-                    "is_partial_day": (day == 0 and first_day_fraction < 1.0)
-                }
-
-                if day in day_to_calendar_date:
-                    day_entry["calendar_date"] = day_to_calendar_date[day]
-
-                daily_fills.append(day_entry)
-
-        # 第一天成交概率
-        first_day_fill_count = np.sum(first_fill_days == 0)
-        first_day_prob = first_day_fill_count / num_paths
-
-        # 触及概率
-        touch_probability = np.mean(touched) if include_touch_probability else None
-
-        # 百分位数描述
-        percentile_descriptions = {}
-        for pct, day_value in percentiles.items():
-            if day_value == float('inf'):
-                percentile_descriptions[pct] = "不太可能成交"
-            else:
-                day_idx = int(day_value)
-
-                if day_idx == 0:
-                    desc = "今日成交"
-                elif day_idx == 1:
-                    desc = "明日成交"
-                else:
-                    desc = f"{day_idx + 1}天内成交"
-
-                if day_idx in day_to_calendar_date:
-                    desc += f" ({day_to_calendar_date[day_idx]} EDT)"
-
-                percentile_descriptions[pct] = desc
+            first_fill_days = FillDetector._first_fill_days(
+                fill_condition(touch_prices, limit_price)
+            )
+            first_fill_days_close_only = FillDetector._first_fill_days(
+                fill_condition(close_prices, limit_price)
+            )
 
-        # 计算改进幅度
-        probability_improvement = fill_probability - fill_probability_close_only
+        result = FillDetector.summarize_fill_histogram(
+            FillDetector._fill_day_histogram(first_fill_days, days),
+            num_paths,
+            include_touch_probability=include_touch_probability,
+            first_day_fraction=first_day_fraction,
+            expiration_date=expiration_date,
+            market_context=market_context
+        )
 
-        return {
-            "fill_probability": float(fill_probability),
-            "fill_probability_close_only": float(fill_probability_close_only),
-            "probability_improvement": float(probability_improvement),
-            "improvement_percentage": float(probability_improvement / fill_probability_close_only * 100) if fill_probability_close_only > 0 else None,
-            "first_day_fill_probability": float(first_day_prob),
-            "expected_days_to_fill": float(expected_days) if expected_days != float('inf') else None,
-            "median_days_to_fill": float(median_days) if median_days != float('inf') else None,
-            "percentile_days": {k: float(v) for k, v in percentiles.items()},
-            "percentile_descriptions": percentile_descriptions,
-            "probability_by_day": [
-                {
-                    "day": int(item["day"]),
-                    "daily_prob": float(item["daily_prob"]),
-                    "cumulative_prob": float(item["cumulative_prob"]),
-                    "is_partial_day": bool(item["is_partial_day"]),
-                    "calendar_date": item.get("calendar_date")
-                }
-                for item in daily_fills[:10]
-            ],
-            "touch_probability": float(touch_probability) if touch_probability is not None else None,
-            "no_fill_probability": float(1 - fill_probability),
-            "uses_intraday_detection": True  # 标记使用了日内检测
-        }
+        # 计算统计数据 - 仅收盘价（对比）及改进幅度
+        return FillDetector._add_close_only_comparison(
+            result, float(np.mean(first_fill_days_close_only >= 0))
+        )
 
 
 class StatisticalAnalyzer:
@@ -775,11 +944,11 @@ class StatisticalAnalyzer:
         """
         fill_prob = simulation_results["fill_probability"]
 
-        # 二项比例的标准误差
+        # 二项比例的标准误差（纯标量运算，无需NumPy）
         if 0 < fill_prob < 1:
-            standard_error = np.sqrt(fill_prob * (1 - fill_prob) / num_simulations)
+            standard_error = math.sqrt(fill_prob * (1 - fill_prob) / num_simulations)
         else:
-            standard_error = 0
+            standard_error = 0.0
 
         # 95%置信区间
         z_score = 1.96  # 95%置信度
@@ -846,9 +1015,7 @@ class TheoreticalValidator:
             simulations=1000
         ))
 
-        paths = await engine.simulate_price_paths()
-        detector = FillDetector()
-        results = detector.detect_fills(paths, limit_price=10.0, order_side="sell")
+        results = await engine.simulate_and_detect(limit_price=10.0, order_side="sell")
         tests["limit_equals_current"] = results["fill_probability"] > 0.99
 
         # 测试2: 零波动率 → 确定性结果
@@ -905,11 +1072,8 @@ class TheoreticalValidator:
         engine_high = MonteCarloEngine(high_vol_params)
         engine_low = MonteCarloEngine(low_vol_params)
 
-        paths_high = await engine_high.simulate_price_paths()
-        paths_low = await engine_low.simulate_price_paths()
-
-        results_high = detector.detect_fills(paths_high, limit_price=11.0, order_side="sell")
-        results_low = detector.detect_fills(paths_low, limit_price=11.0, order_side="sell")
+        results_high = await engine_high.simulate_and_detect(limit_price=11.0, order_side="sell")
+        results_low = await engine_low.simulate_and_detect(limit_price=11.0, order_side="sell")
 
         tests["higher_vol_higher_prob"] = (
             results_high["fill_probability"] > results_low["fill_probability"]
@@ -949,11 +1113,8 @@ class TheoreticalValidator:
         engine_short = MonteCarloEngine(short_window)
         engine_long = MonteCarloEngine(long_window)
 
-        paths_short = await engine_short.simulate_price_paths()
-        paths_long = await engine_long.simulate_price_paths()
-
-        results_short = detector.detect_fills(paths_short, limit_price=10.5, order_side="sell")
-        results_long = detector.detect_fills(paths_long, limit_price=10.5, order_side="sell")
+        results_short = await engine_short.simulate_and_detect(limit_price=10.5, order_side="sell")
+        results_long = await engine_long.simulate_and_detect(limit_price=10.5, order_side="sell")
 
         tests["longer_window_higher_prob"] = (
             results_long["fill_probability"] >= results_short["fill_probability"]
@@ -963,11 +1124,10 @@ class TheoreticalValidator:
         tests["theta_decay_negative"] = high_vol_params.theta < 0
 
         # 测试6: 买卖逻辑对称性
-        results_buy = detector.detect_fills(paths_high, limit_price=9.0, order_side="buy")
-        results_sell = detector.detect_fills(paths_high, limit_price=11.0, order_side="sell")
+        results_buy = await engine_high.simulate_and_detect(limit_price=9.0, order_side="buy")
         tests["buy_sell_logic_correct"] = (
             results_buy["fill_probability"] > 0 and
-            results_sell["fill_probability"] > 0
+            results_high["fill_probability"] > 0
         )
 
         # 所有测试必须通过
@@ -1253,74 +1413,29 @@ class RecommendationEngine:
         # 计算价格调整
         price_diff = abs(limit_price - current_price)
 
-        if order_side == "sell":
-            # 对于卖单，较低价格 = 较高成交概率
-            scenarios = [
-                {
-                    "adjustment": -price_diff * 0.75,
-                    "scenario": "快速成交方案",
-                    "target_prob": 0.90
-                },
-                {
-                    "adjustment": -price_diff * 0.50,
-                    "scenario": "平衡方案",
-                    "target_prob": 0.80
-                },
-                {
-                    "adjustment": 0,
-                    "scenario": "当前限价",
-                    "target_prob": current_fill_prob
-                },
-                {
-                    "adjustment": price_diff * 0.50,
-                    "scenario": "高收益低概率",
-                    "target_prob": 0.40
-                }
-            ]
-        else:
-            # 对于买单，较高价格 = 较高成交概率
-            scenarios = [
-                {
-                    "adjustment": price_diff * 0.75,
-                    "scenario": "快速成交方案",
-                    "target_prob": 0.90
-                },
-                {
-                    "adjustment": price_diff * 0.50,
-                    "scenario": "平衡方案",
-                    "target_prob": 0.80
-                },
-                {
-                    "adjustment": 0,
-                    "scenario": "当前限价",
-                    "target_prob": current_fill_prob
-                },
-                {
-                    "adjustment": -price_diff * 0.50,
-                    "scenario": "低价高风险",
-                    "target_prob": 0.40
-                }
-            ]
+        # 对于卖单，较低价格 = 较高成交概率；对于买单，较高价格 = 较高成交概率
+        scenarios = _SELL_SCENARIOS if order_side == "sell" else _BUY_SCENARIOS
 
-        for scenario in scenarios:
-            alt_limit = limit_price + scenario["adjustment"]
+        for adjustment_ratio, scenario_name, target_prob in scenarios:
+            alt_limit = limit_price + price_diff * adjustment_ratio
 
             # 估计成交概率 (简化的替代方案)
             # 在生产环境中，会为每个方案运行小型模拟
-            if scenario["scenario"] == "当前限价":
+            if target_prob is None:
                 est_prob = current_fill_prob
                 est_days = 3.2  # 占位符
             else:
                 # 基于价格距离的启发式估计
                 price_ratio = abs(alt_limit - current_price) / current_price
-                est_prob = min(0.95, max(0.05, scenario["target_prob"]))
+                est_prob = min(0.95, max(0.05, target_prob))
                 est_days = max(0.5, 10 * price_ratio) if est_prob > 0 else None
 
             alternatives.append({
                 "limit_price": round(alt_limit, 2),
                 "fill_probability": est_prob,
                 "expected_days": est_days,
-                "scenario": scenario["scenario"]
+                "scenario": scenario_name
             })
 
-        return sorted(alternatives, key=lambda x: x["fill_probability"], reverse=True)
+        alternatives.sort(key=itemgetter("fill_probability"), reverse=True)
+        return alternatives
@@ -5,23 +5,66 @@ Provides comprehensive historical stock data retrieval, technical indicator
 calculation, and CSV file generation for the TradingAgent MCP Server.
 """
 
+import asyncio
 import os
 import re
 import time
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Any
 from zoneinfo import ZoneInfo
 
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import talib
+except ImportError:
+    talib = None  # TA-Lib not installed, fall back to pandas rolling windows
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None  # Numba not installed, fall back to pandas rolling windows
 
 from ..provider.tradier.client import TradierClient
 
 
+# US market timezone and the YYYY-MM-DD format used for all request/response dates
+_NY_TZ = ZoneInfo("America/New_York")
+_DATE_FMT = "%Y-%m-%d"
+
+# Relative date ranges like "30d", "3m", "1y"
+_RELATIVE_RANGE_RE = re.compile(r'^(\d+)([dmy])$')
+# Days per relative range unit (months and years are approximate)
+_RANGE_UNIT_DAYS = {'d': 1, 'm': 30, 'y': 365}
+
+# Supported output file formats (parquet requires the "parquet" extra / pyarrow)
+_FILE_FORMATS = ("csv", "parquet")
+
+# Indicator columns included in preview records, with their rounding precision
+_PREVIEW_INDICATOR_DIGITS = (
+    ('sma_20', 2),
+    ('ema_12', 2),
+    ('ema_26', 2),
+    ('atr_14', 2),
+    ('rsi_14', 2),
+    ('upper_bollinger', 2),
+    ('lower_bollinger', 2),
+    ('volatility', 4),
+    ('macd', 2),
+    ('macd_signal', 2),
+    ('macd_histogram', 2),
+)
+
+
 def parse_date_range(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None, 
-    date_range: Optional[str] = None
+    date_range: Optional[str] = None,
+    *,
+    _now: Optional[datetime] = None
 ) -> Tuple[str, str]:
     """
     Parse various date formats and return standardized start and end dates.
@@ -30,6 +73,7 @@ def parse_date_range(
         start_date: Start date in YYYY-MM-DD format (optional)
         end_date: End date in YYYY-MM-DD format (optional)
         date_range: Relative date range like "30d", "3m", "1y" (optional)
+        _now: Current New York time override for tests (defaults to the real clock)
     
     Returns:
         Tuple of (start_date, end_date) in YYYY-MM-DD format
@@ -37,8 +81,24 @@ def parse_date_range(
     Raises:
         ValueError: For invalid date formats or logic
     """
-    timezone = ZoneInfo("America/New_York")
-    current_date = datetime.now(timezone)
+    now = _now if _now is not None else datetime.now(_NY_TZ)
+    return _resolve_date_range(start_date, end_date, date_range, now.date())
+
+
+@lru_cache(maxsize=1024)
+def _resolve_date_range(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    date_range: Optional[str],
+    today: date
+) -> Tuple[str, str]:
+    """
+    Resolve a date range against ``today`` (New York calendar date).
+    
+    Pure function of its arguments, so repeated requests for the same window
+    on the same day are served from the cache.
+    """
+    current_date = today
     
     # Adjust current date to last trading day if weekend
     if current_date.weekday() >= 5:  # Saturday=5, Sunday=6
@@ -50,25 +110,16 @@ def parse_date_range(
         if not range_str:
             return timedelta(days=90)  # default
             
-        match = re.match(r'^(\d+)([dmy])$', range_str.lower())
+        match = _RELATIVE_RANGE_RE.match(range_str.lower())
         if not match:
             raise ValueError(f"Invalid date range format: {range_str}. Use format like '30d', '3m', '1y'")
             
-        value, unit = int(match.group(1)), match.group(2)
-        
-        if unit == 'd':
-            return timedelta(days=value)
-        elif unit == 'm':
-            return timedelta(days=value * 30)  # approximate months
-        elif unit == 'y':
-            return timedelta(days=value * 365)  # approximate years
-        else:
-            raise ValueError(f"Unsupported time unit: {unit}")
+        return timedelta(days=int(match.group(1)) * _RANGE_UNIT_DAYS[match.group(2)])
     
-    def parse_date(date_str: str) -> datetime:
+    def parse_date(date_str: str) -> date:
         """Parse date string and validate format."""
         try:
-            return datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone)
+            return datetime.strptime(date_str, _DATE_FMT).date()
         except ValueError:
             raise ValueError(f"Invalid date format: {date_str}. Use YYYY-MM-DD format")
     
@@ -94,7 +145,7 @@ def parse_date_range(
         if end_dt > current_date:
             end_dt = current_date
             
-        return start_date, end_dt.strftime("%Y-%m-%d")
+        return start_date, end_dt.strftime(_DATE_FMT)
     
     # Priority 3: end_date + date_range (backward from end)
     elif end_date and date_range:
@@ -102,22 +153,22 @@ def parse_date_range(
         range_delta = parse_relative_range(date_range)
         start_dt = end_dt - range_delta
         
-        return start_dt.strftime("%Y-%m-%d"), end_date
+        return start_dt.strftime(_DATE_FMT), end_date
         
     # Priority 4: date_range only (backward from current)
     elif date_range:
         range_delta = parse_relative_range(date_range)
         start_dt = current_date - range_delta
         
-        return start_dt.strftime("%Y-%m-%d"), current_date.strftime("%Y-%m-%d")
+        return start_dt.strftime(_DATE_FMT), current_date.strftime(_DATE_FMT)
     
     # Priority 5: no parameters (default 90 days)
     else:
         start_dt = current_date - timedelta(days=90)
-        return start_dt.strftime("%Y-%m-%d"), current_date.strftime("%Y-%m-%d")
+        return start_dt.strftime(_DATE_FMT), current_date.strftime(_DATE_FMT)
 
 
-def generate_csv_filename(symbol: str, start_date: str, end_date: str) -> str:
+def generate_csv_filename(symbol: str, start_date: str, end_date: str, extension: str = "csv") -> str:
     """
     Generate standardized CSV filename for stock history data.
     
@@ -125,15 +176,196 @@ def generate_csv_filename(symbol: str, start_date: str, end_date: str) -> str:
         symbol: Stock symbol
         start_date: Start date in YYYY-MM-DD format
         end_date: End date in YYYY-MM-DD format
+        extension: File extension ("csv" or "parquet")
         
     Returns:
-        Filename in format: {SYMBOL}_{start_date}_{end_date}_{timestamp}.csv
+        Filename in format: {SYMBOL}_{start_date}_{end_date}_{timestamp}.{extension}
     """
     timestamp = int(time.time())
-    filename = f"{symbol.upper()}_{start_date}_{end_date}_{timestamp}.csv"
+    filename = f"{symbol.upper()}_{start_date}_{end_date}_{timestamp}.{extension}"
     return os.path.join("data", filename)
 
 
+def _rolling_mean_loop(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rolling mean over a float64 array as a single running-sum pass.
+    
+    Mirrors ``pd.Series.rolling(window).mean()``: a position is NaN until a full
+    window is available and whenever the window contains a NaN.
+    """
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    total = 0.0
+    nan_count = 0
+    for i in range(n):
+        value = values[i]
+        if np.isnan(value):
+            nan_count += 1
+        else:
+            total += value
+        if i >= window:
+            dropped = values[i - window]
+            if np.isnan(dropped):
+                nan_count -= 1
+            else:
+                total -= dropped
+        if i >= window - 1 and nan_count == 0:
+            out[i] = total / window
+    return out
+
+
+_rolling_mean_jit = njit(cache=True)(_rolling_mean_loop) if njit is not None else None
+
+
+def _rolling_mean(series: pd.Series, window: int) -> pd.Series:
+    """
+    Simple moving average, using a compiled kernel when one is installed.
+    
+    TA-Lib's SMA agrees with ``rolling(window).mean()`` (up to float rounding)
+    only for NaN-free input, so NaN-bearing series go to the Numba kernel
+    (e.g. true range, whose first row is NaN) or to pandas.
+    """
+    values = series.to_numpy(dtype=np.float64)
+    if talib is not None and len(values) >= window and not np.isnan(values).any():
+        return pd.Series(talib.SMA(values, timeperiod=window), index=series.index)
+    if _rolling_mean_jit is not None:
+        return pd.Series(_rolling_mean_jit(values, window), index=series.index)
+    return series.rolling(window=window).mean()
+
+
+def _rolling_std(series: pd.Series, window: int) -> pd.Series:
+    """
+    Rolling sample standard deviation (ddof=1) matching ``series.rolling(window).std()``.
+    
+    Reduces a strided window view with NumPy instead of pandas' per-window
+    rolling machinery; windows containing NaN yield NaN as in pandas.
+    """
+    values = series.to_numpy(dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = sliding_window_view(values, window).std(axis=1, ddof=1)
+    return pd.Series(result, index=series.index)
+
+
+# Indicator columns produced by calculate_technical_indicators, in output order
+_INDICATOR_COLUMNS = (
+    'sma_20', 'ema_12', 'ema_26', 'atr_14', 'upper_bollinger', 'lower_bollinger',
+    'volatility', 'rsi_14', 'macd', 'macd_signal', 'macd_histogram',
+)
+
+
+def _indicator_loop(close: np.ndarray, high: np.ndarray, low: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Compute every indicator column in one pass over NaN-free close/high/low arrays.
+    
+    Reproduces the pandas formulas used by calculate_technical_indicators:
+    rolling means/sample std (ddof=1), ``ewm(span=...)`` with ``adjust=True``,
+    SMA-based ATR and RSI. Results are returned in ``_INDICATOR_COLUMNS`` order.
+    """
+    n = close.shape[0]
+    sma_20 = np.full(n, np.nan)
+    ema_12 = np.empty(n)
+    ema_26 = np.empty(n)
+    atr_14 = np.full(n, np.nan)
+    upper_bollinger = np.full(n, np.nan)
+    lower_bollinger = np.full(n, np.nan)
+    volatility = np.full(n, np.nan)
+    rsi_14 = np.full(n, np.nan)
+    macd = np.empty(n)
+    macd_signal = np.empty(n)
+    macd_histogram = np.empty(n)
+    
+    true_range = np.zeros(n)
+    returns = np.zeros(n)
+    gains = np.zeros(n)
+    losses = np.zeros(n)
+    
+    # ewm(adjust=True) weights observation t-k by (1 - alpha)**k, alpha = 2 / (span + 1)
+    decay_12 = 1.0 - 2.0 / 13.0
+    decay_26 = 1.0 - 2.0 / 27.0
+    decay_9 = 1.0 - 2.0 / 10.0
+    num_12 = den_12 = num_26 = den_26 = num_9 = den_9 = 0.0
+    annualize = np.sqrt(252.0)
+    
+    for i in range(n):
+        price = close[i]
+        
+        num_12 = price + decay_12 * num_12
+        den_12 = 1.0 + decay_12 * den_12
+        ema_12[i] = num_12 / den_12
+        num_26 = price + decay_26 * num_26
+        den_26 = 1.0 + decay_26 * den_26
+        ema_26[i] = num_26 / den_26
+        
+        macd[i] = ema_12[i] - ema_26[i]
+        num_9 = macd[i] + decay_9 * num_9
+        den_9 = 1.0 + decay_9 * den_9
+        macd_signal[i] = num_9 / den_9
+        macd_histogram[i] = macd[i] - macd_signal[i]
+        
+        if i > 0:
+            prev_close = close[i - 1]
+            true_range[i] = max(high[i] - low[i], abs(high[i] - prev_close), abs(low[i] - prev_close))
+            returns[i] = price / prev_close - 1.0
+            delta = price - prev_close
+            if delta > 0:
+                gains[i] = delta
+            elif delta < 0:
+                losses[i] = -delta
+        
+        # SMA 20 and Bollinger Bands (sample std over the same window)
+        if i >= 19:
+            total = 0.0
+            for j in range(i - 19, i + 1):
+                total += close[j]
+            mean = total / 20.0
+            sq = 0.0
+            for j in range(i - 19, i + 1):
+                sq += (close[j] - mean) ** 2
+            std = np.sqrt(sq / 19.0)
+            sma_20[i] = mean
+            upper_bollinger[i] = mean + 2.0 * std
+            lower_bollinger[i] = mean - 2.0 * std
+        
+        # Annualized volatility of returns (the first return is undefined)
+        if i >= 20:
+            total = 0.0
+            for j in range(i - 19, i + 1):
+                total += returns[j]
+            mean = total / 20.0
+            sq = 0.0
+            for j in range(i - 19, i + 1):
+                sq += (returns[j] - mean) ** 2
+            volatility[i] = np.sqrt(sq / 19.0) * annualize
+        
+        # ATR 14 (the first true range is undefined)
+        if i >= 14:
+            total = 0.0
+            for j in range(i - 13, i + 1):
+                total += true_range[j]
+            atr_14[i] = total / 14.0
+        
+        # RSI 14 over mean gains/losses (the first delta counts as zero)
+        if i >= 13:
+            gain = 0.0
+            loss = 0.0
+            for j in range(i - 13, i + 1):
+                gain += gains[j]
+                loss += losses[j]
+            gain /= 14.0
+            loss /= 14.0
+            if loss > 0:
+                rsi_14[i] = 100.0 - 100.0 / (1.0 + gain / loss)
+            elif gain > 0:
+                rsi_14[i] = 100.0
+    
+    return (sma_20, ema_12, ema_26, atr_14, upper_bollinger, lower_bollinger,
+            volatility, rsi_14, macd, macd_signal, macd_histogram)
+
+
+_indicator_jit = njit(cache=True)(_indicator_loop) if njit is not None else None
+
+
 def calculate_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculate comprehensive technical indicators for stock price data.
@@ -148,8 +380,18 @@ def calculate_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
         # Make a copy to avoid modifying original
         df = df.copy()
         
+        # Fused single-pass kernel when Numba is available and the prices are complete
+        if _indicator_jit is not None and len(df) > 0:
+            close = df['close'].to_numpy(dtype=np.float64)
+            high = df['high'].to_numpy(dtype=np.float64)
+            low = df['low'].to_numpy(dtype=np.float64)
+            if not (np.isnan(close).any() or np.isnan(high).any() or np.isnan(low).any()):
+                for column, values in zip(_INDICATOR_COLUMNS, _indicator_jit(close, high, low)):
+                    df[column] = values
+                return df
+        
         # Basic indicators
-        df['sma_20'] = df['close'].rolling(window=20).mean()
+        df['sma_20'] = _rolling_mean(df['close'], 20)
         df['ema_12'] = df['close'].ewm(span=12).mean()
         df['ema_26'] = df['close'].ewm(span=26).mean()
         
@@ -162,23 +404,23 @@ def calculate_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
                 abs(df['low'] - df['prev_close'])
             )
         )
-        df['atr_14'] = df['true_range'].rolling(window=14).mean()
+        df['atr_14'] = _rolling_mean(df['true_range'], 14)
         
         # Bollinger Bands
-        bb_sma = df['close'].rolling(window=20).mean()
-        bb_std = df['close'].rolling(window=20).std()
+        bb_sma = df['sma_20']
+        bb_std = _rolling_std(df['close'], 20)
         df['upper_bollinger'] = bb_sma + (2 * bb_std)
         df['lower_bollinger'] = bb_sma - (2 * bb_std)
         
         # Historical Volatility (annualized)
         df['returns'] = df['close'].pct_change()
-        df['volatility'] = df['returns'].rolling(window=20).std() * np.sqrt(252)
+        df['volatility'] = _rolling_std(df['returns'], 20) * np.sqrt(252)
         
         # RSI (Relative Strength Index)
         def calculate_rsi(prices: pd.Series, window: int = 14) -> pd.Series:
             delta = prices.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+            gain = _rolling_mean(delta.where(delta > 0, 0), window)
+            loss = _rolling_mean(-delta.where(delta < 0, 0), window)
             rs = gain / loss
             return 100 - (100 / (1 + rs))
         
@@ -238,13 +480,44 @@ def save_to_csv(df: pd.DataFrame, filepath: str) -> str:
         raise Exception(f"Failed to save CSV file: {str(e)}")
 
 
+def save_to_parquet(df: pd.DataFrame, filepath: str) -> str:
+    """
+    Save DataFrame to a snappy-compressed Parquet file.
+    
+    Requires pyarrow (install the "parquet" extra).
+    
+    Unlike save_to_csv, values are written at full precision.
+    
+    Args:
+        df: DataFrame to save
+        filepath: Full filepath for the Parquet file
+        
+    Returns:
+        Full path of the saved file
+        
+    Raises:
+        Exception: If file save fails
+    """
+    try:
+        # Ensure data directory exists
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        df.to_parquet(filepath, engine='pyarrow', compression='snappy', index=False)
+        
+        return filepath
+        
+    except Exception as e:
+        raise Exception(f"Failed to save Parquet file: {str(e)}")
+
+
 async def get_stock_history_data(
     symbol: str,
     start_date: str,
     end_date: str,
     interval: str = "daily",
     include_indicators: bool = True,
-    tradier_client: Optional[TradierClient] = None
+    tradier_client: Optional[TradierClient] = None,
+    file_format: str = "csv"
 ) -> Dict[str, Any]:
     """
     Retrieve historical stock data from Tradier API and calculate technical indicators.
@@ -256,13 +529,18 @@ async def get_stock_history_data(
         interval: Data interval ("daily", "weekly", "monthly")
         include_indicators: Whether to calculate technical indicators
         tradier_client: Optional TradierClient instance
+        file_format: Output file format ("csv" or "parquet")
         
     Returns:
         Dictionary containing processed data, file path, and summary statistics
         
     Raises:
+        ValueError: If file_format is not "csv" or "parquet"
         Exception: For API errors, invalid symbols, or data processing issues
     """
+    if file_format not in _FILE_FORMATS:
+        raise ValueError(f"Unsupported file_format {file_format!r}; expected one of {_FILE_FORMATS}")
+    
     try:
         # Initialize Tradier client if not provided
         if not tradier_client:
@@ -279,31 +557,30 @@ async def get_stock_history_data(
         }
         api_interval = interval_map.get(interval, "daily")
         
-        # Fetch historical data from Tradier API
-        historical_data = tradier_client.get_historical_data(
-            symbol=symbol,
-            start_date=start_date,
-            end_date=end_date,
-            interval=api_interval
+        # Fetch historical data from Tradier API (blocking HTTP call, run off the event loop)
+        loop = asyncio.get_running_loop()
+        historical_data = await loop.run_in_executor(
+            None,
+            tradier_client.get_historical_data,
+            symbol,
+            start_date,
+            end_date,
+            api_interval
         )
         
         if not historical_data:
             raise Exception(f"No historical data found for {symbol}")
         
-        # Convert to DataFrame
-        df_data = []
-        for data_point in historical_data:
-            df_data.append({
-                "date": data_point.date,
-                "open": float(data_point.open),
-                "high": float(data_point.high),
-                "low": float(data_point.low),
-                "close": float(data_point.close),
-                "volume": int(data_point.volume)
-            })
-        
-        df = pd.DataFrame(df_data)
-        df['date'] = pd.to_datetime(df['date'])
+        # Convert to DataFrame column by column (one typed array per field)
+        count = len(historical_data)
+        df = pd.DataFrame({
+            "date": pd.to_datetime([data_point.date for data_point in historical_data], format=_DATE_FMT, cache=True),
+            "open": np.fromiter((data_point.open for data_point in historical_data), dtype=np.float64, count=count),
+            "high": np.fromiter((data_point.high for data_point in historical_data), dtype=np.float64, count=count),
+            "low": np.fromiter((data_point.low for data_point in historical_data), dtype=np.float64, count=count),
+            "close": np.fromiter((data_point.close for data_point in historical_data), dtype=np.float64, count=count),
+            "volume": np.fromiter((int(data_point.volume) for data_point in historical_data), dtype=np.int64, count=count)
+        })
         df = df.sort_values('date').reset_index(drop=True)
         
         if df.empty:
@@ -313,9 +590,12 @@ async def get_stock_history_data(
         if include_indicators:
             df = calculate_technical_indicators(df)
         
-        # Generate CSV filename and save data
-        csv_filename = generate_csv_filename(symbol, start_date, end_date)
-        csv_path = save_to_csv(df, csv_filename)
+        # Generate filename and save data
+        csv_filename = generate_csv_filename(symbol, start_date, end_date, extension=file_format)
+        if file_format == "parquet":
+            csv_path = save_to_parquet(df, csv_filename)
+        else:
+            csv_path = save_to_csv(df, csv_filename)
         
         # Create summary statistics
         summary = create_summary_response(df, symbol, csv_path)
@@ -341,14 +621,14 @@ def create_summary_response(df: pd.DataFrame, symbol: str, csv_path: str) -> Dic
     try:
         # Basic statistics
         total_records = len(df)
-        first_date = df['date'].min().strftime("%Y-%m-%d")
-        last_date = df['date'].max().strftime("%Y-%m-%d")
+        first_date = df['date'].min().strftime(_DATE_FMT)
+        last_date = df['date'].max().strftime(_DATE_FMT)
         
         # Price summary
-        first_open = float(df['open'].iloc[0])
-        last_close = float(df['close'].iloc[-1])
-        max_high = float(df['high'].max())
-        min_low = float(df['low'].min())
+        first_open = float(df['open'].iat[0])
+        last_close = float(df['close'].iat[-1])
+        max_high = float(np.nanmax(df['high'].to_numpy()))
+        min_low = float(np.nanmin(df['low'].to_numpy()))
         total_return = last_close - first_open
         total_return_pct = (total_return / first_open) * 100 if first_open != 0 else 0
         
@@ -379,12 +659,17 @@ def create_summary_response(df: pd.DataFrame, symbol: str, csv_path: str) -> Dic
             })
         
         # Preview records (last 30 records)
-        preview_df = df.tail(30).copy()
+        preview_df = df.tail(30)
+        indicator_digits = [
+            (col, digits) for col, digits in _PREVIEW_INDICATOR_DIGITS
+            if col in preview_df.columns
+        ]
+        preview_dates = preview_df['date'].dt.strftime(_DATE_FMT)
         preview_records = []
         
-        for _, row in preview_df.iterrows():
+        for date_str, row in zip(preview_dates, preview_df.to_dict(orient='records')):
             record = {
-                "date": row['date'].strftime("%Y-%m-%d"),
+                "date": date_str,
                 "open": round(float(row['open']), 2),
                 "high": round(float(row['high']), 2),
                 "low": round(float(row['low']), 2),
@@ -393,28 +678,9 @@ def create_summary_response(df: pd.DataFrame, symbol: str, csv_path: str) -> Dic
             }
             
             # Add technical indicators if available
-            if 'sma_20' in row.index and not pd.isna(row['sma_20']):
-                record['sma_20'] = round(float(row['sma_20']), 2)
-            if 'ema_12' in row.index and not pd.isna(row['ema_12']):
-                record['ema_12'] = round(float(row['ema_12']), 2)
-            if 'ema_26' in row.index and not pd.isna(row['ema_26']):
-                record['ema_26'] = round(float(row['ema_26']), 2)
-            if 'atr_14' in row.index and not pd.isna(row['atr_14']):
-                record['atr_14'] = round(float(row['atr_14']), 2)
-            if 'rsi_14' in row.index and not pd.isna(row['rsi_14']):
-                record['rsi_14'] = round(float(row['rsi_14']), 2)
-            if 'upper_bollinger' in row.index and not pd.isna(row['upper_bollinger']):
-                record['upper_bollinger'] = round(float(row['upper_bollinger']), 2)
-            if 'lower_bollinger' in row.index and not pd.isna(row['lower_bollinger']):
-                record['lower_bollinger'] = round(float(row['lower_bollinger']), 2)
-            if 'volatility' in row.index and not pd.isna(row['volatility']):
-                record['volatility'] = round(float(row['volatility']), 4)
-            if 'macd' in row.index and not pd.isna(row['macd']):
-                record['macd'] = round(float(row['macd']), 2)
-            if 'macd_signal' in row.index and not pd.isna(row['macd_signal']):
-                record['macd_signal'] = round(float(row['macd_signal']), 2)
-            if 'macd_histogram' in row.index and not pd.isna(row['macd_histogram']):
-                record['macd_histogram'] = round(float(row['macd_histogram']), 2)
+            for col, digits in indicator_digits:
+                if not pd.isna(row[col]):
+                    record[col] = round(float(row[col]), digits)
                 
             preview_records.append(record)
         
@@ -1,5 +1,6 @@
 """Stock information processing and formatting."""
 
+import asyncio
 from dataclasses import dataclass
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
@@ -7,10 +8,37 @@ from src.provider.tradier.client import TradierClient, TradierQuote
 from src.utils.time import get_timezone_time
 from src.market.hours import get_market_status
 
+# Chinese magnitude units, largest first: (threshold, divisor, unit)
+_MAGNITUDES = (
+    (1_000_000_000_000, 1e12, "万亿"),
+    (100_000_000, 1e8, "亿"),
+    (10_000, 1e4, "万"),
+)
 
-@dataclass
+# StockInfo fields grouped by section of the raw data dictionary
+_PRICE_FIELDS = (
+    "close_price", "change_amount", "change_percentage",
+    "high_price", "low_price", "open_price", "prev_close",
+)
+_TRADING_FIELDS = ("volume", "turnover_amount", "turnover_rate")
+_VALUATION_FIELDS = (
+    "pe_ratio_ttm", "pe_ratio_static", "pb_ratio", "market_cap",
+    "total_shares", "float_market_cap", "float_shares",
+)
+_TECHNICAL_FIELDS = (
+    "week_52_high", "week_52_low", "historical_high", "historical_low",
+    "beta", "amplitude", "average_price", "lot_size",
+)
+_PREMARKET_FIELDS = (
+    "premarket_price", "premarket_change",
+    "premarket_change_percentage", "premarket_time",
+)
+_CONTEXT_FIELDS = ("market_status", "close_time", "data_timestamp")
+
+
+@dataclass(frozen=True, slots=True)
 class StockInfo:
-    """Standardized stock information data structure."""
+    """Standardized stock information data structure (immutable and hashable)."""
     
     # Basic information
     symbol: str
@@ -64,6 +92,14 @@ class StockInfo:
 class StockInfoProcessor:
     """Stock information processor with business logic and formatting."""
     
+    # Price time label per market status (anything else is treated as closed)
+    _PRICE_LABEL_MAP = {
+        "market": "美东实时",
+        "pre-market": "美东盘前",
+        "after-hours": "美东盘后",
+        "closed": "美东收盘",
+    }
+    
     def __init__(self):
         """Initialize processor with Tradier client."""
         self.tradier_client = TradierClient()
@@ -81,18 +117,30 @@ class StockInfoProcessor:
             Exception: If unable to fetch stock data
         """
         try:
-            # 1. Get basic quote data
-            quotes = self.tradier_client.get_quotes([symbol.upper()])
+            # 1-3. Fetch quote, company information and financial ratios concurrently
+            # (blocking HTTP calls, run off the event loop)
+            ticker = symbol.upper()
+            loop = asyncio.get_running_loop()
+            quotes, company_info, ratios = await asyncio.gather(
+                loop.run_in_executor(None, self.tradier_client.get_quotes, [ticker]),
+                loop.run_in_executor(None, self.tradier_client.get_company_info, ticker),
+                loop.run_in_executor(None, self.tradier_client.get_ratios, ticker),
+                return_exceptions=True
+            )
+            
+            # Quote data is required
+            if isinstance(quotes, Exception):
+                raise quotes
             if not quotes:
                 raise ValueError(f"No data found for symbol: {symbol}")
             
             quote = quotes[0]
             
-            # 2. Get company information (optional, may fail)
-            company_info = self.tradier_client.get_company_info(symbol.upper())
-            
-            # 3. Get financial ratios (optional, may fail)
-            ratios = self.tradier_client.get_ratios(symbol.upper())
+            # Company information and ratios are optional, may fail
+            if isinstance(company_info, Exception):
+                company_info = {}
+            if isinstance(ratios, Exception):
+                ratios = {}
             
             # 4. Get 52-week high/low from quote data (preferred) or historical data (fallback)
             week_52_high = quote.week_52_high
@@ -233,6 +281,8 @@ class StockInfoProcessor:
         premarket_change = None
         premarket_change_percentage = None
         premarket_time = None
+        change_amount = quote.change
+        change_percentage = quote.change_percentage
         
         # In pre-market or after-hours, determine the current price
         if market_status in ["pre-market", "after-hours"]:
@@ -257,10 +307,10 @@ class StockInfoProcessor:
                 premarket_change_percentage = (premarket_change / quote.prevclose) * 100
                 premarket_time = eastern_time.strftime("%H:%M (美东)")
                 
-                # Also update the quote data for consistency
-                if quote.change == 0 and quote.change_percentage == 0:
-                    quote.change = premarket_change
-                    quote.change_percentage = premarket_change_percentage
+                # Also use it as the day's change when the quote reports none
+                if change_amount == 0 and change_percentage == 0:
+                    change_amount = premarket_change
+                    change_percentage = premarket_change_percentage
         
         # Calculate turnover amount if we have price and volume
         turnover_amount = None
@@ -277,8 +327,8 @@ class StockInfoProcessor:
             close_time=price_time_label,
             
             # Price movement
-            change_amount=quote.change or 0.0,
-            change_percentage=quote.change_percentage or 0.0,
+            change_amount=change_amount or 0.0,
+            change_percentage=change_percentage or 0.0,
             high_price=quote.high or quote.last or 0.0,  # Use last if high not available
             low_price=quote.low or quote.last or 0.0,   # Use last if low not available  
             open_price=quote.open or quote.prevclose or 0.0,  # Use prevclose if open not available
@@ -325,15 +375,8 @@ class StockInfoProcessor:
             Formatted time label string
         """
         time_str = eastern_time.strftime("%m/%d %H:%M:%S")
-        
-        if market_status == "market":
-            return f"{time_str} (美东实时)"
-        elif market_status == "pre-market":
-            return f"{time_str} (美东盘前)"
-        elif market_status == "after-hours":
-            return f"{time_str} (美东盘后)"
-        else:
-            return f"{time_str} (美东收盘)"
+        label = self._PRICE_LABEL_MAP.get(market_status, "美东收盘")
+        return f"{time_str} ({label})"
     
     def format_stock_info(self, stock_info: StockInfo) -> str:
         """Format stock information as user-friendly Chinese text.
@@ -344,134 +387,7 @@ class StockInfoProcessor:
         Returns:
             Formatted Chinese text string
         """
-        # Company display name
-        company_display = f"{stock_info.symbol} ({stock_info.company_name})"
-        
-        # Formatting helper functions
-        def format_currency(value: Optional[float], prefix: str = "$") -> str:
-            """Format currency value."""
-            if value is None:
-                return "N/A"
-            return f"{prefix}{value:,.3f}"
-        
-        def format_percentage(value: Optional[float]) -> str:
-            """Format percentage value."""
-            if value is None:
-                return "N/A"
-            sign = "+" if value >= 0 else ""
-            return f"{sign}{value:.2f}%"
-        
-        def format_large_number(value: Optional[float], suffix: str = "") -> str:
-            """Format large numbers with Chinese units."""
-            if value is None:
-                return "N/A"
-            
-            abs_value = abs(value)
-            if abs_value >= 1e12:
-                return f"{value/1e12:.2f}万亿{suffix}"
-            elif abs_value >= 1e8:
-                return f"{value/1e8:.2f}亿{suffix}"
-            elif abs_value >= 1e4:
-                return f"{value/1e4:.2f}万{suffix}"
-            else:
-                return f"{value:,.0f}{suffix}"
-        
-        def format_change_with_sign(value: Optional[float]) -> str:
-            """Format change amount with appropriate sign."""
-            if value is None:
-                return "N/A"
-            if value >= 0:
-                return f"+{format_currency(value)[1:]}"  # Remove $ and add +
-            else:
-                return format_currency(value)
-        
-        # Build the formatted output
-        output = f"""## {company_display} - 关键信息
-
-**基础信息**
-- 股票代码: {stock_info.symbol}
-- 收盘价: {format_currency(stock_info.close_price)}
-- 收盘时间: {stock_info.close_time}
-
-**价格变动**
-- 涨跌额: {format_change_with_sign(stock_info.change_amount)}
-- 涨跌幅: {format_percentage(stock_info.change_percentage)}
-- 最高价: {format_currency(stock_info.high_price)}
-- 最低价: {format_currency(stock_info.low_price)}
-- 今开: {format_currency(stock_info.open_price)}
-- 昨收: {format_currency(stock_info.prev_close)}
-
-**交易数据**
-- 成交量: {format_large_number(stock_info.volume, "股")}"""
-        
-        # Add turnover data if available
-        if stock_info.turnover_amount:
-            output += f"\n- 成交额: {format_large_number(stock_info.turnover_amount)}"
-        if stock_info.turnover_rate:
-            output += f"\n- 换手率: {stock_info.turnover_rate:.2f}%"
-        
-        # Add valuation metrics if available
-        valuation_items = []
-        if stock_info.pe_ratio_ttm:
-            valuation_items.append(f"- 市盈率TTM: {stock_info.pe_ratio_ttm:.2f}")
-        if stock_info.pe_ratio_static:
-            valuation_items.append(f"- 市盈率(静): {stock_info.pe_ratio_static:.2f}")
-        if stock_info.pb_ratio:
-            valuation_items.append(f"- 市净率: {stock_info.pb_ratio:.2f}")
-        if stock_info.market_cap:
-            valuation_items.append(f"- 总市值: {format_large_number(stock_info.market_cap)}")
-        if stock_info.total_shares:
-            valuation_items.append(f"- 总股本: {format_large_number(stock_info.total_shares, '亿')}")
-        if stock_info.float_market_cap:
-            valuation_items.append(f"- 流通值: {format_large_number(stock_info.float_market_cap)}")
-        if stock_info.float_shares:
-            valuation_items.append(f"- 流通股: {format_large_number(stock_info.float_shares, '亿')}")
-        
-        if valuation_items:
-            output += "\n\n**估值指标**\n" + "\n".join(valuation_items)
-        
-        # Add technical indicators
-        output += "\n\n**技术指标**"
-        if stock_info.week_52_high:
-            output += f"\n- 52周最高: {format_currency(stock_info.week_52_high)}"
-        if stock_info.week_52_low:
-            output += f"\n- 52周最低: {format_currency(stock_info.week_52_low)}"
-        if stock_info.historical_high:
-            output += f"\n- 历史最高: {format_currency(stock_info.historical_high)}"
-        if stock_info.historical_low:
-            output += f"\n- 历史最低: {format_currency(stock_info.historical_low)}"
-        if stock_info.beta:
-            output += f"\n- Beta系数: {stock_info.beta:.3f}"
-        if stock_info.amplitude:
-            output += f"\n- 振幅: {stock_info.amplitude:.2f}%"
-        if stock_info.average_price:
-            output += f"\n- 平均价: {format_currency(stock_info.average_price)}"
-        output += f"\n- 每手: {stock_info.lot_size}股"
-        
-        # Add extended hours data if available
-        if stock_info.premarket_price:
-            # Determine the correct label based on market status
-            if stock_info.market_status == "after-hours":
-                section_title = "**盘后交易**"
-                price_label = "盘后价格"
-                change_label = "盘后变动"
-                time_label = "盘后时间"
-            else:  # pre-market or other
-                section_title = "**盘前交易**"
-                price_label = "盘前价格"
-                change_label = "盘前变动"
-                time_label = "盘前时间"
-                
-            output += f"\n\n{section_title}"
-            output += f"\n- {price_label}: {format_currency(stock_info.premarket_price)}"
-            if stock_info.premarket_change:
-                premarket_change_str = format_change_with_sign(stock_info.premarket_change)
-                premarket_pct_str = format_percentage(stock_info.premarket_change_percentage)
-                output += f"\n- {change_label}: {premarket_change_str} ({premarket_pct_str})"
-            if stock_info.premarket_time:
-                output += f"\n- {time_label}: {stock_info.premarket_time}"
-        
-        return output
+        return _format_stock_info(stock_info)
     
     def get_raw_data_dict(self, stock_info: StockInfo) -> Dict[str, Any]:
         """Convert StockInfo to structured dictionary for API responses.
@@ -485,48 +401,141 @@ class StockInfoProcessor:
         return {
             "symbol": stock_info.symbol,
             "company_name": stock_info.company_name,
-            "price_data": {
-                "close_price": stock_info.close_price,
-                "change_amount": stock_info.change_amount,
-                "change_percentage": stock_info.change_percentage,
-                "high_price": stock_info.high_price,
-                "low_price": stock_info.low_price,
-                "open_price": stock_info.open_price,
-                "prev_close": stock_info.prev_close
-            },
-            "trading_data": {
-                "volume": stock_info.volume,
-                "turnover_amount": stock_info.turnover_amount,
-                "turnover_rate": stock_info.turnover_rate
-            },
-            "valuation_metrics": {
-                "pe_ratio_ttm": stock_info.pe_ratio_ttm,
-                "pe_ratio_static": stock_info.pe_ratio_static,
-                "pb_ratio": stock_info.pb_ratio,
-                "market_cap": stock_info.market_cap,
-                "total_shares": stock_info.total_shares,
-                "float_market_cap": stock_info.float_market_cap,
-                "float_shares": stock_info.float_shares
-            },
-            "technical_indicators": {
-                "week_52_high": stock_info.week_52_high,
-                "week_52_low": stock_info.week_52_low,
-                "historical_high": stock_info.historical_high,
-                "historical_low": stock_info.historical_low,
-                "beta": stock_info.beta,
-                "amplitude": stock_info.amplitude,
-                "average_price": stock_info.average_price,
-                "lot_size": stock_info.lot_size
-            },
-            "premarket_data": {
-                "premarket_price": stock_info.premarket_price,
-                "premarket_change": stock_info.premarket_change,
-                "premarket_change_percentage": stock_info.premarket_change_percentage,
-                "premarket_time": stock_info.premarket_time
-            },
-            "context": {
-                "market_status": stock_info.market_status,
-                "close_time": stock_info.close_time,
-                "data_timestamp": stock_info.data_timestamp
-            }
-        }
\ No newline at end of file
+            "price_data": {k: getattr(stock_info, k) for k in _PRICE_FIELDS},
+            "trading_data": {k: getattr(stock_info, k) for k in _TRADING_FIELDS},
+            "valuation_metrics": {k: getattr(stock_info, k) for k in _VALUATION_FIELDS},
+            "technical_indicators": {k: getattr(stock_info, k) for k in _TECHNICAL_FIELDS},
+            "premarket_data": {k: getattr(stock_info, k) for k in _PREMARKET_FIELDS},
+            "context": {k: getattr(stock_info, k) for k in _CONTEXT_FIELDS}
+        }
+
+
+def _format_large_number(value: Optional[float], suffix: str = "") -> str:
+    """Format large numbers with Chinese units (万/亿/万亿)."""
+    if value is None:
+        return "N/A"
+    
+    abs_value = abs(value)
+    for threshold, divisor, unit in _MAGNITUDES:
+        if abs_value >= threshold:
+            return f"{value/divisor:.2f}{unit}{suffix}"
+    return f"{value:,.0f}{suffix}"
+
+
+def _format_stock_info(stock_info: StockInfo) -> str:
+    """Format stock information as Chinese text."""
+    # Company display name
+    company_display = f"{stock_info.symbol} ({stock_info.company_name})"
+    
+    # Formatting helper functions
+    def format_currency(value: Optional[float], prefix: str = "$") -> str:
+        """Format currency value."""
+        if value is None:
+            return "N/A"
+        return f"{prefix}{value:,.3f}"
+    
+    def format_percentage(value: Optional[float]) -> str:
+        """Format percentage value."""
+        if value is None:
+            return "N/A"
+        sign = "+" if value >= 0 else ""
+        return f"{sign}{value:.2f}%"
+    
+    def format_change_with_sign(value: Optional[float]) -> str:
+        """Format change amount with appropriate sign."""
+        if value is None:
+            return "N/A"
+        if value >= 0:
+            return f"+{format_currency(value)[1:]}"  # Remove $ and add +
+        else:
+            return format_currency(value)
+    
+    # Build the formatted output line by line and join once at the end
+    parts = [
+        f"## {company_display} - 关键信息",
+        "",
+        "**基础信息**",
+        f"- 股票代码: {stock_info.symbol}",
+        f"- 收盘价: {format_currency(stock_info.close_price)}",
+        f"- 收盘时间: {stock_info.close_time}",
+        "",
+        "**价格变动**",
+        f"- 涨跌额: {format_change_with_sign(stock_info.change_amount)}",
+        f"- 涨跌幅: {format_percentage(stock_info.change_percentage)}",
+        f"- 最高价: {format_currency(stock_info.high_price)}",
+        f"- 最低价: {format_currency(stock_info.low_price)}",
+        f"- 今开: {format_currency(stock_info.open_price)}",
+        f"- 昨收: {format_currency(stock_info.prev_close)}",
+        "",
+        "**交易数据**",
+        f"- 成交量: {_format_large_number(stock_info.volume, '股')}",
+    ]
+    
+    # Add turnover data if available
+    if stock_info.turnover_amount:
+        parts.append(f"- 成交额: {_format_large_number(stock_info.turnover_amount)}")
+    if stock_info.turnover_rate:
+        parts.append(f"- 换手率: {stock_info.turnover_rate:.2f}%")
+    
+    # Add valuation metrics if available
+    valuation_items = []
+    if stock_info.pe_ratio_ttm:
+        valuation_items.append(f"- 市盈率TTM: {stock_info.pe_ratio_ttm:.2f}")
+    if stock_info.pe_ratio_static:
+        valuation_items.append(f"- 市盈率(静): {stock_info.pe_ratio_static:.2f}")
+    if stock_info.pb_ratio:
+        valuation_items.append(f"- 市净率: {stock_info.pb_ratio:.2f}")
+    if stock_info.market_cap:
+        valuation_items.append(f"- 总市值: {_format_large_number(stock_info.market_cap)}")
+    if stock_info.total_shares:
+        valuation_items.append(f"- 总股本: {_format_large_number(stock_info.total_shares, '亿')}")
+    if stock_info.float_market_cap:
+        valuation_items.append(f"- 流通值: {_format_large_number(stock_info.float_market_cap)}")
+    if stock_info.float_shares:
+        valuation_items.append(f"- 流通股: {_format_large_number(stock_info.float_shares, '亿')}")
+    
+    if valuation_items:
+        parts += ["", "**估值指标**", *valuation_items]
+    
+    # Add technical indicators
+    parts += ["", "**技术指标**"]
+    if stock_info.week_52_high:
+        parts.append(f"- 52周最高: {format_currency(stock_info.week_52_high)}")
+    if stock_info.week_52_low:
+        parts.append(f"- 52周最低: {format_currency(stock_info.week_52_low)}")
+    if stock_info.historical_high:
+        parts.append(f"- 历史最高: {format_currency(stock_info.historical_high)}")
+    if stock_info.historical_low:
+        parts.append(f"- 历史最低: {format_currency(stock_info.historical_low)}")
+    if stock_info.beta:
+        parts.append(f"- Beta系数: {stock_info.beta:.3f}")
+    if stock_info.amplitude:
+        parts.append(f"- 振幅: {stock_info.amplitude:.2f}%")
+    if stock_info.average_price:
+        parts.append(f"- 平均价: {format_currency(stock_info.average_price)}")
+    parts.append(f"- 每手: {stock_info.lot_size}股")
+    
+    # Add extended hours data if available
+    if stock_info.premarket_price:
+        # Determine the correct label based on market status
+        if stock_info.market_status == "after-hours":
+            section_title = "**盘后交易**"
+            price_label = "盘后价格"
+            change_label = "盘后变动"
+            time_label = "盘后时间"
+        else:  # pre-market or other
+            section_title = "**盘前交易**"
+            price_label = "盘前价格"
+            change_label = "盘前变动"
+            time_label = "盘前时间"
+            
+        parts += ["", section_title]
+        parts.append(f"- {price_label}: {format_currency(stock_info.premarket_price)}")
+        if stock_info.premarket_change:
+            premarket_change_str = format_change_with_sign(stock_info.premarket_change)
+            premarket_pct_str = format_percentage(stock_info.premarket_change_percentage)
+            parts.append(f"- {change_label}: {premarket_change_str} ({premarket_pct_str})")
+        if stock_info.premarket_time:
+            parts.append(f"- {time_label}: {stock_info.premarket_time}")
+    
+    return "\n".join(parts)
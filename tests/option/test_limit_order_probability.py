@@ -13,10 +13,23 @@ from src.option.limit_order_probability import (
     TheoreticalValidator,
     SimulationParameters
 )
+from src.option.intraday_volatility import IntradayVolatilityEstimator
+
+# 蒙特卡洛测试相互独立，可由 pytest-xdist 分配到任意worker
+pytestmark = pytest.mark.xdist_group("mc")
+
+
+@pytest.fixture(autouse=True)
+def seeded_rng():
+    """每个测试使用固定随机种子，保证在任意worker上结果可复现
+
+    引擎从全局状态抽取根种子后为每个chunk派生独立生成器，结果与线程调度无关
+    """
+    np.random.seed(42)
 
 
 class TestMonteCarloEngine:
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_price_path_generation(self):
         """测试价格路径生成正确性"""
         params = SimulationParameters(
@@ -38,10 +51,10 @@ class TestMonteCarloEngine:
         paths = await engine.simulate_price_paths()
 
         assert paths.shape == (100, 10)
-        assert np.all(paths >= 0)  # 期权价格不能为负
-        assert np.all(np.isfinite(paths))  # 没有inf或nan值
+        # 期权价格不能为负，且没有inf或nan值（nan使比较为False，+inf由max捕获）
+        assert paths.min() >= 0 and np.isfinite(paths.max())
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_boundary_conditions(self):
         """测试边界条件"""
         # 测试1: 限价等于当前价格
@@ -95,9 +108,181 @@ class TestMonteCarloEngine:
         std_final = np.std(paths_zero[:, -1])
         assert std_final < 0.1  # 非常低的标准差
 
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_simulate_and_detect_chunked(self):
+        """测试分块模拟与成交检测（不保留完整路径矩阵）"""
+        params = SimulationParameters(
+            current_price=10.0,
+            underlying_price=100.0,
+            strike=100.0,
+            days_to_expiry=10,
+            delta=-0.5,
+            theta=-0.05,
+            gamma=0.01,
+            vega=0.1,
+            implied_volatility=0.5,
+            historical_volatility=0.5,
+            effective_volatility=0.5,
+            simulations=1000
+        )
+
+        engine = MonteCarloEngine(params)
+        results = await engine.simulate_and_detect(
+            limit_price=10.5,
+            order_side="sell",
+            chunk_size=128  # 1000条路径分为8批，最后一批不满
+        )
+
+        assert 0 < results["fill_probability"] < 1
+        assert results["no_fill_probability"] == pytest.approx(1 - results["fill_probability"])
+        assert results["first_day_fill_probability"] <= results["fill_probability"]
+        daily = results["probability_by_day"]
+        assert sum(d["daily_prob"] for d in daily) <= results["fill_probability"] + 1e-12
+
+        # 即刻成交无需模拟
+        immediate = await engine.simulate_and_detect(
+            limit_price=10.0,
+            order_side="sell",
+            current_price=10.0
+        )
+        assert immediate["fill_probability"] == 1.0
+        assert immediate["first_day_fill_probability"] == 1.0
+
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_seeded_runs_are_reproducible(self):
+        """测试相同种子下多线程分块模拟结果完全一致"""
+        params = SimulationParameters(
+            current_price=10.0,
+            underlying_price=100.0,
+            strike=100.0,
+            days_to_expiry=10,
+            delta=-0.5,
+            theta=-0.05,
+            gamma=0.01,
+            vega=0.1,
+            implied_volatility=0.5,
+            historical_volatility=0.5,
+            effective_volatility=0.5,
+            simulations=2000
+        )
+        engine = MonteCarloEngine(params)
+
+        async def run():
+            np.random.seed(7)
+            paths = await engine.simulate_price_paths()
+            detected = await engine.simulate_and_detect(limit_price=10.5, order_side="sell", chunk_size=256)
+            return paths, detected
+
+        first_paths, first_detected = await run()
+        second_paths, second_detected = await run()
+
+        np.testing.assert_array_equal(first_paths, second_paths)
+        assert first_detected == second_detected
+
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_simulate_and_detect_with_intraday_matches_full_paths(self):
+        """测试分块日内检测与完整路径矩阵检测结果一致"""
+        params = SimulationParameters(
+            current_price=10.0,
+            underlying_price=100.0,
+            strike=100.0,
+            days_to_expiry=10,
+            delta=-0.5,
+            theta=-0.05,
+            gamma=0.01,
+            vega=0.1,
+            implied_volatility=0.5,
+            historical_volatility=0.5,
+            effective_volatility=0.5,
+            simulations=2000
+        )
+        engine = MonteCarloEngine(params, tradier_client=Mock())
+        range_estimate = IntradayVolatilityEstimator(None)._get_default_estimate()
+
+        with patch.object(
+            IntradayVolatilityEstimator, "estimate_intraday_range",
+            AsyncMock(return_value=range_estimate)
+        ) as mock_estimate:
+            # chunk_size = simulations // 4 时与 simulate_price_paths_with_intraday 的分块及随机流相同
+            np.random.seed(7)
+            price_paths = await engine.simulate_price_paths_with_intraday(symbol="AAPL")
+            expected = FillDetector.detect_fills_with_intraday(
+                price_paths, limit_price=10.5, order_side="sell"
+            )
+
+            np.random.seed(7)
+            chunked = await engine.simulate_and_detect_with_intraday(
+                symbol="AAPL", limit_price=10.5, order_side="sell", chunk_size=500
+            )
+
+        assert mock_estimate.await_count == 2  # 每次调用只估计一次日内范围
+        assert chunked == expected
+        assert chunked["fill_probability"] > chunked["fill_probability_close_only"]
+
+        # 无tradier_client时回退为仅收盘价：日内触及与收盘价结果相同
+        fallback = await MonteCarloEngine(params).simulate_and_detect_with_intraday(
+            symbol="AAPL", limit_price=10.5, order_side="sell", chunk_size=128
+        )
+        assert fallback["fill_probability"] == fallback["fill_probability_close_only"]
+        assert fallback["probability_improvement"] == 0.0
+        assert fallback["uses_intraday_detection"] is True
+
+    def test_antithetic_paths_are_mirrored(self):
+        """测试对偶变量法生成成对镜像的随机冲击"""
+        params = SimulationParameters(
+            current_price=10.0,
+            underlying_price=100.0,
+            strike=100.0,
+            days_to_expiry=5,
+            delta=-0.5,
+            theta=-0.1,
+            gamma=0.01,
+            vega=0.1,
+            implied_volatility=0.3,
+            historical_volatility=0.3,
+            effective_volatility=0.3,
+            simulations=10,
+            antithetic=True
+        )
+
+        engine = MonteCarloEngine(params)
+        stock = engine._simulate_paths_with_stock_vectorized(10)['stock_close']
+
+        # 成对路径的对数收益之和只剩漂移项，与随机冲击无关
+        log_returns = np.log(stock / params.underlying_price)
+        pair_sums = log_returns[:5] + log_returns[5:]
+        assert np.allclose(pair_sums, pair_sums[0])
+        assert not np.allclose(log_returns[:5], log_returns[5:])
+
+    def test_simulation_parameters_immutable(self):
+        """测试模拟参数不可变且可哈希"""
+        import dataclasses
+
+        params = SimulationParameters(
+            current_price=10.0,
+            underlying_price=100.0,
+            strike=100.0,
+            days_to_expiry=5,
+            delta=-0.5,
+            theta=-0.1,
+            gamma=0.01,
+            vega=0.1,
+            implied_volatility=0.3,
+            historical_volatility=0.3,
+            effective_volatility=0.3
+        )
+
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            params.simulations = 100
+
+        updated = dataclasses.replace(params, simulations=100)
+        assert updated.simulations == 100
+        assert params.simulations == 10000
+        assert hash(params) == hash(dataclasses.replace(params))
+
 
 class TestVolatilityMixer:
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_effective_volatility_calculation(self):
         """测试波动率混合逻辑"""
         mock_client = Mock()
@@ -119,7 +304,7 @@ class TestVolatilityMixer:
             assert 0 < result["effective_volatility"] < 1
             assert result["weight_iv"] + result["weight_hv"] == 1.0
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_fallback_to_iv_only(self):
         """测试历史数据不可用时回退到纯IV"""
         mock_client = Mock()
@@ -194,6 +379,50 @@ class TestFillDetector:
         assert results["first_day_fill_probability"] <= results["fill_probability"]
         assert results["first_day_fill_probability"] == 0  # 没有路径在第一天成交
 
+    def test_summarize_fill_histogram_matches_paths(self):
+        """测试直方图统计与逐路径检测结果一致"""
+        paths = np.array([
+            [10.0, 10.5, 11.0, 10.8, 10.9],
+            [10.0, 10.2, 10.4, 10.6, 10.8],
+            [10.0, 10.1, 10.2, 11.5, 11.0],
+            [11.2, 10.1, 10.2, 11.5, 11.0],
+        ])
+
+        detector = FillDetector()
+        from_paths = detector.detect_fills(paths, limit_price=11.0, order_side="sell")
+        from_histogram = detector.summarize_fill_histogram(
+            np.array([1, 0, 1, 1, 0]), num_paths=4
+        )
+
+        assert from_histogram == from_paths
+        assert from_histogram["percentile_days"] == {25: 0.0, 50: 2.0, 75: 2.0, 90: 2.0}
+
+    def test_intraday_detection_vs_close_only(self):
+        """测试日内高点触及与仅收盘价成交检测"""
+        close = np.array([
+            [10.0, 10.5, 10.8, 10.9],  # 收盘价从未成交
+            [10.0, 11.2, 10.8, 10.9],  # 收盘价第1天成交
+            [10.0, 10.1, 10.2, 10.3],  # 从未成交
+        ])
+        high = np.array([
+            [10.2, 11.1, 10.9, 11.0],  # 日内第1天触及
+            [10.1, 11.3, 10.9, 11.0],  # 日内第1天触及
+            [10.1, 10.2, 10.3, 10.4],  # 从未触及
+        ])
+
+        detector = FillDetector()
+        results = detector.detect_fills_with_intraday(
+            price_paths={"close": close, "high": high, "low": close},
+            limit_price=11.0,
+            order_side="sell"
+        )
+
+        assert results["fill_probability"] == 2/3
+        assert results["fill_probability_close_only"] == 1/3
+        assert results["touch_probability"] == 2/3
+        assert results["expected_days_to_fill"] == 1.0
+        assert results["uses_intraday_detection"] is True
+
     def test_first_day_fill_probability(self):
         """测试第一天成交概率计算"""
         paths = np.array([
@@ -247,6 +476,10 @@ class TestFillDetector:
         assert results["percentile_days"][50] <= 5
         assert results["percentile_days"][75] <= 8
 
+        # 百分位数取实际出现的成交日（不插值）
+        assert results["percentile_days"] == {25: 2.0, 50: 2.0, 75: 5.0, 90: 8.0}
+        assert results["median_days_to_fill"] == results["percentile_days"][50]
+
 
 class TestStatisticalAnalyzer:
     def test_confidence_metrics(self):
@@ -270,6 +503,26 @@ class TestStatisticalAnalyzer:
         assert metrics["confidence_interval"]["upper"] > 0.68
         assert metrics["confidence_interval"]["level"] == 0.95
 
+    def test_confidence_metrics_closed_form(self):
+        """测试标准误差和置信区间的解析解"""
+        analyzer = StatisticalAnalyzer()
+
+        metrics = analyzer.calculate_confidence_metrics(
+            simulation_results={"fill_probability": 0.5},
+            num_simulations=10000
+        )
+        assert metrics["standard_error"] == pytest.approx(0.005)
+        assert metrics["confidence_interval"]["lower"] == pytest.approx(0.5 - 1.96 * 0.005)
+        assert metrics["confidence_interval"]["upper"] == pytest.approx(0.5 + 1.96 * 0.005)
+
+        # 确定性结果：标准误差为0，置信区间截断在[0, 1]内
+        certain = analyzer.calculate_confidence_metrics(
+            simulation_results={"fill_probability": 1.0},
+            num_simulations=10000
+        )
+        assert certain["standard_error"] == 0.0
+        assert certain["confidence_interval"]["upper"] == 1.0
+
     def test_confidence_level_with_backtest(self):
         """测试有回测结果时的置信度评估"""
         analyzer = StatisticalAnalyzer()
@@ -296,7 +549,7 @@ class TestStatisticalAnalyzer:
 
 
 class TestTheoreticalValidator:
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_theoretical_validation(self):
         """测试理论验证通过"""
         validator = TheoreticalValidator()
@@ -313,7 +566,7 @@ class TestTheoreticalValidator:
         assert "higher_vol_higher_prob" in results
         assert "longer_window_higher_prob" in results
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_limit_equals_current_validation(self):
         """测试限价等于当前价格时接近100%成交概率"""
         params = SimulationParameters(
@@ -346,7 +599,7 @@ class TestTheoreticalValidator:
 
 
 class TestRecommendationEngine:
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_generate_recommendations(self):
         """测试建议生成"""
         from src.option.limit_order_probability import RecommendationEngine
@@ -377,7 +630,7 @@ class TestRecommendationEngine:
         assert len(result["recommendations"]) > 0
         assert len(result["alternative_limits"]) > 0
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_alternative_limits_ordering(self):
         """测试替代限价按成交概率排序"""
         from src.option.limit_order_probability import RecommendationEngine
@@ -402,7 +655,7 @@ class TestRecommendationEngine:
 class TestMarketTimeAwareness:
     """测试市场时间感知功能"""
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_partial_trading_day_simulation(self):
         """测试部分交易日的价格模拟"""
         # 盘中预测：剩余50%交易时间
@@ -426,8 +679,7 @@ class TestMarketTimeAwareness:
         paths = await engine.simulate_price_paths()
 
         assert paths.shape == (100, 5)
-        assert np.all(paths >= 0)
-        assert np.all(np.isfinite(paths))
+        assert paths.min() >= 0 and np.isfinite(paths.max())
 
         # 第一天的价格变化应该小于完整交易日
         first_day_changes = np.abs(paths[:, 0] - params_partial.current_price)
@@ -459,7 +711,7 @@ class TestMarketTimeAwareness:
         # 注意：由于随机性，这个测试可能偶尔失败，所以用较宽松的阈值
         assert avg_first_day_change < avg_full_day_change * 1.2
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_first_day_fill_probability_with_partial_day(self):
         """测试部分交易日的首日成交概率"""
         params = SimulationParameters(
@@ -14,6 +14,7 @@ from src.mcp_server.prompts.income_generation_csp_prompt import (
     income_generation_csp_engine,
     _validate_parameters,
     _generate_structured_prompt,
+    _render_prompt_body,
     get_income_csp_examples,
     get_usage_guidelines
 )
@@ -87,6 +88,50 @@ class TestParameterValidation:
         assert result["is_valid"] is True
         assert "股票列表超过10个，将截取前10个" in result["warnings"]
 
+    def test_overlong_ticker(self):
+        """测试过长股票代码（仅验证前10个实际使用的股票）"""
+        result = _validate_parameters(
+            tickers=["AAPL", "TOOLONGTICKER"],
+            cash_usd=50000.0,
+            target_apy_pct=50.0,
+            min_winrate_pct=70.0,
+            confidence_pct=90.0
+        )
+
+        assert result["is_valid"] is False
+        assert "股票代码 'TOOLONGTICKER' 过长" in result["errors"]
+
+        # 第11个之后的股票会被截取，不参与验证
+        truncated = [f"STOCK{i}" for i in range(10)] + ["TOOLONGTICKER"]
+        result = _validate_parameters(
+            tickers=truncated,
+            cash_usd=50000.0,
+            target_apy_pct=50.0,
+            min_winrate_pct=70.0,
+            confidence_pct=90.0
+        )
+
+        assert result["is_valid"] is True
+
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_ticker_with_space_accepted(self):
+        """测试包含空格但不超过10个字符的股票代码仍然有效"""
+        result = _validate_parameters(
+            tickers=["GOOG META", "BRK B"],
+            cash_usd=50000.0,
+            target_apy_pct=50.0,
+            min_winrate_pct=70.0,
+            confidence_pct=90.0
+        )
+
+        assert result["is_valid"] is True
+
+        prompt = await income_generation_csp_engine(
+            tickers='["BRK B"]',
+            cash_usd=50000.0
+        )
+        assert "BRK B" in prompt
+
     def test_small_cash_amount_warning(self):
         """测试小额现金警告"""
         result = _validate_parameters(
@@ -104,7 +149,7 @@ class TestParameterValidation:
 class TestPromptGeneration:
     """测试提示生成功能"""
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_basic_prompt_generation(self):
         """测试基础提示生成"""
         prompt = await income_generation_csp_engine(
@@ -133,7 +178,7 @@ class TestPromptGeneration:
         assert 'purpose_type="income"' in prompt
         assert "Delta" in prompt
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_prompt_with_default_tickers(self):
         """测试使用默认股票列表的提示生成"""
         prompt = await income_generation_csp_engine(
@@ -148,7 +193,7 @@ class TestPromptGeneration:
         assert "MSFT" in prompt
         assert "NVDA" in prompt
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_prompt_with_many_tickers(self):
         """测试超过10个股票的情况"""
         many_tickers_str = " ".join([f"STOCK{i}" for i in range(15)])
@@ -165,7 +210,7 @@ class TestPromptGeneration:
 
         assert ticker_count <= 10
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_invalid_parameters_raise_error(self):
         """测试无效参数抛出异常"""
         with pytest.raises(ValueError, match="参数验证失败"):
@@ -197,6 +242,48 @@ class TestPromptGeneration:
         assert "分配" in prompt or "概率" in prompt
 
 
+    def test_prompt_body_cached(self):
+        """测试相同参数复用已渲染的提示主体，分析时间仍按调用生成"""
+        kwargs = dict(
+            tickers=["AAPL"],
+            tickers_str="AAPL",
+            primary_ticker="AAPL",
+            cash_usd=75000.0,
+            target_apy_pct=45.0,
+            min_winrate_pct=75.0,
+            confidence_pct=90.0
+        )
+
+        first = _generate_structured_prompt(**kwargs)
+        hits_before = _render_prompt_body.cache_info().hits
+        second = _generate_structured_prompt(**kwargs)
+
+        assert _render_prompt_body.cache_info().hits == hits_before + 1
+        assert "**分析时间**:" in second
+        # 去掉分析时间行后内容一致
+        def without_time(prompt):
+            return [line for line in prompt.splitlines() if not line.startswith("**分析时间**")]
+
+        assert without_time(first) == without_time(second)
+
+    def test_prompt_body_cache_distinguishes_int_and_float(self):
+        """测试 50000 与 50000.0 分别渲染，不互相命中缓存"""
+        kwargs = dict(
+            tickers=["MSFT"],
+            tickers_str="MSFT",
+            primary_ticker="MSFT",
+            target_apy_pct=45.0,
+            min_winrate_pct=75.0,
+            confidence_pct=90.0
+        )
+
+        as_int = _generate_structured_prompt(cash_usd=50000, **kwargs)
+        as_float = _generate_structured_prompt(cash_usd=50000.0, **kwargs)
+
+        assert "total_capital=50000," in as_int
+        assert "total_capital=50000.0," in as_float
+
+
 class TestHelperFunctions:
     """测试辅助函数"""
     
@@ -231,7 +318,7 @@ class TestHelperFunctions:
 class TestErrorHandling:
     """测试错误处理"""
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_invalid_ticker_format(self):
         """测试无效股票代码格式 - 空字符串会使用默认股票列表"""
         # 空字符串不会抛出错误，而是使用默认股票列表
@@ -241,7 +328,7 @@ class TestErrorHandling:
         )
         assert "SPY" in prompt  # 应该包含默认股票
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_zero_cash_amount(self):
         """测试零现金金额"""
         with pytest.raises(ValueError):
@@ -254,7 +341,7 @@ class TestErrorHandling:
 class TestIntegrationScenarios:
     """测试集成场景"""
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_conservative_income_scenario(self):
         """测试保守收入场景"""
         prompt = await income_generation_csp_engine(
@@ -272,7 +359,7 @@ class TestIntegrationScenarios:
         assert "胜率≥80.0%" in prompt
         assert "置信度≥95.0%" in prompt
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_aggressive_income_scenario(self):
         """测试激进收入场景"""
         prompt = await income_generation_csp_engine(
@@ -291,7 +378,7 @@ class TestIntegrationScenarios:
         assert "胜率≥65.0%" in prompt
         assert "置信度≥85.0%" in prompt
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_balanced_income_scenario(self):
         """测试平衡收入场景"""
         prompt = await income_generation_csp_engine(
@@ -10,24 +10,122 @@ Tests for Stock Acquisition CSP Engine MCP Server Prompt
 - 与收入生成引擎的差异化
 """
 
+import asyncio
+import re
 import pytest
-from unittest.mock import patch
-from src.mcp_server.prompts.stock_acquisition_csp_prompt import (
-    stock_acquisition_csp_engine,
-    _validate_stock_acquisition_parameters,
-    _generate_stock_acquisition_prompt,
-    _parse_tickers_input,
-    get_stock_acquisition_examples,
-    get_usage_guidelines
-)
+from functools import lru_cache
+from types import SimpleNamespace
+
+
+# 并行运行时（pytest -n auto --dist=loadgroup）同一worker复用模块级提示缓存
+pytestmark = pytest.mark.xdist_group("prompts")
+
+
+# 不触发任何错误或警告的参数基准
+_VALID_PARAMS = {
+    "tickers": ["AAPL"],
+    "cash_usd": 50000.0,
+    "target_allocation_probability": 65.0,
+    "max_single_position_pct": 25.0,
+    "target_annual_return_pct": 25.0,
+    "preferred_sectors": None
+}
+
+# 提示中必须出现的关键片段
+_REQUIRED_SECTIONS = frozenset({
+    "策略目标与约束参数",
+    "关键执行原则",
+    "强制执行序列",
+    "股票建仓专用筛选标准",
+    "专业输出规格要求",
+    "建仓执行管理触发器"
+})
+
+_REQUIRED_TOOLS = frozenset({
+    "get_market_time_tool()",
+    "stock_info_tool(",
+    "cash_secured_put_strategy_tool_mcp(",
+    "options_chain_tool_mcp(",
+    "option_assignment_probability_tool_mcp("
+    # portfolio_optimization_tool_mcp_tool 现在是可选的（使用简化分配模型）
+})
+
+_ACQUISITION_KEYWORDS = frozenset({
+    "欢迎股票分配",
+    "股票获取",
+    "建仓",
+    "折扣价",
+    "耐心建仓",
+    "0.30~0.50"
+})
+
+_WELCOME_PHRASES = frozenset({
+    "欢迎股票分配",
+    "欢迎分配",
+    "期望分配",
+    "获得股票"
+})
+
+
+def _needles_re(needles):
+    """将多个关键片段编译为单个交替正则，一次扫描即可找出全部命中
+
+    按长度降序排列，保证同一位置优先匹配较长片段，结果与集合迭代顺序无关。
+    """
+    ordered = sorted(needles, key=lambda needle: (-len(needle), needle))
+    return re.compile("|".join(map(re.escape, ordered)))
+
+
+_REQUIRED_SECTIONS_RE = _needles_re(_REQUIRED_SECTIONS)
+_REQUIRED_TOOLS_RE = _needles_re(_REQUIRED_TOOLS)
+_ACQUISITION_KEYWORDS_RE = _needles_re(_ACQUISITION_KEYWORDS)
+_WELCOME_PHRASES_RE = _needles_re(_WELCOME_PHRASES)
+
+
+@pytest.fixture(scope="session")
+def prompt_api():
+    """延迟导入被测提示模块，收集阶段不加载提示模块依赖图"""
+    from src.mcp_server.prompts.stock_acquisition_csp_prompt import (
+        stock_acquisition_csp_engine,
+        _validate_stock_acquisition_parameters,
+        get_stock_acquisition_examples,
+        get_usage_guidelines
+    )
+    from src.mcp_server.prompts.prompt_utils import (
+        parse_tickers_input,
+        get_duration_from_days
+    )
+
+    return SimpleNamespace(
+        engine=stock_acquisition_csp_engine,
+        validate=_validate_stock_acquisition_parameters,
+        examples=get_stock_acquisition_examples,
+        guidelines=get_usage_guidelines,
+        parse_tickers=parse_tickers_input,
+        duration_from_days=get_duration_from_days
+    )
+
+
+@lru_cache(maxsize=None)
+def _cached_prompt(**kwargs) -> str:
+    """按参数缓存生成的提示；提示生成是纯函数，相同参数只渲染一次"""
+    from src.mcp_server.prompts.stock_acquisition_csp_prompt import stock_acquisition_csp_engine
+
+    return asyncio.run(stock_acquisition_csp_engine(**kwargs))
+
+
+@pytest.fixture(scope="module")
+def default_prompt():
+    """使用默认参数生成的提示（模块内共享）"""
+    return _cached_prompt(tickers="AAPL", cash_usd=50000.0)
 
 
 class TestParameterValidation:
     """测试参数验证功能"""
     
-    def test_valid_parameters(self):
+    def test_valid_parameters(self, prompt_api):
         """测试有效参数验证"""
-        result = _validate_stock_acquisition_parameters(
+        result = prompt_api.validate(
             tickers=["AAPL", "TSLA"],
             cash_usd=50000.0,
             target_allocation_probability=65.0,
@@ -39,9 +137,9 @@ class TestParameterValidation:
         assert result["is_valid"] is True
         assert len(result["errors"]) == 0
     
-    def test_empty_ticker_list(self):
+    def test_empty_ticker_list(self, prompt_api):
         """测试空股票列表（应该被允许，使用默认值）"""
-        result = _validate_stock_acquisition_parameters(
+        result = prompt_api.validate(
             tickers=[],
             cash_usd=50000.0,
             target_allocation_probability=65.0,
@@ -53,9 +151,9 @@ class TestParameterValidation:
         # 空列表应该被允许（会使用默认股票）
         assert result["is_valid"] is True
     
-    def test_invalid_cash_amount(self):
+    def test_invalid_cash_amount(self, prompt_api):
         """测试无效的资金金额"""
-        result = _validate_stock_acquisition_parameters(
+        result = prompt_api.validate(
             tickers=["AAPL"],
             cash_usd=-1000.0,  # 负数资金
             target_allocation_probability=65.0,
@@ -67,9 +165,9 @@ class TestParameterValidation:
         assert result["is_valid"] is False
         assert any("资金金额必须大于0" in error for error in result["errors"])
     
-    def test_invalid_allocation_probability(self):
+    def test_invalid_allocation_probability(self, prompt_api):
         """测试无效的分配概率"""
-        result = _validate_stock_acquisition_parameters(
+        result = prompt_api.validate(
             tickers=["AAPL"],
             cash_usd=50000.0,
             target_allocation_probability=150.0,  # 超过100%
@@ -81,9 +179,9 @@ class TestParameterValidation:
         assert result["is_valid"] is False
         assert any("目标分配概率必须在0-100%" in error for error in result["errors"])
     
-    def test_invalid_position_percentage(self):
+    def test_invalid_position_percentage(self, prompt_api):
         """测试无效的单仓位百分比"""
-        result = _validate_stock_acquisition_parameters(
+        result = prompt_api.validate(
             tickers=["AAPL"],
             cash_usd=50000.0,
             target_allocation_probability=65.0,
@@ -95,9 +193,9 @@ class TestParameterValidation:
         assert result["is_valid"] is False
         assert any("单股票仓位百分比必须在0-100%" in error for error in result["errors"])
     
-    def test_invalid_annual_return(self):
+    def test_invalid_annual_return(self, prompt_api):
         """测试无效的年化收益率"""
-        result = _validate_stock_acquisition_parameters(
+        result = prompt_api.validate(
             tickers=["AAPL"],
             cash_usd=50000.0,
             target_allocation_probability=65.0,
@@ -109,69 +207,96 @@ class TestParameterValidation:
         assert result["is_valid"] is False
         assert any("年化收益率必须在0-100%" in error or "年度回报率必须在0-100%" in error for error in result["errors"])
     
-    def test_warning_conditions(self):
-        """测试警告条件"""
-        result = _validate_stock_acquisition_parameters(
-            tickers=["AAPL"] * 12,  # 过多股票
-            cash_usd=5000.0,  # 资金较少
-            target_allocation_probability=20.0,  # 分配概率较低
-            max_single_position_pct=60.0,  # 单仓位过高
-            target_annual_return_pct=60.0,  # 收益率过高
-            preferred_sectors=None
-        )
+    @pytest.mark.parametrize(
+        "overrides,expected_warning",
+        [
+            ({"tickers": ["AAPL"] * 12}, "股票列表超过10个，将截取前8个以优化性能"),
+            ({"cash_usd": 5000.0}, "资金金额较小，可能无法进行有效的股票建仓"),
+            ({"cash_usd": 6000000.0}, "资金金额很大，建议分散建仓降低风险"),
+            ({"target_allocation_probability": 20.0}, "分配概率较低，可能不适合股票建仓策略"),
+            ({"target_allocation_probability": 95.0}, "分配概率很高，风险较大"),
+            ({"max_single_position_pct": 60.0}, "单股票仓位过高，建议控制在50%以内"),
+            ({"target_annual_return_pct": 60.0}, "年化收益率目标过高，可能难以实现"),
+        ],
+        ids=["过多股票", "资金较少", "资金很大", "分配概率较低", "分配概率很高", "单仓位过高", "收益率过高"]
+    )
+    def test_warning_conditions(self, prompt_api, overrides, expected_warning):
+        """测试警告条件（每次只触发一个阈值）"""
+        result = prompt_api.validate(**{**_VALID_PARAMS, **overrides})
 
         assert result["is_valid"] is True  # 有警告但仍有效
-        assert len(result["warnings"]) > 0
+        assert result["warnings"] == [expected_warning]
+
+    def test_valid_baseline_has_no_warnings(self, prompt_api):
+        """测试基准参数不触发任何警告"""
+        result = prompt_api.validate(**_VALID_PARAMS)
+
+        assert result["is_valid"] is True
+        assert result["warnings"] == []
 
 
 class TestTickersParsing:
     """测试股票代码解析功能"""
-    
-    def test_parse_json_string(self):
-        """测试JSON字符串格式解析"""
-        result = _parse_tickers_input('["AAPL", "MSFT", "GOOGL"]')
-        assert result == ["AAPL", "MSFT", "GOOGL"]
-    
-    def test_parse_comma_separated(self):
-        """测试逗号分隔格式解析"""
-        result = _parse_tickers_input("AAPL,MSFT,GOOGL")
-        assert result == ["AAPL", "MSFT", "GOOGL"]
-    
-    def test_parse_space_separated(self):
-        """测试空格分隔格式解析"""
-        result = _parse_tickers_input("AAPL MSFT GOOGL")
-        assert result == ["AAPL", "MSFT", "GOOGL"]
-    
-    def test_parse_single_ticker(self):
-        """测试单个股票代码解析"""
-        result = _parse_tickers_input("AAPL")
-        assert result == ["AAPL"]
-    
-    def test_parse_list_input(self):
-        """测试列表输入直接返回"""
-        result = _parse_tickers_input(["AAPL", "MSFT"])
-        assert result == ["AAPL", "MSFT"]
-    
-    def test_parse_empty_string(self):
-        """测试空字符串解析"""
-        result = _parse_tickers_input("")
-        assert result == []
-    
-    def test_parse_with_whitespace(self):
-        """测试带空格的解析"""
-        result = _parse_tickers_input(" AAPL , MSFT , GOOGL ")
-        assert result == ["AAPL", "MSFT", "GOOGL"]
+
+    @pytest.mark.parametrize(
+        "raw,expected",
+        [
+            ('["AAPL", "MSFT", "GOOGL"]', ["AAPL", "MSFT", "GOOGL"]),
+            ("AAPL,MSFT,GOOGL", ["AAPL", "MSFT", "GOOGL"]),
+            ("AAPL MSFT GOOGL", ["AAPL", "MSFT", "GOOGL"]),
+            ("AAPL", ["AAPL"]),
+            (["AAPL", "MSFT"], ["AAPL", "MSFT"]),
+            ("", []),
+            (" AAPL , MSFT , GOOGL ", ["AAPL", "MSFT", "GOOGL"]),
+        ],
+        ids=[
+            "JSON字符串格式解析",
+            "逗号分隔格式解析",
+            "空格分隔格式解析",
+            "单个股票代码解析",
+            "列表输入直接返回",
+            "空字符串解析",
+            "带空格的解析",
+        ]
+    )
+    def test_parse(self, prompt_api, raw, expected):
+        """测试股票代码解析"""
+        assert prompt_api.parse_tickers(raw) == expected
+
+    @pytest.mark.parametrize("separator", [",", " ", " , "], ids=["逗号", "空格", "逗号加空格"])
+    def test_parse_many_tickers(self, prompt_api, separator):
+        """压力测试：解析1000个股票代码组成的字符串"""
+        tickers = [f"T{i:04d}" for i in range(1000)]
+
+        assert prompt_api.parse_tickers(separator.join(tickers)) == tickers
 
 
+class TestDurationMapping:
+    """测试天数范围到duration参数的映射"""
+
+    @pytest.mark.parametrize(
+        "min_days,max_days,expected",
+        [
+            (5, 9, "1w"),
+            (14, 21, "2w"),
+            (21, 35, "1m"),
+            (60, 90, "3m"),
+            (150, 200, "6m"),
+            (300, 400, "1y"),
+        ],
+        ids=["一周", "两周", "一个月", "三个月", "六个月", "一年"]
+    )
+    def test_duration_from_days(self, prompt_api, min_days, max_days, expected):
+        """测试按平均天数选择duration"""
+        assert prompt_api.duration_from_days(min_days, max_days) == expected
 
 
 class TestPromptGeneration:
     """测试提示生成功能"""
     
-    @pytest.mark.asyncio
-    async def test_basic_prompt_generation(self):
+    def test_basic_prompt_generation(self):
         """测试基本提示生成"""
-        result = await stock_acquisition_csp_engine(
+        result = _cached_prompt(
             tickers="AAPL",
             cash_usd=50000.0,
             target_allocation_probability=65.0
@@ -183,10 +308,9 @@ class TestPromptGeneration:
         assert "分配概率≥65.0%" in result or "目标分配概率65.0%" in result or "65.0%" in result
         assert "50000" in result or "50,000" in result
     
-    @pytest.mark.asyncio 
-    async def test_multiple_tickers(self):
+    def test_multiple_tickers(self):
         """测试多股票提示生成"""
-        result = await stock_acquisition_csp_engine(
+        result = _cached_prompt(
             tickers="AAPL,MSFT,GOOGL",
             cash_usd=100000.0,
             target_allocation_probability=70.0
@@ -196,10 +320,9 @@ class TestPromptGeneration:
         assert "MSFT" in result or "AAPL, MSFT, GOOGL" in result
         assert "分配概率≥70.0%" in result or "目标分配概率70.0%" in result
     
-    @pytest.mark.asyncio
-    async def test_default_parameters(self):
+    def test_default_parameters(self):
         """测试默认参数"""
-        result = await stock_acquisition_csp_engine(
+        result = _cached_prompt(
             tickers="TSLA",
             cash_usd=75000.0
         )
@@ -208,10 +331,9 @@ class TestPromptGeneration:
         assert "分配概率≥65.0%" in result or "目标分配概率65.0%" in result or "65.0%" in result
         assert "25.0%" in result or "年化补偿≥25.0%" in result
     
-    @pytest.mark.asyncio
-    async def test_preferred_sectors(self):
+    def test_preferred_sectors(self):
         """测试偏好行业参数"""
-        result = await stock_acquisition_csp_engine(
+        result = _cached_prompt(
             tickers="AAPL",
             cash_usd=50000.0,
             preferred_sectors="Technology,Healthcare,Finance"
@@ -219,10 +341,9 @@ class TestPromptGeneration:
         
         assert "Technology,Healthcare,Finance" in result
     
-    @pytest.mark.asyncio
-    async def test_empty_tickers_uses_defaults(self):
+    def test_empty_tickers_uses_defaults(self):
         """测试空股票列表使用默认值"""
-        result = await stock_acquisition_csp_engine(
+        result = _cached_prompt(
             tickers="",
             cash_usd=50000.0
         )
@@ -235,10 +356,10 @@ class TestParameterValidationErrors:
     """测试参数验证错误处理"""
     
     @pytest.mark.asyncio
-    async def test_invalid_parameters_raise_error(self):
+    async def test_invalid_parameters_raise_error(self, prompt_api):
         """测试无效参数抛出错误"""
         with pytest.raises(ValueError) as exc_info:
-            await stock_acquisition_csp_engine(
+            await prompt_api.engine(
                 tickers="AAPL",
                 cash_usd=-1000.0,  # 无效资金
                 target_allocation_probability=150.0  # 无效概率
@@ -250,76 +371,37 @@ class TestParameterValidationErrors:
 class TestOutputFormat:
     """测试输出格式"""
     
-    @pytest.mark.asyncio
-    async def test_contains_required_sections(self):
+    def test_contains_required_sections(self, default_prompt):
         """测试包含必需的部分"""
-        result = await stock_acquisition_csp_engine(
-            tickers="AAPL",
-            cash_usd=50000.0
-        )
+        result = default_prompt
         
-        # 验证关键部分存在
-        required_sections = [
-            "策略目标与约束参数",
-            "关键执行原则", 
-            "强制执行序列",
-            "股票建仓专用筛选标准",
-            "专业输出规格要求",
-            "建仓执行管理触发器"
-        ]
-        
-        for section in required_sections:
-            assert section in result
+        # 验证关键部分存在（单次扫描）
+        missing = _REQUIRED_SECTIONS - set(_REQUIRED_SECTIONS_RE.findall(result))
+        assert not missing, f"missing: {missing}"
     
-    @pytest.mark.asyncio
-    async def test_contains_tool_calls(self):
+    def test_contains_tool_calls(self, default_prompt):
         """测试包含工具调用"""
-        result = await stock_acquisition_csp_engine(
-            tickers="AAPL",
-            cash_usd=50000.0
-        )
+        result = default_prompt
         
-        # 验证关键工具调用存在
-        required_tools = [
-            "get_market_time_tool()",
-            "stock_info_tool(",
-            "cash_secured_put_strategy_tool_mcp(",
-            "options_chain_tool_mcp(",
-            "option_assignment_probability_tool_mcp("
-            # portfolio_optimization_tool_mcp_tool 现在是可选的（使用简化分配模型）
-        ]
-        
-        for tool in required_tools:
-            assert tool in result
+        # 验证关键工具调用存在（单次扫描）
+        missing = _REQUIRED_TOOLS - set(_REQUIRED_TOOLS_RE.findall(result))
+        assert not missing, f"missing: {missing}"
     
-    @pytest.mark.asyncio
-    async def test_stock_acquisition_focus(self):
+    def test_stock_acquisition_focus(self, default_prompt):
         """测试股票建仓重点"""
-        result = await stock_acquisition_csp_engine(
-            tickers="AAPL",
-            cash_usd=50000.0
-        )
+        result = default_prompt
         
-        # 验证股票建仓特色
-        acquisition_keywords = [
-            "欢迎股票分配",
-            "股票获取",
-            "建仓",
-            "折扣价",
-            "耐心建仓",
-            "0.30~0.50"
-        ]
-        
-        for keyword in acquisition_keywords:
-            assert keyword in result
+        # 验证股票建仓特色（单次扫描）
+        missing = _ACQUISITION_KEYWORDS - set(_ACQUISITION_KEYWORDS_RE.findall(result))
+        assert not missing, f"missing: {missing}"
 
 
 class TestExamplesAndGuidelines:
     """测试示例和指导功能"""
     
-    def test_get_examples(self):
+    def test_get_examples(self, prompt_api):
         """测试获取示例"""
-        examples = get_stock_acquisition_examples()
+        examples = prompt_api.examples()
         
         assert isinstance(examples, dict)
         assert "conservative_acquisition" in examples
@@ -333,9 +415,9 @@ class TestExamplesAndGuidelines:
         assert "expected_outcome" in conservative
         assert "use_case" in conservative
     
-    def test_get_usage_guidelines(self):
+    def test_get_usage_guidelines(self, prompt_api):
         """测试获取使用指导"""
-        guidelines = get_usage_guidelines()
+        guidelines = prompt_api.guidelines()
         
         assert isinstance(guidelines, list)
         assert len(guidelines) > 0
@@ -349,13 +431,9 @@ class TestExamplesAndGuidelines:
 class TestDifferentiationFromIncomeEngine:
     """测试与收入生成引擎的差异化"""
     
-    @pytest.mark.asyncio
-    async def test_different_default_parameters(self):
+    def test_different_default_parameters(self, default_prompt):
         """测试不同的默认参数"""
-        result = await stock_acquisition_csp_engine(
-            tickers="AAPL",
-            cash_usd=50000.0
-        )
+        result = default_prompt
         
         # 股票建仓引擎的特有参数
         assert "分配概率≥65.0%" in result or "目标分配概率65.0%" in result or "65.0%" in result
@@ -365,33 +443,18 @@ class TestDifferentiationFromIncomeEngine:
         assert "避免分配" not in result
         assert "min_winrate_pct" not in result
     
-    @pytest.mark.asyncio
-    async def test_discount_purpose_type(self):
+    def test_discount_purpose_type(self, default_prompt):
         """测试使用discount目的类型"""
-        result = await stock_acquisition_csp_engine(
-            tickers="AAPL",
-            cash_usd=50000.0
-        )
+        result = default_prompt
         
         # 必须使用discount模式
         assert 'purpose_type="discount"' in result
         # 不应该有income模式
         assert 'purpose_type="income"' not in result
     
-    @pytest.mark.asyncio
-    async def test_assignment_welcome_attitude(self):
+    def test_assignment_welcome_attitude(self, default_prompt):
         """测试欢迎分配的态度"""
-        result = await stock_acquisition_csp_engine(
-            tickers="AAPL",
-            cash_usd=50000.0
-        )
+        result = default_prompt
         
         # 应该体现欢迎分配的态度
-        welcome_phrases = [
-            "欢迎股票分配",
-            "欢迎分配",
-            "期望分配",
-            "获得股票"
-        ]
-        
-        assert any(phrase in result for phrase in welcome_phrases)
\ No newline at end of file
+        assert _WELCOME_PHRASES_RE.search(result)
@@ -1,25 +1,81 @@
 """Tests for Tradier API client."""
 
+import json
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import requests
-import os
 from src.provider.tradier.client import TradierClient, TradierQuote, TradierHistoricalData
 
+# Keep these tests on one xdist worker (pytest -n auto --dist=loadgroup) so the
+# module-scoped client fixture is reused.
+pytestmark = pytest.mark.xdist_group("tradier")
+
+
+@pytest.fixture(scope="module")
+def mock_token():
+    """Mock token for testing."""
+    return "test_token_12345"
+
+
+@pytest.fixture(scope="module")
+def client(mock_token):
+    """Create a test client with mock token, shared across the module.
+
+    Tests only patch methods on the class and never mutate the instance,
+    so building the session once is safe.
+    """
+    return TradierClient(access_token=mock_token)
+
+
+def _json_response(request, payload, status=200, reason="OK"):
+    """Build a real ``requests.Response`` carrying ``payload`` as JSON."""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = reason
+    response._content = json.dumps(payload).encode("utf-8")
+    response.headers["Content-Type"] = "application/json"
+    response.url = request.url
+    response.request = request
+    return response
+
+
+class _StubAdapter(requests.adapters.BaseAdapter):
+    """Transport adapter serving canned responses keyed by (method, url).
+
+    Mounted on the client session, it replaces the real HTTP transport so
+    tests exercise the full requests stack without patching Session methods.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.routes = {}
+        self.calls = []
+
+    def add(self, method, url, json=None, status=200, reason="OK"):
+        """Register a response for ``method`` requests to ``url``."""
+        self.routes[(method, url)] = (json, status, reason)
+
+    def send(self, request, **kwargs):
+        self.calls.append(request)
+        payload, status, reason = self.routes[(request.method, request.url.split("?", 1)[0])]
+        return _json_response(request, payload, status, reason)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def mocked_responses(client):
+    """Mount a stub adapter on the shared client for the duration of a test."""
+    adapter = _StubAdapter()
+    client.session.mount(client.base_url, adapter)
+    yield adapter
+    del client.session.adapters[client.base_url]
+
 
 class TestTradierClient:
     """Test suite for TradierClient."""
     
-    @pytest.fixture
-    def mock_token(self):
-        """Mock token for testing."""
-        return "test_token_12345"
-    
-    @pytest.fixture
-    def client(self, mock_token):
-        """Create a test client with mock token."""
-        return TradierClient(access_token=mock_token)
-    
     def test_init_with_token(self, mock_token):
         """Test client initialization with explicit token."""
         client = TradierClient(access_token=mock_token)
@@ -28,18 +84,18 @@ class TestTradierClient:
         assert "Authorization" in client.session.headers
         assert client.session.headers["Authorization"] == f"Bearer {mock_token}"
     
-    @patch.dict(os.environ, {"TRADIER_ACCESS_TOKEN": "env_token"})
-    def test_init_with_env_token(self):
+    def test_init_with_env_token(self, monkeypatch):
         """Test client initialization with environment token."""
+        monkeypatch.setenv("TRADIER_ACCESS_TOKEN", "env_token")
         client = TradierClient()
         assert client.access_token == "env_token"
     
-    @patch('src.provider.tradier.client.load_dotenv')
-    def test_init_without_token(self, mock_load_dotenv):
+    def test_init_without_token(self, monkeypatch):
         """Test client initialization fails without token."""
-        with patch.dict(os.environ, {}, clear=True):
-            with pytest.raises(ValueError, match="TRADIER_ACCESS_TOKEN environment variable is required"):
-                TradierClient()
+        monkeypatch.setattr('src.provider.tradier.client.load_dotenv', Mock())
+        monkeypatch.delenv("TRADIER_ACCESS_TOKEN", raising=False)
+        with pytest.raises(ValueError, match="TRADIER_ACCESS_TOKEN environment variable is required"):
+            TradierClient()
     
     def test_init_with_custom_base_url(self, mock_token):
         """Test client initialization with custom base URL."""
@@ -47,78 +103,38 @@ class TestTradierClient:
         client = TradierClient(access_token=mock_token, base_url=custom_url)
         assert client.base_url == custom_url
     
-    @patch('src.provider.tradier.client.requests.Session.get')
-    def test_make_request_get_success(self, mock_get, client):
+    def test_make_request_get_success(self, mocked_responses, client):
         """Test successful GET request."""
-        mock_response = Mock()
-        mock_response.json.return_value = {"success": True}
-        mock_response.raise_for_status = Mock()
-        mock_get.return_value = mock_response
+        mocked_responses.add("GET", "https://api.tradier.com/test", json={"success": True})
         
         result = client._make_request("GET", "/test", {"param": "value"})
         
         assert result == {"success": True}
-        mock_get.assert_called_once_with(
-            "https://api.tradier.com/test",
-            params={"param": "value"}
-        )
+        assert len(mocked_responses.calls) == 1
+        assert mocked_responses.calls[0].url == "https://api.tradier.com/test?param=value"
     
-    @patch('src.provider.tradier.client.requests.Session.post')
-    def test_make_request_post_success(self, mock_post, client):
+    def test_make_request_post_success(self, mocked_responses, client):
         """Test successful POST request."""
-        mock_response = Mock()
-        mock_response.json.return_value = {"success": True}
-        mock_response.raise_for_status = Mock()
-        mock_post.return_value = mock_response
+        mocked_responses.add("POST", "https://api.tradier.com/test", json={"success": True})
         
         result = client._make_request("POST", "/test", {"param": "value"})
         
         assert result == {"success": True}
-        mock_post.assert_called_once_with(
-            "https://api.tradier.com/test",
-            data={"param": "value"}
-        )
+        assert len(mocked_responses.calls) == 1
+        assert mocked_responses.calls[0].body == "param=value"
     
     def test_make_request_unsupported_method(self, client):
         """Test unsupported HTTP method raises error."""
         with pytest.raises(ValueError, match="Unsupported HTTP method: PUT"):
             client._make_request("PUT", "/test")
     
-    @patch('src.provider.tradier.client.requests.Session.get')
-    def test_make_request_http_error(self, mock_get, client):
+    def test_make_request_http_error(self, mocked_responses, client):
         """Test HTTP error handling."""
-        mock_response = Mock()
-        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("404 Not Found")
-        mock_get.return_value = mock_response
+        mocked_responses.add("GET", "https://api.tradier.com/test", json={}, status=404, reason="Not Found")
         
-        with pytest.raises(Exception, match="Tradier API error: 404 Not Found"):
+        with pytest.raises(Exception, match="Tradier API error: 404 Client Error: Not Found"):
             client._make_request("GET", "/test")
     
-    @patch('src.provider.tradier.client.time.sleep')
-    @patch.object(TradierClient, '_make_request')
-    def test_make_request_with_retry_success_after_retry(self, mock_make_request, mock_sleep, client):
-        """Test successful request after retry."""
-        mock_make_request.side_effect = [
-            Exception("First attempt failed"),
-            {"success": True}
-        ]
-        
-        result = client._make_request_with_retry("GET", "/test", max_retries=3)
-        
-        assert result == {"success": True}
-        assert mock_make_request.call_count == 2
-        mock_sleep.assert_called_once()
-    
-    @patch.object(TradierClient, '_make_request')
-    def test_make_request_with_retry_max_retries_exceeded(self, mock_make_request, client):
-        """Test max retries exceeded."""
-        mock_make_request.side_effect = Exception("API Error")
-        
-        with pytest.raises(Exception, match="API Error"):
-            client._make_request_with_retry("GET", "/test", max_retries=2)
-        
-        assert mock_make_request.call_count == 2
-    
     @patch.object(TradierClient, '_make_request_with_retry')
     def test_get_quotes_single_quote(self, mock_request, client):
         """Test getting quotes for a single symbol."""
@@ -397,6 +413,41 @@ class TestTradierClient:
         assert data == []
 
 
+class TestRetry:
+    """Test suite for TradierClient retry logic."""
+
+    @pytest.fixture(autouse=True)
+    def _no_sleep(self):
+        """Skip backoff sleeps for every retry test."""
+        with patch('src.provider.tradier.client.time.sleep') as mock_sleep:
+            yield mock_sleep
+
+    @patch.object(TradierClient, '_make_request')
+    def test_make_request_with_retry_success_after_retry(self, mock_make_request, client, _no_sleep):
+        """Test successful request after retry."""
+        mock_make_request.side_effect = [
+            Exception("First attempt failed"),
+            {"success": True}
+        ]
+
+        result = client._make_request_with_retry("GET", "/test", max_retries=3)
+
+        assert result == {"success": True}
+        assert mock_make_request.call_count == 2
+        _no_sleep.assert_called_once()
+
+    @patch.object(TradierClient, '_make_request')
+    def test_make_request_with_retry_max_retries_exceeded(self, mock_make_request, client, _no_sleep):
+        """Test max retries exceeded."""
+        mock_make_request.side_effect = [Exception("API Error"), Exception("API Error")]
+
+        with pytest.raises(Exception, match="API Error"):
+            client._make_request_with_retry("GET", "/test", max_retries=2)
+
+        assert mock_make_request.call_count == 2
+        _no_sleep.assert_called_once()
+
+
 class TestTradierQuote:
     """Test suite for TradierQuote dataclass."""
     
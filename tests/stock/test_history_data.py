@@ -1,5 +1,8 @@
 """Tests for stock history data functionality."""
 
+import asyncio
+import threading
+
 import pytest
 import pandas as pd
 import numpy as np
@@ -9,9 +12,16 @@ from zoneinfo import ZoneInfo
 
 from src.stock.history_data import (
     parse_date_range,
+    _resolve_date_range,
     generate_csv_filename, 
     calculate_technical_indicators,
+    _rolling_mean,
+    _rolling_mean_loop,
+    _rolling_std,
+    _indicator_loop,
+    _INDICATOR_COLUMNS,
     save_to_csv,
+    save_to_parquet,
     get_stock_history_data,
     create_summary_response
 )
@@ -47,15 +57,12 @@ class TestDateRangeParsing:
         diff = end_dt - start_dt
         assert diff.days == 30
     
-    @patch('src.stock.history_data.datetime')
-    def test_date_range_only(self, mock_datetime):
+    def test_date_range_only(self):
         """Test parsing with only relative date range."""
         # Mock current date as 2023-12-01 (Friday)
         mock_now = datetime(2023, 12, 1, 15, 30, tzinfo=ZoneInfo("America/New_York"))
-        mock_datetime.now.return_value = mock_now
-        mock_datetime.strptime.side_effect = datetime.strptime
         
-        start, end = parse_date_range(None, None, "30d")
+        start, end = parse_date_range(None, None, "30d", _now=mock_now)
         
         # Should be 30 days before current date
         expected_start = (mock_now - timedelta(days=30)).strftime("%Y-%m-%d")
@@ -64,14 +71,11 @@ class TestDateRangeParsing:
         assert start == expected_start
         assert end == expected_end
     
-    @patch('src.stock.history_data.datetime')
-    def test_no_parameters_default(self, mock_datetime):
+    def test_no_parameters_default(self):
         """Test default 90 days when no parameters provided."""
         mock_now = datetime(2023, 12, 1, 15, 30, tzinfo=ZoneInfo("America/New_York"))
-        mock_datetime.now.return_value = mock_now
-        mock_datetime.strptime.side_effect = datetime.strptime
         
-        start, end = parse_date_range(None, None, None)
+        start, end = parse_date_range(None, None, None, _now=mock_now)
         
         # Should default to 90 days
         expected_start = (mock_now - timedelta(days=90)).strftime("%Y-%m-%d")
@@ -118,25 +122,29 @@ class TestDateRangeParsing:
         with pytest.raises(ValueError, match="Start date cannot be after end date"):
             parse_date_range("2023-12-31", "2023-01-01", None)
     
-    @patch('src.stock.history_data.datetime')  
-    def test_future_end_date_error(self, mock_datetime):
+    def test_future_end_date_error(self):
         """Test error when end_date is in the future."""
         mock_now = datetime(2023, 12, 1, tzinfo=ZoneInfo("America/New_York"))
-        mock_datetime.now.return_value = mock_now
-        mock_datetime.strptime.side_effect = datetime.strptime
         
         with pytest.raises(ValueError, match="End date cannot be in the future"):
-            parse_date_range("2023-01-01", "2024-01-01", None)
+            parse_date_range("2023-01-01", "2024-01-01", None, _now=mock_now)
+    
+    def test_repeated_range_is_cached(self):
+        """Test repeated calls for the same window are served from the cache."""
+        _resolve_date_range.cache_clear()
+        
+        first = parse_date_range(None, "2023-12-31", "30d")
+        second = parse_date_range(None, "2023-12-31", "30d")
+        
+        assert first == second
+        assert _resolve_date_range.cache_info().hits == 1
     
-    @patch('src.stock.history_data.datetime')
-    def test_weekend_adjustment(self, mock_datetime):
+    def test_weekend_adjustment(self):
         """Test adjustment for weekend dates."""
         # Mock current date as Saturday (2023-12-02)
         mock_saturday = datetime(2023, 12, 2, 15, 30, tzinfo=ZoneInfo("America/New_York"))
-        mock_datetime.now.return_value = mock_saturday
-        mock_datetime.strptime.side_effect = datetime.strptime
         
-        start, end = parse_date_range(None, None, "7d")
+        start, end = parse_date_range(None, None, "7d", _now=mock_saturday)
         
         # Should adjust Saturday to Friday (2023-12-01)
         assert end == "2023-12-01"
@@ -161,41 +169,48 @@ class TestCSVFilename:
         assert filename.startswith("data/AAPL_")
 
 
+@pytest.fixture(scope="module")
+def sample_ohlcv() -> pd.DataFrame:
+    """Sample OHLCV data shared by the indicator tests (copy before mutating)."""
+    dates = pd.date_range('2023-01-01', periods=50, freq='B')
+    rng = np.random.default_rng(42)  # For reproducible tests
+    
+    # Generate realistic price data
+    base_price = 100
+    returns = rng.normal(0.001, 0.02, 50)  # Daily returns
+    growth = 1 + returns
+    growth[0] = base_price  # first price is the base, compounding from day 2
+    prices = np.cumprod(growth)
+    
+    df = pd.DataFrame({
+        'date': dates,
+        'open': prices,
+        'high': prices * (1 + np.abs(rng.normal(0, 0.01, 50))),
+        'low': prices * (1 - np.abs(rng.normal(0, 0.01, 50))),
+        'close': prices,
+        'volume': rng.integers(1000000, 10000000, 50)
+    })
+    
+    # Adjust high/low to be consistent
+    df['high'] = np.maximum(df['high'], np.maximum(df['open'], df['close']))
+    df['low'] = np.minimum(df['low'], np.minimum(df['open'], df['close']))
+    
+    return df
+
+
+@pytest.fixture(scope="module")
+def sample_indicators(sample_ohlcv) -> pd.DataFrame:
+    """Indicators calculated once for the shared sample data."""
+    return calculate_technical_indicators(sample_ohlcv)
+
+
 class TestTechnicalIndicators:
     """Test technical indicator calculations."""
     
-    def create_sample_data(self) -> pd.DataFrame:
-        """Create sample OHLCV data for testing."""
-        dates = pd.date_range('2023-01-01', periods=50, freq='D')
-        np.random.seed(42)  # For reproducible tests
-        
-        # Generate realistic price data
-        base_price = 100
-        returns = np.random.normal(0.001, 0.02, 50)  # Daily returns
-        prices = [base_price]
-        
-        for ret in returns[1:]:
-            prices.append(prices[-1] * (1 + ret))
-        
-        df = pd.DataFrame({
-            'date': dates,
-            'open': prices,
-            'high': [p * (1 + abs(np.random.normal(0, 0.01))) for p in prices],
-            'low': [p * (1 - abs(np.random.normal(0, 0.01))) for p in prices],
-            'close': prices,
-            'volume': np.random.randint(1000000, 10000000, 50)
-        })
-        
-        # Adjust high/low to be consistent
-        df['high'] = np.maximum(df['high'], np.maximum(df['open'], df['close']))
-        df['low'] = np.minimum(df['low'], np.minimum(df['open'], df['close']))
-        
-        return df
-    
-    def test_sma_calculation(self):
+    def test_sma_calculation(self, sample_indicators, sample_ohlcv):
         """Test Simple Moving Average calculation."""
-        df = self.create_sample_data()
-        df_with_indicators = calculate_technical_indicators(df)
+        df = sample_ohlcv
+        df_with_indicators = sample_indicators
         
         assert 'sma_20' in df_with_indicators.columns
         
@@ -207,10 +222,68 @@ class TestTechnicalIndicators:
             check_names=False
         )
     
-    def test_ema_calculation(self):
+    def test_rolling_mean_talib_matches_pandas(self, monkeypatch, sample_ohlcv):
+        """Test the TA-Lib SMA path agrees with the pandas fallback."""
+        talib = pytest.importorskip("talib")
+        close = sample_ohlcv['close']
+        
+        monkeypatch.setattr('src.stock.history_data.talib', talib)
+        with_talib = _rolling_mean(close, 20)
+        monkeypatch.setattr('src.stock.history_data.talib', None)
+        with_pandas = _rolling_mean(close, 20)
+        
+        pd.testing.assert_series_equal(with_talib, with_pandas, check_names=False)
+    
+    def test_rolling_mean_loop_matches_pandas(self, sample_ohlcv):
+        """Test the running-sum kernel reproduces pandas NaN and window semantics."""
+        close = sample_ohlcv['close'].copy()
+        close.iloc[0] = np.nan   # leading NaN, like the first true range value
+        close.iloc[30] = np.nan  # interior gap
+        
+        for window in (1, 14, 20, 60):
+            kernel = _rolling_mean_loop(close.to_numpy(dtype=np.float64), window)
+            np.testing.assert_allclose(
+                kernel,
+                close.rolling(window=window).mean().to_numpy(),
+                rtol=0,
+                atol=1e-9
+            )
+    
+    def test_rolling_std_matches_pandas(self, sample_ohlcv):
+        """Test the strided rolling std matches pandas rolling std, NaNs included."""
+        close = sample_ohlcv['close'].copy()
+        close.iloc[[0, 30]] = np.nan
+        
+        for window in (2, 20, 60):
+            pd.testing.assert_series_equal(
+                _rolling_std(close, window),
+                close.rolling(window=window).std(),
+                check_names=False,
+                rtol=0,
+                atol=1e-9
+            )
+    
+    def test_fused_indicator_loop_matches_pandas(self, monkeypatch, sample_ohlcv):
+        """Test the single-pass kernel reproduces the pandas indicator path."""
+        df = sample_ohlcv.copy()
+        # Flat stretch: zero gains and losses exercise the RSI 0/0 case
+        df.loc[25:45, ['open', 'high', 'low', 'close']] = 100.0
+        
+        monkeypatch.setattr('src.stock.history_data._indicator_jit', None)
+        expected = calculate_technical_indicators(df)
+        columns = _indicator_loop(
+            df['close'].to_numpy(dtype=np.float64),
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64)
+        )
+        
+        for name, values in zip(_INDICATOR_COLUMNS, columns):
+            np.testing.assert_allclose(values, expected[name].to_numpy(), rtol=0, atol=1e-9, err_msg=name)
+    
+    def test_ema_calculation(self, sample_indicators, sample_ohlcv):
         """Test Exponential Moving Average calculation."""
-        df = self.create_sample_data()
-        df_with_indicators = calculate_technical_indicators(df)
+        df = sample_ohlcv
+        df_with_indicators = sample_indicators
         
         assert 'ema_12' in df_with_indicators.columns
         assert 'ema_26' in df_with_indicators.columns
@@ -230,45 +303,41 @@ class TestTechnicalIndicators:
             check_names=False
         )
     
-    def test_atr_calculation(self):
+    def test_atr_calculation(self, sample_indicators):
         """Test Average True Range calculation."""
-        df = self.create_sample_data()
-        df_with_indicators = calculate_technical_indicators(df)
+        df_with_indicators = sample_indicators
         
         assert 'atr_14' in df_with_indicators.columns
         
         # ATR should be positive and reasonable
         atr_values = df_with_indicators['atr_14'].dropna()
-        assert all(atr_values >= 0)
+        assert (atr_values >= 0).all()
         assert len(atr_values) >= 35  # Should have values after initial period
     
-    def test_bollinger_bands(self):
+    def test_bollinger_bands(self, sample_indicators):
         """Test Bollinger Bands calculation."""
-        df = self.create_sample_data()
-        df_with_indicators = calculate_technical_indicators(df)
+        df_with_indicators = sample_indicators
         
         assert 'upper_bollinger' in df_with_indicators.columns
         assert 'lower_bollinger' in df_with_indicators.columns
         
         # Upper band should be higher than lower band
         valid_rows = df_with_indicators.dropna()
-        assert all(valid_rows['upper_bollinger'] > valid_rows['lower_bollinger'])
+        assert (valid_rows['upper_bollinger'] > valid_rows['lower_bollinger']).all()
     
-    def test_rsi_calculation(self):
+    def test_rsi_calculation(self, sample_indicators):
         """Test RSI calculation."""
-        df = self.create_sample_data()
-        df_with_indicators = calculate_technical_indicators(df)
+        df_with_indicators = sample_indicators
         
         assert 'rsi_14' in df_with_indicators.columns
         
         # RSI should be between 0 and 100
         rsi_values = df_with_indicators['rsi_14'].dropna()
-        assert all(0 <= rsi <= 100 for rsi in rsi_values)
+        assert ((rsi_values >= 0) & (rsi_values <= 100)).all()
     
-    def test_macd_calculation(self):
+    def test_macd_calculation(self, sample_indicators):
         """Test MACD calculation."""
-        df = self.create_sample_data()
-        df_with_indicators = calculate_technical_indicators(df)
+        df_with_indicators = sample_indicators
         
         assert 'macd' in df_with_indicators.columns
         assert 'macd_signal' in df_with_indicators.columns
@@ -282,16 +351,15 @@ class TestTechnicalIndicators:
             check_names=False
         )
     
-    def test_volatility_calculation(self):
+    def test_volatility_calculation(self, sample_indicators):
         """Test historical volatility calculation."""
-        df = self.create_sample_data()
-        df_with_indicators = calculate_technical_indicators(df)
+        df_with_indicators = sample_indicators
         
         assert 'volatility' in df_with_indicators.columns
         
         # Volatility should be positive
         vol_values = df_with_indicators['volatility'].dropna()
-        assert all(vol >= 0 for vol in vol_values)
+        assert (vol_values >= 0).all()
     
     def test_empty_dataframe_handling(self):
         """Test handling of empty DataFrame."""
@@ -324,30 +392,58 @@ class TestTechnicalIndicators:
 class TestCSVSaving:
     """Test CSV file saving functionality."""
     
-    @patch('os.makedirs')
-    @patch('pandas.DataFrame.to_csv')
-    def test_save_to_csv_success(self, mock_to_csv, mock_makedirs):
+    def test_save_to_csv_success(self, tmp_path):
         """Test successful CSV saving."""
         df = pd.DataFrame({
             'date': ['2023-01-01', '2023-01-02'],
-            'close': [100.0, 101.5],
+            'close': [100.123456, 101.5],
             'volume': [1000000, 1500000]
         })
+        target = tmp_path / "data" / "test.csv"
         
-        filepath = save_to_csv(df, "data/test.csv")
+        filepath = save_to_csv(df, str(target))
         
-        mock_makedirs.assert_called_once_with("data", exist_ok=True)
-        mock_to_csv.assert_called_once()
-        assert filepath == "data/test.csv"
+        assert filepath == str(target)
+        assert target.read_text().splitlines() == [
+            "date,close,volume",
+            "2023-01-01,100.1235,1000000",
+            "2023-01-02,101.5,1500000",
+        ]
     
-    @patch('os.makedirs')
-    @patch('pandas.DataFrame.to_csv', side_effect=Exception("Write error"))
-    def test_save_to_csv_error(self, mock_to_csv, mock_makedirs):
+    def test_save_to_csv_error(self, tmp_path):
         """Test CSV saving error handling."""
         df = pd.DataFrame({'test': [1, 2, 3]})
+        # A regular file where the data directory should be
+        blocker = tmp_path / "data"
+        blocker.write_text("")
         
         with pytest.raises(Exception, match="Failed to save CSV file"):
-            save_to_csv(df, "data/test.csv")
+            save_to_csv(df, str(blocker / "test.csv"))
+    
+    def test_save_to_parquet_success(self, tmp_path):
+        """Test successful Parquet saving round-trips at full precision."""
+        pytest.importorskip("pyarrow")
+        df = pd.DataFrame({
+            'date': ['2023-01-01', '2023-01-02'],
+            'close': [100.123456, 101.5],
+            'volume': [1000000, 1500000]
+        })
+        target = tmp_path / "data" / "test.parquet"
+        
+        filepath = save_to_parquet(df, str(target))
+        
+        assert filepath == str(target)
+        pd.testing.assert_frame_equal(pd.read_parquet(target), df)
+    
+    def test_save_to_parquet_error(self, tmp_path):
+        """Test Parquet saving error handling."""
+        df = pd.DataFrame({'test': [1, 2, 3]})
+        # A regular file where the data directory should be
+        blocker = tmp_path / "data"
+        blocker.write_text("")
+        
+        with pytest.raises(Exception, match="Failed to save Parquet file"):
+            save_to_parquet(df, str(blocker / "test.parquet"))
 
 
 class TestSummaryResponse:
@@ -404,14 +500,14 @@ class TestSummaryResponse:
     def test_preview_records_limit(self):
         """Test preview records are limited to 30."""
         # Create DataFrame with more than 30 rows
-        dates = pd.date_range('2023-01-01', periods=50)
+        dates = pd.date_range('2023-01-01', periods=50, freq='B')  # trading days from 2023-01-02
         df = pd.DataFrame({
             'date': dates,
-            'open': range(100, 150),
-            'high': range(101, 151),
-            'low': range(99, 149),
-            'close': range(100, 150),
-            'volume': [1000000] * 50
+            'open': np.arange(100, 150, dtype=np.float64),
+            'high': np.arange(101, 151, dtype=np.float64),
+            'low': np.arange(99, 149, dtype=np.float64),
+            'close': np.arange(100, 150, dtype=np.float64),
+            'volume': np.full(50, 1_000_000, dtype=np.int64)
         })
         
         response = create_summary_response(df, "AAPL", "data/test.csv")
@@ -420,8 +516,8 @@ class TestSummaryResponse:
         assert len(response["preview_records"]) == 30
         
         # Should be the most recent records
-        assert response["preview_records"][0]["date"] == "2023-01-21"  # 21st day
-        assert response["preview_records"][-1]["date"] == "2023-02-19"  # 50th day
+        assert response["preview_records"][0]["date"] == "2023-01-30"  # 21st trading day
+        assert response["preview_records"][-1]["date"] == "2023-03-10"  # 50th trading day
     
     def test_error_handling_in_summary(self):
         """Test error handling in summary creation."""
@@ -473,6 +569,83 @@ class TestGetStockHistoryData:
         assert "data_file" in result
         assert "summary" in result
         assert "preview_records" in result
+        
+        # Prices and indicators are float64
+        saved_df = mock_save_csv.call_args[0][0]
+        for column in ('open', 'high', 'low', 'close'):
+            assert saved_df[column].dtype == np.float64
+        assert saved_df['volume'].dtype == np.int64
+        assert saved_df['date'].tolist() == list(pd.to_datetime(["2023-01-01", "2023-01-02", "2023-01-03"]))
+        assert saved_df['ema_12'].dtype == np.float64
+        assert result["preview_records"][-1]["close"] == 102.5
+    
+    @pytest.mark.asyncio
+    @patch('src.stock.history_data.save_to_csv')
+    async def test_high_priced_ticker_keeps_cents(self, mock_save_csv, tmp_path):
+        """Test six-figure prices (BRK.A) survive storage, CSV export and preview exactly."""
+        mock_client = Mock()
+        mock_client.get_historical_data.return_value = [
+            TradierHistoricalData("2023-01-02", 700100.0, 700500.0, 699800.0, 612345.67, 3000),
+            TradierHistoricalData("2023-01-03", 700000.0, 700400.0, 699900.0, 700123.45, 2500)
+        ]
+        mock_save_csv.side_effect = lambda df, filepath: filepath
+        
+        result = await get_stock_history_data(
+            symbol="BRK.A",
+            start_date="2023-01-02",
+            end_date="2023-01-03",
+            include_indicators=False,
+            tradier_client=mock_client
+        )
+        
+        saved_df = mock_save_csv.call_args[0][0]
+        assert saved_df['close'].tolist() == [612345.67, 700123.45]
+        assert [record["close"] for record in result["preview_records"]] == [612345.67, 700123.45]
+        
+        target = tmp_path / "brka.csv"
+        save_to_csv(saved_df, str(target))
+        assert pd.read_csv(target)['close'].tolist() == [612345.67, 700123.45]
+    
+    @pytest.mark.asyncio
+    async def test_parquet_output(self, tmp_path, monkeypatch):
+        """Test Parquet output writes a real file that round-trips at full precision."""
+        pytest.importorskip("pyarrow")
+        monkeypatch.chdir(tmp_path)
+        mock_client = Mock()
+        mock_client.get_historical_data.return_value = [
+            TradierHistoricalData("2023-01-01", 100.0, 101.0, 99.0, 100.123456, 1000000),
+            TradierHistoricalData("2023-01-02", 100.5, 102.0, 100.0, 101.5, 1500000)
+        ]
+        
+        result = await get_stock_history_data(
+            symbol="AAPL",
+            start_date="2023-01-01",
+            end_date="2023-01-02",
+            tradier_client=mock_client,
+            file_format="parquet"
+        )
+        
+        assert result["status"] == "success"
+        assert result["data_file"].endswith(".parquet")
+        saved = pd.read_parquet(tmp_path / result["data_file"])
+        assert saved['close'].tolist() == [100.123456, 101.5]
+        assert saved['volume'].tolist() == [1000000, 1500000]
+        assert list((tmp_path / "data").glob("*.csv")) == []
+    
+    @pytest.mark.asyncio
+    async def test_unsupported_file_format(self):
+        """Test formats other than csv/parquet are rejected before any fetch."""
+        mock_client = Mock()
+        
+        with pytest.raises(ValueError, match="Unsupported file_format 'xlsx'"):
+            await get_stock_history_data(
+                symbol="AAPL",
+                start_date="2023-01-01",
+                end_date="2023-01-02",
+                tradier_client=mock_client,
+                file_format="xlsx"
+            )
+        mock_client.get_historical_data.assert_not_called()
     
     @pytest.mark.asyncio
     @patch('src.stock.history_data.TradierClient')
@@ -506,6 +679,36 @@ class TestGetStockHistoryData:
                 tradier_client=mock_client
             )
     
+    @pytest.mark.asyncio
+    @patch('src.stock.history_data.save_to_csv')
+    async def test_history_fetch_runs_off_event_loop(self, mock_save_csv):
+        """Test the blocking Tradier call does not block other requests on the loop."""
+        # Each fetch waits for a second one to arrive, so calls on the loop thread would time out
+        barrier = threading.Barrier(2, timeout=5)
+        
+        def blocking_history(symbol, start_date, end_date, interval):
+            barrier.wait()
+            return [
+                TradierHistoricalData("2023-01-02", 100.0, 101.0, 99.0, 100.5, 1000000),
+                TradierHistoricalData("2023-01-03", 100.5, 102.0, 100.0, 101.5, 1500000)
+            ]
+        
+        mock_client = Mock()
+        mock_client.get_historical_data.side_effect = blocking_history
+        mock_save_csv.side_effect = lambda df, filepath: filepath
+        
+        results = await asyncio.gather(*[
+            get_stock_history_data(
+                symbol=symbol,
+                start_date="2023-01-02",
+                end_date="2023-01-03",
+                tradier_client=mock_client
+            )
+            for symbol in ("aapl", "msft")
+        ])
+        
+        assert [r["symbol"] for r in results] == ["AAPL", "MSFT"]
+    
     def test_symbol_normalization(self):
         """Test symbol normalization in main function.""" 
         # This is tested indirectly through the integration
@@ -1,10 +1,46 @@
 """Tests for stock information processing."""
 
+import dataclasses
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from datetime import datetime
-from src.stock.info import StockInfo, StockInfoProcessor
-from src.provider.tradier.client import TradierQuote
+from src.stock.info import StockInfo, StockInfoProcessor, _format_large_number
+from src.provider.tradier.client import TradierClient, TradierQuote
+
+
+# Canonical TSLA snapshot; tests derive variants with dataclasses.replace
+_TSLA_STOCK_INFO = StockInfo(
+    symbol="TSLA",
+    company_name="Tesla Inc",
+    close_price=442.79,
+    close_time="09/25 16:00:00 (美东收盘)",
+    change_amount=16.94,
+    change_percentage=3.98,
+    high_price=444.21,
+    low_price=429.03,
+    open_price=429.83,
+    prev_close=425.85,
+    volume=93133600
+)
+
+# Expected derived values for the TSLA quote (high 444.21, low 429.03, prev close 425.85)
+_EXPECTED_AMPLITUDE_TSLA = ((444.21 - 429.03) / 425.85) * 100
+_EXPECTED_AVG_TSLA = (444.21 + 429.03) / 2
+
+# Neutral snapshot for the formatting helper cases
+_TEST_STOCK_INFO = StockInfo(
+    symbol="TEST",
+    company_name="Test Inc",
+    close_price=100.0,
+    close_time="test",
+    change_amount=0.0,
+    change_percentage=0.0,
+    high_price=100.0,
+    low_price=100.0,
+    open_price=100.0,
+    prev_close=100.0,
+    volume=1000
+)
 
 
 class TestStockInfo:
@@ -67,6 +103,36 @@ class TestStockInfo:
         assert stock_info.beta == 2.334
         assert stock_info.premarket_price == 440.68
         assert stock_info.market_status == "closed"
+    
+    def test_stock_info_frozen(self):
+        """Test StockInfo is immutable."""
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            _TSLA_STOCK_INFO.close_price = 0.0
+
+
+@pytest.fixture(scope="session")
+def mock_quote():
+    """Create mock TradierQuote (session-shared: tests must not mutate it)."""
+    return TradierQuote(
+        symbol="TSLA",
+        last=442.79,
+        change=16.94,
+        change_percentage=3.98,
+        high=444.21,
+        low=429.03,
+        open=429.83,
+        prevclose=425.85,
+        volume=93133600,
+        description="Tesla Inc",
+        bid=442.50,
+        ask=442.80
+    )
+
+
+@pytest.fixture(scope="module")
+def mock_eastern_time():
+    """Mock Eastern time."""
+    return datetime(2023, 9, 25, 16, 0, 0)
 
 
 class TestStockInfoProcessor:
@@ -75,7 +141,7 @@ class TestStockInfoProcessor:
     @pytest.fixture
     def mock_tradier_client(self):
         """Mock Tradier client."""
-        return Mock()
+        return Mock(spec=TradierClient)
     
     @pytest.fixture
     def processor(self, mock_tradier_client):
@@ -83,29 +149,6 @@ class TestStockInfoProcessor:
         with patch('src.stock.info.TradierClient', return_value=mock_tradier_client):
             return StockInfoProcessor()
     
-    @pytest.fixture
-    def mock_quote(self):
-        """Create mock TradierQuote."""
-        return TradierQuote(
-            symbol="TSLA",
-            last=442.79,
-            change=16.94,
-            change_percentage=3.98,
-            high=444.21,
-            low=429.03,
-            open=429.83,
-            prevclose=425.85,
-            volume=93133600,
-            description="Tesla Inc",
-            bid=442.50,
-            ask=442.80
-        )
-    
-    @pytest.fixture
-    def mock_eastern_time(self):
-        """Mock Eastern time."""
-        return datetime(2023, 9, 25, 16, 0, 0)
-    
     @patch('src.stock.info.get_timezone_time')
     @patch('src.stock.info.get_market_status')
     async def test_get_stock_info_success(
@@ -208,6 +251,33 @@ class TestStockInfoProcessor:
         assert stock_info.beta is None          # Not available in operation_ratios_restate
         assert stock_info.market_status == "market"
     
+    @patch('src.stock.info.get_timezone_time')
+    @patch('src.stock.info.get_market_status')
+    async def test_get_stock_info_optional_data_errors(
+        self, 
+        mock_market_status, 
+        mock_timezone, 
+        processor, 
+        mock_quote,
+        mock_eastern_time
+    ):
+        """Test company info and ratio failures do not fail the quote."""
+        # Setup mocks
+        mock_timezone.return_value = mock_eastern_time
+        mock_market_status.return_value = "closed"
+        
+        processor.tradier_client.get_quotes.return_value = [mock_quote]
+        processor.tradier_client.get_company_info.side_effect = Exception("Company Error")
+        processor.tradier_client.get_ratios.side_effect = Exception("Ratios Error")
+        
+        # Execute
+        stock_info = await processor.get_stock_info("TSLA")
+        
+        # Verify quote data is still returned
+        assert stock_info.symbol == "TSLA"
+        assert stock_info.close_price == 442.79
+        assert stock_info.pe_ratio_ttm is None
+    
     @patch('src.stock.info.get_timezone_time')
     @patch('src.stock.info.get_market_status')
     async def test_get_stock_info_api_error(
@@ -251,8 +321,7 @@ class TestStockInfoProcessor:
         )
         
         # Verify amplitude calculation: ((444.21 - 429.03) / 425.85) * 100 ≈ 3.57%
-        expected_amplitude = ((444.21 - 429.03) / 425.85) * 100
-        assert abs(stock_info.amplitude - expected_amplitude) < 0.01
+        assert abs(stock_info.amplitude - _EXPECTED_AMPLITUDE_TSLA) < 0.01
     
     def test_build_stock_info_average_price_calculation(self, processor):
         """Test average price calculation."""
@@ -275,8 +344,30 @@ class TestStockInfoProcessor:
         )
         
         # Verify average price: (444.21 + 429.03) / 2 = 436.62
-        expected_avg = (444.21 + 429.03) / 2
-        assert stock_info.average_price == expected_avg
+        assert stock_info.average_price == _EXPECTED_AVG_TSLA
+    
+    def test_build_stock_info_premarket_leaves_quote_untouched(self, processor):
+        """Test pre-market change is used without mutating the quote."""
+        quote = TradierQuote(
+            symbol="TSLA",
+            last=440.0,
+            prevclose=425.85,
+            change=0.0,
+            change_percentage=0.0
+        )
+        
+        stock_info = processor._build_stock_info(
+            quote=quote,
+            company_info={},
+            ratios={},
+            market_status="pre-market",
+            eastern_time=datetime(2023, 9, 25, 8, 0, 0)
+        )
+        
+        assert stock_info.premarket_price == 440.0
+        assert stock_info.change_amount == pytest.approx(14.15)
+        assert quote.change == 0.0
+        assert quote.change_percentage == 0.0
     
     def test_get_price_time_label(self, processor):
         """Test price time label generation."""
@@ -287,21 +378,13 @@ class TestStockInfoProcessor:
         assert "盘前" in processor._get_price_time_label("pre-market", eastern_time)
         assert "盘后" in processor._get_price_time_label("after-hours", eastern_time)
         assert "收盘" in processor._get_price_time_label("closed", eastern_time)
+        assert processor._get_price_time_label("closed", eastern_time) == "09/25 16:00:00 (美东收盘)"
+        assert processor._get_price_time_label("unknown", eastern_time) == "09/25 16:00:00 (美东收盘)"
     
     def test_format_stock_info_basic(self, processor):
         """Test basic stock info formatting."""
-        stock_info = StockInfo(
-            symbol="TSLA",
-            company_name="Tesla Inc",
-            close_price=442.79,
-            close_time="09/25 16:00:00 (美东收盘)",
-            change_amount=16.94,
-            change_percentage=3.98,
-            high_price=444.21,
-            low_price=429.03,
-            open_price=429.83,
-            prev_close=425.85,
-            volume=93133600,
+        stock_info = dataclasses.replace(
+            _TSLA_STOCK_INFO,
             amplitude=3.57,
             lot_size=1
         )
@@ -318,18 +401,8 @@ class TestStockInfoProcessor:
     
     def test_format_stock_info_with_valuation(self, processor):
         """Test stock info formatting with valuation metrics."""
-        stock_info = StockInfo(
-            symbol="TSLA",
-            company_name="Tesla Inc",
-            close_price=442.79,
-            close_time="09/25 16:00:00 (美东收盘)",
-            change_amount=16.94,
-            change_percentage=3.98,
-            high_price=444.21,
-            low_price=429.03,
-            open_price=429.83,
-            prev_close=425.85,
-            volume=93133600,
+        stock_info = dataclasses.replace(
+            _TSLA_STOCK_INFO,
             pe_ratio_ttm=263.57,
             pb_ratio=19.04,
             market_cap=1.47e12,
@@ -347,18 +420,8 @@ class TestStockInfoProcessor:
     
     def test_format_stock_info_with_premarket(self, processor):
         """Test stock info formatting with pre-market data."""
-        stock_info = StockInfo(
-            symbol="TSLA",
-            company_name="Tesla Inc",
-            close_price=442.79,
-            close_time="09/25 16:00:00 (美东收盘)",
-            change_amount=16.94,
-            change_percentage=3.98,
-            high_price=444.21,
-            low_price=429.03,
-            open_price=429.83,
-            prev_close=425.85,
-            volume=93133600,
+        stock_info = dataclasses.replace(
+            _TSLA_STOCK_INFO,
             premarket_price=440.68,
             premarket_change=-2.11,
             premarket_change_percentage=-0.48,
@@ -375,18 +438,8 @@ class TestStockInfoProcessor:
     
     def test_get_raw_data_dict(self, processor):
         """Test conversion to raw data dictionary."""
-        stock_info = StockInfo(
-            symbol="TSLA",
-            company_name="Tesla Inc",
-            close_price=442.79,
-            close_time="09/25 16:00:00 (美东收盘)",
-            change_amount=16.94,
-            change_percentage=3.98,
-            high_price=444.21,
-            low_price=429.03,
-            open_price=429.83,
-            prev_close=425.85,
-            volume=93133600,
+        stock_info = dataclasses.replace(
+            _TSLA_STOCK_INFO,
             market_status="closed",
             data_timestamp="2023-09-25T20:00:00"
         )
@@ -412,62 +465,46 @@ class TestStockInfoProcessor:
 class TestStockInfoFormattingHelpers:
     """Test formatting helper functions indirectly."""
     
-    @patch('src.stock.info.TradierClient')
-    def test_large_number_formatting_via_format_stock_info(self, mock_client):
+    @pytest.fixture(scope="class")
+    @classmethod
+    def processor(cls):
+        """Create one processor (with patched Tradier client) for all cases."""
+        with patch('src.stock.info.TradierClient'):
+            return StockInfoProcessor()
+    
+    @pytest.mark.parametrize("volume,expected", [
+        (1234, "1,234股"),  # Small numbers use comma formatting
+        (12345, "1.23万股"),
+        (123456789, "1.23亿股"),
+        (1234567890123, "1.23万亿股")
+    ])
+    def test_large_number_formatting_via_format_stock_info(self, processor, volume, expected):
         """Test large number formatting through format_stock_info."""
-        processor = StockInfoProcessor()
-        
-        # Test various volume sizes
-        test_cases = [
-            (1234, "1,234股"),  # Small numbers use comma formatting
-            (12345, "1.23万股"),
-            (123456789, "1.23亿股"),
-            (1234567890123, "1.23万亿股")
-        ]
-        
-        for volume, expected in test_cases:
-            stock_info = StockInfo(
-                symbol="TEST",
-                company_name="Test Inc",
-                close_price=100.0,
-                close_time="test",
-                change_amount=0.0,
-                change_percentage=0.0,
-                high_price=100.0,
-                low_price=100.0,
-                open_price=100.0,
-                prev_close=100.0,
-                volume=volume
-            )
-            
-            formatted = processor.format_stock_info(stock_info)
-            assert expected in formatted
+        stock_info = dataclasses.replace(_TEST_STOCK_INFO, volume=volume)
+        
+        formatted = processor.format_stock_info(stock_info)
+        assert expected in formatted
     
-    @patch('src.stock.info.TradierClient')
-    def test_percentage_formatting_via_format_stock_info(self, mock_client):
+    @pytest.mark.parametrize("value,expected", [
+        (None, "N/A"),
+        (9999, "9,999"),
+        (10000, "1.00万"),
+        (100000000, "1.00亿"),
+        (1000000000000, "1.00万亿"),
+        (-250000000, "-2.50亿")  # Magnitude is chosen by absolute value
+    ])
+    def test_large_number_magnitude_boundaries(self, value, expected):
+        """Test each magnitude band starts exactly at its threshold."""
+        assert _format_large_number(value) == expected
+    
+    @pytest.mark.parametrize("change_pct,expected", [
+        (3.98, "+3.98%"),
+        (-2.15, "-2.15%"),
+        (0.0, "+0.00%")
+    ])
+    def test_percentage_formatting_via_format_stock_info(self, processor, change_pct, expected):
         """Test percentage formatting through format_stock_info."""
-        processor = StockInfoProcessor()
-        
-        test_cases = [
-            (3.98, "+3.98%"),
-            (-2.15, "-2.15%"),
-            (0.0, "+0.00%")
-        ]
-        
-        for change_pct, expected in test_cases:
-            stock_info = StockInfo(
-                symbol="TEST",
-                company_name="Test Inc", 
-                close_price=100.0,
-                close_time="test",
-                change_amount=0.0,
-                change_percentage=change_pct,
-                high_price=100.0,
-                low_price=100.0,
-                open_price=100.0,
-                prev_close=100.0,
-                volume=1000
-            )
-            
-            formatted = processor.format_stock_info(stock_info)
-            assert expected in formatted
\ No newline at end of file
+        stock_info = dataclasses.replace(_TEST_STOCK_INFO, change_percentage=change_pct)
+        
+        formatted = processor.format_stock_info(stock_info)
+        assert expected in formatted
\ No newline at end of file
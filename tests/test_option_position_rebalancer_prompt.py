@@ -4,132 +4,136 @@ Test script for Option Position Rebalancer Prompt
 测试期权仓位再平衡引擎提示生成器的功能
 """
 
-import asyncio
-import sys
-from pathlib import Path
+import re
 
-# 添加项目根目录到路径
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+import pytest
 
 from src.mcp_server.prompts.option_position_rebalancer_prompt import (
     option_position_rebalancer_engine,
     get_rebalancer_examples,
-    get_usage_guidelines
+    get_usage_guidelines,
+    _extract_underlying_from_option_symbol,
+    _extract_strike_from_option_symbol,
+    _extract_expiration_from_option_symbol,
+    _extract_strike_cached,
+    _parse_occ_symbol,
+    _render_rebalancer_prompt_parts
 )
 
+# 二级章节标题行 (## ...)
+_SECTION_HEADER_RE = re.compile(r"^## .*$", re.MULTILINE)
 
-async def test_short_put_losing_position():
-    """测试亏损的做空Put仓位"""
-    print("\n" + "="*80)
-    print("测试场景 1: 亏损的做空Put仓位 - 防御性滚动评估")
-    print("="*80)
 
-    result = await option_position_rebalancer_engine(
-        option_symbol="TSLA250919P00390000",
-        position_size=-100,
-        entry_price=13.00,
-        position_type="short_put",
-        entry_date="2025-09-01",
-        risk_tolerance="moderate",
-        defensive_roll_trigger_pct=15.0,
-        profit_target_pct=70.0,
-        max_additional_capital=50000
-    )
+# 测试输出分隔线
+_EQ = "=" * 80
+_DASH = "-" * 80
 
-    print("\n生成的提示词长度:", len(result), "字符")
-    print("\n提示词前500字符预览:")
-    print("-" * 80)
-    print(result[:500])
-    print("-" * 80)
 
-    # 验证关键内容
-    assert "TSLA250919P00390000" in result
-    assert "Tesla" in result.upper() or "TSLA" in result
-    assert "390" in result  # 行权价
-    assert "short_put" in result.lower() or "做空" in result
-    assert "P&L" in result or "盈亏" in result
+def _print_section(title):
+    """打印测试场景标题横幅"""
+    print(f"\n{_EQ}\n{title}\n{_EQ}")
 
-    print("\n✅ 测试通过: 亏损的做空Put仓位提示生成成功")
-    return result
 
+def _section_spans(text):
+    """一次扫描记录每个二级章节的起止位置, 返回 {标题行: (start, end)}"""
+    headers = list(_SECTION_HEADER_RE.finditer(text))
+    ends = [match.start() for match in headers[1:]] + [len(text)]
+    return {match.group(0).rstrip(): (match.start(), end) for match, end in zip(headers, ends)}
 
-async def test_short_put_winning_position():
-    """测试盈利的做空Put仓位"""
-    print("\n" + "="*80)
-    print("测试场景 2: 盈利的做空Put仓位 - 获利了结评估")
-    print("="*80)
 
-    result = await option_position_rebalancer_engine(
-        option_symbol="AAPL251017P00220000",
-        position_size=-50,
-        entry_price=5.50,
-        position_type="short_put",
-        entry_date="2025-10-01",
-        risk_tolerance="conservative",
-        defensive_roll_trigger_pct=15.0,
-        profit_target_pct=70.0,
-        max_additional_capital=0
-    )
+def _assert_all_in(text, needles):
+    """断言所有子串都出现在文本中, 一次性报告全部缺失项"""
+    missing = [needle for needle in needles if needle not in text]
+    assert not missing, f"提示词中缺少: {missing}"
 
-    print("\n生成的提示词长度:", len(result), "字符")
-    print("\n提示词关键部分预览:")
-    print("-" * 80)
-
-    # 提取并显示关键部分
-    if "## 📊 当前仓位概览" in result:
-        start = result.find("## 📊 当前仓位概览")
-        end = result.find("##", start + 10)
-        print(result[start:end])
-
-    print("-" * 80)
-
-    # 验证关键内容
-    assert "AAPL251017P00220000" in result
-    assert "AAPL" in result.upper()
-    assert "220" in result  # 行权价
-    assert "conservative" in result.lower() or "保守" in result
-
-    print("\n✅ 测试通过: 盈利的做空Put仓位提示生成成功")
-    return result
-
-
-async def test_short_call_defensive():
-    """测试需要防御的做空Call仓位"""
-    print("\n" + "="*80)
-    print("测试场景 3: 需要防御的做空Call仓位 - 高风险防御")
-    print("="*80)
-
-    result = await option_position_rebalancer_engine(
-        option_symbol="NVDA250926C00800000",
-        position_size=-20,
-        entry_price=15.00,
-        position_type="short_call",
-        entry_date="2025-09-15",
-        risk_tolerance="conservative",
-        defensive_roll_trigger_pct=20.0,
-        profit_target_pct=60.0,
-        max_additional_capital=100000
-    )
 
+# 仓位场景ID -> (标题, 引擎参数, 必须出现的子串, 至少出现其一的子串组)
+_POSITION_SCENARIOS = {
+    "short_put_losing": (
+        "测试场景 1: 亏损的做空Put仓位 - 防御性滚动评估",
+        dict(
+            option_symbol="TSLA250919P00390000",
+            position_size=-100,
+            entry_price=13.00,
+            position_type="short_put",
+            entry_date="2025-09-01",
+            risk_tolerance="moderate",
+            defensive_roll_trigger_pct=15.0,
+            profit_target_pct=70.0,
+            max_additional_capital=50000
+        ),
+        ["TSLA250919P00390000", "TSLA", "390"],  # 390为行权价
+        [("short_put", "做空"), ("P&L", "盈亏")]
+    ),
+    "short_put_winning": (
+        "测试场景 2: 盈利的做空Put仓位 - 获利了结评估",
+        dict(
+            option_symbol="AAPL251017P00220000",
+            position_size=-50,
+            entry_price=5.50,
+            position_type="short_put",
+            entry_date="2025-10-01",
+            risk_tolerance="conservative",
+            defensive_roll_trigger_pct=15.0,
+            profit_target_pct=70.0,
+            max_additional_capital=0
+        ),
+        ["AAPL251017P00220000", "AAPL", "220"],  # 220为行权价
+        [("conservative", "保守")]
+    ),
+    "short_call_defensive": (
+        "测试场景 3: 需要防御的做空Call仓位 - 高风险防御",
+        dict(
+            option_symbol="NVDA250926C00800000",
+            position_size=-20,
+            entry_price=15.00,
+            position_type="short_call",
+            entry_date="2025-09-15",
+            risk_tolerance="conservative",
+            defensive_roll_trigger_pct=20.0,
+            profit_target_pct=60.0,
+            max_additional_capital=100000
+        ),
+        ["NVDA250926C00800000", "NVDA", "800"],  # 800为行权价
+        [("short_call", "做空"), ("call", "看涨")]
+    ),
+}
+
+
+@pytest.fixture(scope="module", params=list(_POSITION_SCENARIOS))
+async def position_scenario(request):
+    """每个仓位场景只调用一次引擎, 返回 (场景定义, 生成的提示词)"""
+    scenario = _POSITION_SCENARIOS[request.param]
+    result = await option_position_rebalancer_engine(**scenario[1])
+    return scenario, result
+
+
+async def test_position_scenario(position_scenario):
+    """测试做空Put/Call仓位场景的提示生成"""
+    (title, params, required, alternatives), result = position_scenario
+
+    _print_section(title)
     print("\n生成的提示词长度:", len(result), "字符")
 
+    # 显示当前仓位概览部分
+    spans = _section_spans(result)
+    assert "## 📊 当前仓位概览" in spans
+    start, end = spans["## 📊 当前仓位概览"]
+    print(f"{_DASH}\n{result[start:end].rstrip()}\n{_DASH}")
+
     # 验证关键内容
-    assert "NVDA250926C00800000" in result
-    assert "NVDA" in result.upper()
-    assert "800" in result  # 行权价
-    assert "short_call" in result.lower() or "做空" in result
-    assert "call" in result.lower() or "看涨" in result
+    _assert_all_in(result, required)
+    lowered = result.lower()
+    for options in alternatives:
+        assert any(option in result or option in lowered for option in options), \
+            f"提示词中缺少 {options} 中的任一项"
 
-    print("\n✅ 测试通过: 做空Call仓位提示生成成功")
-    return result
+    print(f"\n✅ 测试通过: {params['option_symbol']} 仓位提示生成成功")
 
 
 async def test_parameter_validation():
     """测试参数验证"""
-    print("\n" + "="*80)
-    print("测试场景 4: 参数验证功能")
-    print("="*80)
+    _print_section("测试场景 4: 参数验证功能")
 
     # 测试无效的期权符号
     try:
@@ -172,15 +176,14 @@ async def test_parameter_validation():
 
 async def test_examples_and_guidelines():
     """测试示例和指导功能"""
-    print("\n" + "="*80)
-    print("测试场景 5: 示例和使用指导")
-    print("="*80)
+    _print_section("测试场景 5: 示例和使用指导")
 
     # 获取示例
     examples = get_rebalancer_examples()
-    print(f"\n可用示例数量: {len(examples)}")
-    for key, example in examples.items():
-        print(f"  - {key}: {example['description']}")
+    print("\n".join([
+        f"\n可用示例数量: {len(examples)}",
+        *(f"  - {key}: {example['description']}" for key, example in examples.items())
+    ]))
 
     assert len(examples) == 4
     assert "mu_compact_mode" in examples
@@ -190,9 +193,10 @@ async def test_examples_and_guidelines():
 
     # 获取使用指导
     guidelines = get_usage_guidelines()
-    print(f"\n使用指导条目数: {len(guidelines)}")
-    for i, guideline in enumerate(guidelines, 1):
-        print(f"  {i}. {guideline}")
+    print("\n".join([
+        f"\n使用指导条目数: {len(guidelines)}",
+        *(f"  {i}. {guideline}" for i, guideline in enumerate(guidelines, 1))
+    ]))
 
     assert len(guidelines) == 8
 
@@ -201,15 +205,7 @@ async def test_examples_and_guidelines():
 
 async def test_option_symbol_parsing():
     """测试期权符号解析功能"""
-    print("\n" + "="*80)
-    print("测试场景 6: 期权符号解析")
-    print("="*80)
-
-    from src.mcp_server.prompts.option_position_rebalancer_prompt import (
-        _extract_underlying_from_option_symbol,
-        _extract_strike_from_option_symbol,
-        _extract_expiration_from_option_symbol
-    )
+    _print_section("测试场景 6: 期权符号解析")
 
     # 测试TSLA期权
     symbol1 = "TSLA250919P00390000"
@@ -217,10 +213,10 @@ async def test_option_symbol_parsing():
     strike1 = _extract_strike_from_option_symbol(symbol1)
     expiration1 = _extract_expiration_from_option_symbol(symbol1)
 
-    print(f"\n期权符号: {symbol1}")
-    print(f"  标的: {underlying1}")
-    print(f"  行权价: {strike1}")
-    print(f"  到期日: {expiration1}")
+    print(f"\n期权符号: {symbol1}\n"
+          f"  标的: {underlying1}\n"
+          f"  行权价: {strike1}\n"
+          f"  到期日: {expiration1}")
 
     assert underlying1 == "TSLA"
     assert strike1 == 390.0
@@ -232,10 +228,10 @@ async def test_option_symbol_parsing():
     strike2 = _extract_strike_from_option_symbol(symbol2)
     expiration2 = _extract_expiration_from_option_symbol(symbol2)
 
-    print(f"\n期权符号: {symbol2}")
-    print(f"  标的: {underlying2}")
-    print(f"  行权价: {strike2}")
-    print(f"  到期日: {expiration2}")
+    print(f"\n期权符号: {symbol2}\n"
+          f"  标的: {underlying2}\n"
+          f"  行权价: {strike2}\n"
+          f"  到期日: {expiration2}")
 
     assert underlying2 == "AAPL"
     assert strike2 == 220.0
@@ -245,29 +241,47 @@ async def test_option_symbol_parsing():
     symbol3 = "GOOG250919C00150500"  # 150.50
     strike3 = _extract_strike_from_option_symbol(symbol3)
 
-    print(f"\n期权符号: {symbol3}")
-    print(f"  行权价: {strike3}")
+    print(f"\n期权符号: {symbol3}\n  行权价: {strike3}")
 
     assert strike3 == 150.5
 
+    # 相同符号再次解析应命中缓存
+    hits_before = _extract_strike_cached.cache_info().hits
+    assert _extract_strike_from_option_symbol(symbol1) == strike1
+    assert _extract_underlying_from_option_symbol(symbol1) == underlying1
+    assert _extract_expiration_from_option_symbol(symbol1) == expiration1
+    assert _extract_strike_cached.cache_info().hits == hits_before + 1
+
+    # 不可哈希的非字符串参数仍然抛出 ValueError (而非缓存层的 TypeError)
+    for bad_symbol in (["TSLA250919P00390000"], {"symbol": "TSLA250919P00390000"}):
+        for extract in (
+            _extract_underlying_from_option_symbol,
+            _extract_strike_from_option_symbol,
+            _extract_expiration_from_option_symbol,
+        ):
+            with pytest.raises(ValueError):
+                extract(bad_symbol)
+
+    # 三个辅助函数共享同一次OCC解析结果
+    assert _parse_occ_symbol(symbol3) == ("GOOG", "250919", "C", "00150500")
+    assert _parse_occ_symbol("INVALID") is None
+
     print("\n✅ 测试通过: 期权符号解析功能正常")
 
 
 async def test_end_to_end_mu_option_parsing():
     """测试端到端MU期权符号解析 - 这是bug报告中的实际用例"""
-    print("\n" + "="*80)
-    print("测试场景 7: 端到端MU期权符号解析 (Bug修复验证)")
-    print("="*80)
+    _print_section("测试场景 7: 端到端MU期权符号解析 (Bug修复验证)")
 
     # 这是用户报告的实际输入
     option_symbol = "MU251017P00167500"
     position_size = 4
     entry_price = 2.03
 
-    print(f"\n用户输入:")
-    print(f"  期权符号: {option_symbol}")
-    print(f"  仓位大小: {position_size}")
-    print(f"  入场价格: ${entry_price}")
+    print(f"\n用户输入:\n"
+          f"  期权符号: {option_symbol}\n"
+          f"  仓位大小: {position_size}\n"
+          f"  入场价格: ${entry_price}")
 
     result = await option_position_rebalancer_engine(
         option_symbol=option_symbol,
@@ -310,52 +324,55 @@ async def test_end_to_end_mu_option_parsing():
     assert "参数解析验证" in result or "解析验证" in result or "解析结果" in result, "应该包含解析验证部分"
     print("  ✓ 包含解析验证部分")
 
-    print("\n✅ 测试通过: MU期权符号端到端解析成功!")
-    print("   Bug已修复: 期权符号正确解析为 MU, $167.50, 2025-10-17, PUT")
-    return result
+    print("\n✅ 测试通过: MU期权符号端到端解析成功!\n"
+          "   Bug已修复: 期权符号正确解析为 MU, $167.50, 2025-10-17, PUT")
 
 
-async def main():
-    """主测试函数"""
-    print("\n" + "="*80)
-    print("期权仓位再平衡提示引擎 - 综合测试")
-    print("="*80)
+async def test_repeated_engine_call_reuses_rendered_prompt():
+    """测试相同参数重复调用复用已渲染模板, 且分析时间仍为当前时间"""
+    params = dict(
+        option_symbol="TSLA250919P00390000",
+        position_size=-100,
+        entry_price=13.00,
+        position_type="short_put",
+        entry_date="2025-09-01"
+    )
 
-    try:
-        # 运行所有测试
-        await test_option_symbol_parsing()
-        await test_parameter_validation()
-        await test_examples_and_guidelines()
-
-        result1 = await test_short_put_losing_position()
-        result2 = await test_short_put_winning_position()
-        result3 = await test_short_call_defensive()
-
-        # 运行端到端bug修复验证测试
-        result4 = await test_end_to_end_mu_option_parsing()
-
-        # 最终总结
-        print("\n" + "="*80)
-        print("📊 测试总结")
-        print("="*80)
-        print(f"\n✅ 所有测试通过!")
-        print(f"\n生成的提示词统计:")
-        print(f"  场景1 (亏损Put): {len(result1):,} 字符")
-        print(f"  场景2 (盈利Put): {len(result2):,} 字符")
-        print(f"  场景3 (防御Call): {len(result3):,} 字符")
-        print(f"  场景4 (MU Bug修复): {len(result4):,} 字符")
-        print(f"  平均长度: {(len(result1) + len(result2) + len(result3) + len(result4)) // 4:,} 字符")
-
-        print("\n" + "="*80)
-        print("🎉 期权仓位再平衡引擎测试完成!")
-        print("="*80)
-
-    except Exception as e:
-        print(f"\n❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
+    first = await option_position_rebalancer_engine(**params)
+    hits_before = _render_rebalancer_prompt_parts.cache_info().hits
+    second = await option_position_rebalancer_engine(**params)
+
+    assert _render_rebalancer_prompt_parts.cache_info().hits == hits_before + 1
+    analysis_time = re.compile(r"\*\*分析时间\*\*: \d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\n")
+    assert analysis_time.search(second)
+    assert analysis_time.sub("", first) == analysis_time.sub("", second)
+
+
+async def test_rendered_prompt_cache_distinguishes_int_and_float():
+    """测试 15.0 与 15 分别渲染, 不互相命中缓存"""
+    params = dict(
+        option_symbol="NVDA250919P00150000",
+        position_size=-100,
+        entry_price=5.00,
+        position_type="short_put",
+        entry_date="2025-09-01"
+    )
+
+    as_float = await option_position_rebalancer_engine(defensive_roll_trigger_pct=15.0, **params)
+    as_int = await option_position_rebalancer_engine(defensive_roll_trigger_pct=15, **params)
+
+    assert "**防御触发阈值**: 15.0%" in as_float
+    assert "**防御触发阈值**: 15%" in as_int
+
+
+async def test_option_type_from_occ_type_field():
+    """测试期权类型取自OCC类型位, 而不是标的代码中的P/C字母"""
+    result = await option_position_rebalancer_engine(
+        option_symbol="AAPL251017C00220000",
+        position_size=-5,
+        entry_price=5.50,
+        position_type="short_call"
+    )
+
+    assert "期权类型: 看涨期权 (CALL)" in result
+    assert "看跌期权 (PUT)" not in result
@@ -0,0 +1,16 @@
+"""Shared fixtures for MCP tool tests."""
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def async_return():
+    """Factory for plain coroutine stubs: async_return(value) -> async def returning value.
+
+    Lighter than AsyncMock for awaited collaborators whose calls are never asserted.
+    """
+    def _async_return(value):
+        async def _call(*args, **kwargs):
+            return value
+        return _call
+    return _async_return
@@ -1,7 +1,7 @@
 """Tests for covered call strategy MCP tool."""
 
 import pytest
-from unittest.mock import patch, AsyncMock, Mock
+from unittest.mock import patch, Mock
 from datetime import datetime, date
 from src.mcp_server.tools.covered_call_strategy_tool import (
     covered_call_strategy_tool,
@@ -62,7 +62,7 @@ class TestCoveredCallStrategyTool:
     @patch('src.mcp_server.tools.covered_call_strategy_tool.TradierClient')
     @patch('src.mcp_server.tools.covered_call_strategy_tool.ExpirationSelector')
     @patch('src.mcp_server.tools.covered_call_strategy_tool.CoveredCallAnalyzer')
-    async def test_successful_income_strategy(self, mock_analyzer_class, mock_expiration_class, mock_client_class):
+    async def test_successful_income_strategy(self, mock_analyzer_class, mock_expiration_class, mock_client_class, async_return):
         """Test successful income strategy execution."""
         # Setup mock client
         mock_client = Mock()
@@ -86,7 +86,7 @@ class TestCoveredCallStrategyTool:
         # Setup mock expiration selector
         mock_expiration = Mock()
         mock_expiration_class.return_value = mock_expiration
-        mock_expiration.get_optimal_expiration = AsyncMock(return_value=ExpirationSelectionResult(
+        mock_expiration.get_optimal_expiration = async_return(ExpirationSelectionResult(
             selected_date="2024-01-19",
             selection_reason="optimal weekly expiration",
             metadata={"actual_days": 7, "expiration_type": "weekly"},
@@ -114,7 +114,7 @@ class TestCoveredCallStrategyTool:
                 "composite_score": 85.5
             }
         ]
-        mock_analyzer.find_optimal_strikes = AsyncMock(return_value=mock_optimal_strikes)
+        mock_analyzer.find_optimal_strikes = async_return(mock_optimal_strikes)
         
         # Mock recommendation engine and other components
         with patch('src.mcp_server.tools.covered_call_strategy_tool.CoveredCallRecommendationEngine') as mock_rec_engine_class, \
@@ -173,7 +173,7 @@ class TestCoveredCallStrategyTool:
     @patch('src.mcp_server.tools.covered_call_strategy_tool.TradierClient')
     @patch('src.mcp_server.tools.covered_call_strategy_tool.ExpirationSelector')
     @patch('src.mcp_server.tools.covered_call_strategy_tool.CoveredCallAnalyzer')
-    async def test_no_suitable_options(self, mock_analyzer_class, mock_expiration_class, mock_client_class):
+    async def test_no_suitable_options(self, mock_analyzer_class, mock_expiration_class, mock_client_class, async_return):
         """Test scenario when no suitable options are found."""
         # Setup mocks similar to successful test but with empty optimal strikes
         mock_client = Mock()
@@ -192,7 +192,7 @@ class TestCoveredCallStrategyTool:
         
         mock_expiration = Mock()
         mock_expiration_class.return_value = mock_expiration
-        mock_expiration.get_optimal_expiration = AsyncMock(return_value=ExpirationSelectionResult(
+        mock_expiration.get_optimal_expiration = async_return(ExpirationSelectionResult(
             selected_date="2024-01-19",
             selection_reason="weekly expiration",
             metadata={"actual_days": 7, "expiration_type": "weekly"},
@@ -202,7 +202,7 @@ class TestCoveredCallStrategyTool:
         mock_analyzer = Mock()
         mock_analyzer_class.return_value = mock_analyzer
         mock_analyzer.delta_ranges = {"income": {"min": 0.10, "max": 0.30}}
-        mock_analyzer.find_optimal_strikes = AsyncMock(return_value=[])  # No options found
+        mock_analyzer.find_optimal_strikes = async_return([])  # No options found
         
         result = await covered_call_strategy_tool(
             symbol="AAPL",
@@ -217,7 +217,7 @@ class TestCoveredCallStrategyTool:
     @pytest.mark.asyncio
     @patch('src.mcp_server.tools.covered_call_strategy_tool.TradierClient')
     @patch('src.mcp_server.tools.covered_call_strategy_tool.ExpirationSelector')
-    async def test_no_expiration_available(self, mock_expiration_class, mock_client_class):
+    async def test_no_expiration_available(self, mock_expiration_class, mock_client_class, async_return):
         """Test scenario when no suitable expiration date is available."""
         # Setup mock client
         mock_client = Mock()
@@ -235,7 +235,7 @@ class TestCoveredCallStrategyTool:
         # Setup expiration selector to return None
         mock_expiration = Mock()
         mock_expiration_class.return_value = mock_expiration
-        mock_expiration.get_optimal_expiration = AsyncMock(return_value=None)
+        mock_expiration.get_optimal_expiration = async_return(None)
         
         result = await covered_call_strategy_tool(
             symbol="AAPL",
@@ -246,7 +246,7 @@ class TestCoveredCallStrategyTool:
         assert "无法找到适合" in result["error"]
 
     @pytest.mark.asyncio
-    async def test_exit_strategy_parameters(self):
+    async def test_exit_strategy_parameters(self, async_return):
         """Test exit strategy with specific parameters."""
         with patch('src.mcp_server.tools.covered_call_strategy_tool.TradierClient') as mock_client_class, \
              patch('src.mcp_server.tools.covered_call_strategy_tool.ExpirationSelector') as mock_expiration_class, \
@@ -261,7 +261,7 @@ class TestCoveredCallStrategyTool:
             
             mock_expiration = Mock()
             mock_expiration_class.return_value = mock_expiration
-            mock_expiration.get_optimal_expiration = AsyncMock(return_value=ExpirationSelectionResult(
+            mock_expiration.get_optimal_expiration = async_return(ExpirationSelectionResult(
                 selected_date="2024-02-16",
                 selection_reason="monthly expiration",
                 metadata={"actual_days": 30, "expiration_type": "monthly"},
@@ -431,7 +431,7 @@ class TestCoveredCallIntegration:
 
     @pytest.mark.asyncio
     @pytest.mark.integration
-    async def test_full_workflow_mock_integration(self):
+    async def test_full_workflow_mock_integration(self, async_return):
         """Test full workflow with realistic mock data."""
         # This test would use more realistic mock data to test the full integration
         # but without hitting external APIs
@@ -484,7 +484,7 @@ class TestCoveredCallIntegration:
                 
                 mock_exp_instance = Mock()
                 mock_exp.return_value = mock_exp_instance
-                mock_exp_instance.get_optimal_expiration = AsyncMock(return_value=ExpirationSelectionResult(
+                mock_exp_instance.get_optimal_expiration = async_return(ExpirationSelectionResult(
                     selected_date="2024-01-19",
                     selection_reason="weekly expiration",
                     metadata={"actual_days": 14, "expiration_type": "weekly"},